@@ -11,7 +11,9 @@ import pandas as pd
 import csv
 from io import TextIOWrapper
 from .models import *
+from .doubt_inbox import recount_unresolved
 from .forms import BulkImportForm
+from .timetable_solver import apply_timetable, describe_clash, generate_timetable, timetable_clashes
 
 # Unregister the default User admin
 admin.site.unregister(User)
@@ -302,6 +304,31 @@ class TimeTableAdmin(admin.ModelAdmin):
     list_filter = ['batch', 'day', 'period']
     search_fields = ['batch', 'subject__name']
     ordering = ['batch', 'day', 'period']
+    actions = ['report_clashes', 'regenerate_batches']
+    
+    def report_clashes(self, request, queryset):
+        # Clashes can involve rows outside the selection, so check the whole timetable
+        clashes = timetable_clashes()
+        for clash in clashes[:20]:
+            self.message_user(request, describe_clash(*clash), level=messages.WARNING)
+        if not clashes:
+            self.message_user(request, 'No clashes in the current timetable.')
+    report_clashes.short_description = 'Report teacher and room clashes'
+    
+    def regenerate_batches(self, request, queryset):
+        batches = sorted(set(queryset.values_list('batch', flat=True)))
+        rooms = sorted(room for room in TimeTable.objects.values_list('room', flat=True).distinct() if room)
+        rows, unplaced = generate_timetable(rooms, batches)
+        if unplaced:
+            self.message_user(
+                request,
+                f'No clash-free timetable found for {", ".join(batches)}; nothing was changed.',
+                level=messages.ERROR,
+            )
+            return
+        apply_timetable(rows, batches)
+        self.message_user(request, f'Regenerated {len(rows)} sessions for {", ".join(batches)}.')
+    regenerate_batches.short_description = 'Regenerate the timetable of the selected batches'
     
     def get_form(self, request, obj=None, **kwargs):
         form = super().get_form(request, obj, **kwargs)
@@ -318,6 +345,40 @@ class AttendanceAdmin(admin.ModelAdmin):
     date_hierarchy = 'date'
     ordering = ['-date', 'student']
 
+@admin.register(AttendanceSummary)
+class AttendanceSummaryAdmin(admin.ModelAdmin):
+    list_display = ['student', 'subject', 'present', 'total', 'percentage']
+    list_filter = ['subject']
+    search_fields = ['student__campus_id', 'student__user__first_name', 'subject__name']
+    readonly_fields = ['student', 'subject', 'total', 'present']
+    ordering = ['student', 'subject']
+
+    def has_add_permission(self, request):
+        # Rows are maintained from Attendance writes
+        return False
+
+@admin.register(AcademicTerm)
+class AcademicTermAdmin(admin.ModelAdmin):
+    list_display = ['name', 'start_date', 'end_date', 'is_closed', 'archived_at']
+    list_filter = ['is_closed']
+    readonly_fields = ['archived_at']
+    ordering = ['-start_date']
+
+@admin.register(ArchivedAttendance)
+class ArchivedAttendanceAdmin(admin.ModelAdmin):
+    list_display = ['student', 'subject', 'date', 'period', 'is_present', 'term']
+    list_filter = ['term', 'is_present', 'subject']
+    search_fields = ['student__campus_id', 'student__user__first_name', 'subject__name']
+    list_select_related = ['student', 'subject', 'term']
+    ordering = ['-date']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        # Closed-term history is read-only
+        return False
+
 @admin.register(Assignment)
 class AssignmentAdmin(admin.ModelAdmin):
     list_display = ['title', 'subject', 'teacher', 'due_date', 'max_marks', 'created_at']
@@ -350,6 +411,22 @@ class DoubtReplyAdmin(admin.ModelAdmin):
     date_hierarchy = 'replied_at'
     ordering = ['-replied_at']
 
+@admin.register(DoubtCounter)
+class DoubtCounterAdmin(admin.ModelAdmin):
+    list_display = ['teacher', 'unresolved']
+    search_fields = ['teacher__employee_number', 'teacher__user__first_name']
+    readonly_fields = ['teacher', 'unresolved']
+    actions = ['recount']
+
+    def has_add_permission(self, request):
+        # Rows are maintained from Doubt writes
+        return False
+
+    def recount(self, request, queryset):
+        recount_unresolved(list(queryset.values_list('teacher_id', flat=True)))
+        self.message_user(request, f'{queryset.count()} counters recounted.')
+    recount.short_description = 'Recount unresolved doubts'
+
 @admin.register(Material)
 class MaterialAdmin(admin.ModelAdmin):
     list_display = ['title', 'subject', 'teacher', 'material_type', 'uploaded_at', 'is_active']
@@ -366,6 +443,20 @@ class ExamResultAdmin(admin.ModelAdmin):
     date_hierarchy = 'published_at'
     ordering = ['-published_at']
 
+@admin.register(ExamSchedule)
+class ExamScheduleAdmin(admin.ModelAdmin):
+    list_display = ['subject', 'exam_type', 'date', 'session', 'rooms', 'candidates']
+    list_filter = ['exam_type', 'date', 'session', 'subject__semester']
+    search_fields = ['subject__name', 'subject__code', 'rooms']
+    ordering = ['date', 'session']
+
+@admin.register(UploadSession)
+class UploadSessionAdmin(admin.ModelAdmin):
+    list_display = ['filename', 'user', 'target', 'received', 'size', 'updated_at']
+    list_filter = ['target']
+    search_fields = ['filename', 'user__username']
+    readonly_fields = ['upload_id', 'received', 'sha256', 'created_at', 'updated_at']
+
 @admin.register(HallTicketRequest)
 class HallTicketRequestAdmin(admin.ModelAdmin):
     list_display = ['student', 'exam_name', 'exam_date', 'status', 'requested_at']
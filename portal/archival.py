@@ -0,0 +1,107 @@
+import time
+from collections import defaultdict
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+from .attendance_engine import apply_summary_deltas, moving_to_archive
+from .models import Attendance, ArchivedAttendance
+
+# Rows moved per transaction; small chunks keep row locks short
+ARCHIVE_CHUNK_SIZE = 1000
+
+
+def archive_term(term, chunk_size=ARCHIVE_CHUNK_SIZE, pause=0.0, progress=None):
+    """Move a closed term's Attendance rows into ArchivedAttendance.
+
+    Rows are copied and deleted in chunks, each in its own short transaction,
+    so the live table is never locked for the whole run. ``pause`` sleeps
+    between chunks to leave room for daytime traffic. AttendanceSummary is
+    left alone: archived rows still count towards a student's totals.
+
+    Safe to run again: a live row whose class is already archived replaces
+    the archived mark, and the summary stops counting that class twice.
+
+    Returns the number of rows moved.
+    """
+    if not term.is_closed or term.end_date >= timezone.localdate():
+        raise ValidationError(f'{term} is still open; only closed terms can be archived.')
+
+    live_rows = Attendance.objects.filter(date__gte=term.start_date, date__lte=term.end_date)
+    moved = 0
+
+    while True:
+        with transaction.atomic():
+            chunk = list(live_rows.order_by('id')[:chunk_size])
+            if not chunk:
+                break
+
+            archived = {
+                (record.student_id, record.subject_id, record.date, record.period): record
+                for record in ArchivedAttendance.objects.filter(
+                    student_id__in={record.student_id for record in chunk},
+                    date__in={record.date for record in chunk},
+                )
+            }
+            to_create = []
+            to_update = []
+            summary_deltas = defaultdict(dict)
+            for record in chunk:
+                previous = archived.get((record.student_id, record.subject_id, record.date, record.period))
+                if previous is None:
+                    to_create.append(ArchivedAttendance(
+                        term=term,
+                        student_id=record.student_id,
+                        subject_id=record.subject_id,
+                        date=record.date,
+                        period=record.period,
+                        is_present=record.is_present,
+                        marked_by_id=record.marked_by_id,
+                        marked_at=record.marked_at,
+                    ))
+                    continue
+                # Both rows were counted; keep the newer live mark once
+                summary_deltas[record.subject_id][record.student_id] = (-1, -int(previous.is_present))
+                previous.is_present = record.is_present
+                previous.marked_by_id = record.marked_by_id
+                previous.marked_at = record.marked_at
+                to_update.append(previous)
+
+            ArchivedAttendance.objects.bulk_create(to_create, batch_size=ARCHIVE_CHUNK_SIZE)
+            ArchivedAttendance.objects.bulk_update(
+                to_update, ['is_present', 'marked_by', 'marked_at'], batch_size=ARCHIVE_CHUNK_SIZE
+            )
+            for subject_id, deltas in summary_deltas.items():
+                apply_summary_deltas(subject_id, deltas)
+
+            with moving_to_archive():
+                Attendance.objects.filter(pk__in=[record.pk for record in chunk]).delete()
+
+        moved += len(chunk)
+        if progress:
+            progress(moved)
+        if pause:
+            time.sleep(pause)
+
+    term.archived_at = timezone.now()
+    term.save(update_fields=['archived_at'])
+    return moved
+
+
+def recent_attendance_history(student, limit=20):
+    """Latest attendance records for a student, falling back to the archive.
+
+    Archived terms are always older than live rows, so the archive is only
+    read when the live table has fewer than ``limit`` records.
+    """
+    records = list(
+        Attendance.objects.filter(student=student)
+        .select_related('subject', 'marked_by__user')
+        .order_by('-date', '-period')[:limit]
+    )
+    if len(records) < limit:
+        records += list(
+            ArchivedAttendance.objects.filter(student=student)
+            .select_related('subject', 'marked_by__user')
+            .order_by('-date', '-period')[:limit - len(records)]
+        )
+    return records
@@ -0,0 +1,125 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Exists, FilteredRelation, OuterRef, Q
+from django.utils import timezone
+from .models import Assignment, AssignmentSubmission, Student
+
+ASSIGNMENT_PAGE_SIZE = 20
+ASSIGNMENT_STATUSES = ('open', 'overdue', 'submitted')
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+SEMESTER_COUNTS_KEY = 'assignments:semester_student_counts'
+SEMESTER_COUNTS_TIMEOUT = 60 * 60
+
+
+# Keyset cursors: "<due date in epoch microseconds>.<id>" of the last row shown
+
+def encode_cursor(assignment):
+    return f'{(assignment.due_date - _EPOCH) // timedelta(microseconds=1)}.{assignment.id}'
+
+
+def decode_cursor(cursor):
+    """(due_date, id) from encode_cursor(), or None if ``cursor`` is malformed"""
+    try:
+        micros, assignment_id = (int(part) for part in cursor.split('.'))
+    except (AttributeError, ValueError):
+        return None
+    return _EPOCH + timedelta(microseconds=micros), assignment_id
+
+
+def student_assignments(student, status=None, cursor=None, limit=ASSIGNMENT_PAGE_SIZE):
+    """One page of a student's assignments, newest due date first, in a single query.
+
+    The student's own submission is LEFT JOINed through a FilteredRelation
+    and attached as ``assignment.submission`` (or None). ``status`` narrows
+    the list to 'open', 'overdue' or 'submitted'. Returns (assignments,
+    next cursor or None).
+    """
+    assignments = (
+        Assignment.objects.filter(subject__semester=student.semester)
+        .annotate(own_submission=FilteredRelation('submissions', condition=Q(submissions__student=student)))
+        .select_related('subject', 'own_submission')
+        .order_by('-due_date', '-id')
+    )
+
+    now = timezone.now()
+    if status == 'submitted':
+        assignments = assignments.filter(own_submission__isnull=False)
+    elif status == 'open':
+        assignments = assignments.filter(own_submission__isnull=True, due_date__gte=now)
+    elif status == 'overdue':
+        assignments = assignments.filter(own_submission__isnull=True, due_date__lt=now)
+
+    position = decode_cursor(cursor) if cursor else None
+    if position:
+        due_date, assignment_id = position
+        assignments = assignments.filter(Q(due_date__lt=due_date) | Q(due_date=due_date, id__lt=assignment_id))
+
+    page = list(assignments[:limit + 1])
+    next_cursor = encode_cursor(page[limit - 1]) if len(page) > limit else None
+    page = page[:limit]
+    for assignment in page:
+        # The attribute is only set when the LEFT JOIN found a submission
+        assignment.submission = getattr(assignment, 'own_submission', None)
+        assignment.is_submitted = assignment.submission is not None
+    return page, next_cursor
+
+
+# Submission statistics
+
+def semester_student_counts():
+    """{semester: number of students}, cached until a Student is saved or deleted"""
+    counts = cache.get(SEMESTER_COUNTS_KEY)
+    if counts is None:
+        counts = dict(Student.objects.values_list('semester').annotate(count=Count('id')).order_by())
+        cache.set(SEMESTER_COUNTS_KEY, counts, SEMESTER_COUNTS_TIMEOUT)
+    return counts
+
+
+def forget_semester_student_counts():
+    transaction.on_commit(lambda: cache.delete(SEMESTER_COUNTS_KEY))
+
+
+def with_submission_stats(assignments):
+    """Annotate ``assignments`` with submitted, late and graded counts in the same query"""
+    return assignments.select_related('subject').annotate(
+        submitted_count=Count('submissions'),
+        late_count=Count('submissions', filter=Q(submissions__is_late=True)),
+        graded_count=Count('submissions', filter=Q(submissions__marks__isnull=False)),
+    )
+
+
+def submission_stats(assignment, counts=None):
+    """total/submitted/pending/late/graded for an assignment from with_submission_stats()"""
+    if counts is None:
+        counts = semester_student_counts()
+    total = counts.get(assignment.subject.semester, 0)
+    return {
+        'total': total,
+        'submitted': assignment.submitted_count,
+        'pending': max(total - assignment.submitted_count, 0),
+        'late': assignment.late_count,
+        'graded': assignment.graded_count,
+    }
+
+
+def teacher_assignments_with_stats(teacher):
+    """A teacher's assignments, newest first, each with ``submission_stats``, in one query"""
+    assignments = list(with_submission_stats(Assignment.objects.filter(teacher=teacher)).order_by('-created_at'))
+    counts = semester_student_counts()
+    for assignment in assignments:
+        assignment.submission_stats = submission_stats(assignment, counts)
+    return assignments
+
+
+def pending_students(assignment):
+    """Students of the assignment's semester without a submission, via NOT EXISTS"""
+    submitted = AssignmentSubmission.objects.filter(assignment=assignment, student=OuterRef('pk'))
+    return (
+        Student.objects.filter(semester=assignment.subject.semester)
+        .filter(~Exists(submitted))
+        .select_related('user')
+        .order_by('campus_id')
+    )
@@ -0,0 +1,300 @@
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import date as date_cls
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q
+from .models import (
+    AcademicTerm, Attendance, AttendanceSummary, ArchivedAttendance, AttendanceSyncKey, Student, Subject, TimeTable
+)
+from .dashboard_cache import invalidate_dashboards
+
+# Rows per INSERT/UPDATE statement when writing a sheet
+BULK_BATCH_SIZE = 500
+
+# Most sheets accepted in one offline sync request
+MAX_SYNC_SHEETS = 50
+
+# Times a sheet is re-read and rewritten after losing an insert race
+SHEET_WRITE_ATTEMPTS = 3
+
+# Set while archive_term deletes rows it has just copied to the archive.
+# Those rows still count, so the delete signals leave the summaries alone.
+_moving_to_archive = ContextVar('moving_to_archive', default=False)
+
+
+@contextmanager
+def moving_to_archive():
+    token = _moving_to_archive.set(True)
+    try:
+        yield
+    finally:
+        _moving_to_archive.reset(token)
+
+
+def is_moving_to_archive():
+    return _moving_to_archive.get()
+
+
+def closed_term_for(date):
+    """The closed AcademicTerm covering ``date``, if any; its attendance is frozen"""
+    return AcademicTerm.objects.filter(is_closed=True, start_date__lte=date, end_date__gte=date).first()
+
+
+def bulk_mark_attendance(subject, date, period, marks, teacher=None):
+    """Upsert a whole attendance sheet for one subject, date and period.
+
+    ``marks`` maps student id -> is_present. Existing rows for the sheet are
+    read (and locked) in a single query, then new rows are written with one
+    bulk insert and changed rows with one bulk update, all inside one
+    transaction. Summary deltas come from the rows read under the lock, so a
+    concurrent submit of the same sheet cannot make them count a row twice.
+
+    Dates in a closed term are rejected with ValidationError: its rows are
+    (or are about to be) archived, and a new live row would count twice.
+
+    Returns a dict with ``created``, ``updated`` and ``unchanged`` counts.
+    """
+    term = closed_term_for(date)
+    if term:
+        raise ValidationError(f'{date} falls in {term.name}, which is closed; its attendance can no longer change.')
+
+    for attempt in range(SHEET_WRITE_ATTEMPTS):
+        try:
+            with transaction.atomic():
+                return _write_sheet(subject, date, period, marks, teacher)
+        except IntegrityError:
+            # A concurrent submit inserted some of our new rows after we read
+            # the sheet; read it again and write the difference
+            if attempt == SHEET_WRITE_ATTEMPTS - 1:
+                raise
+
+
+def _write_sheet(subject, date, period, marks, teacher):
+    teacher_id = teacher.id if teacher else None
+    result = {'created': 0, 'updated': 0, 'unchanged': 0}
+
+    existing = {
+        record.student_id: record
+        for record in Attendance.objects.select_for_update().filter(
+            subject=subject,
+            date=date,
+            period=period,
+            student_id__in=list(marks),
+        ).only('id', 'student_id', 'is_present', 'marked_by_id')
+    }
+
+    to_create = []
+    to_update = []
+    summary_deltas = {}
+    for student_id, is_present in marks.items():
+        record = existing.get(student_id)
+        if record is None:
+            summary_deltas[student_id] = (1, int(is_present))
+            to_create.append(Attendance(
+                student_id=student_id,
+                subject=subject,
+                date=date,
+                period=period,
+                is_present=is_present,
+                marked_by_id=teacher_id,
+            ))
+        elif record.is_present != is_present or record.marked_by_id != teacher_id:
+            summary_deltas[student_id] = (0, int(is_present) - int(record.is_present))
+            record.is_present = is_present
+            record.marked_by_id = teacher_id
+            to_update.append(record)
+        else:
+            result['unchanged'] += 1
+
+    if to_create:
+        # Fails with IntegrityError if another submit got there first, which
+        # rolls this attempt back before any summary is touched
+        Attendance.objects.bulk_create(to_create, batch_size=BULK_BATCH_SIZE)
+        result['created'] = len(to_create)
+
+    if to_update:
+        Attendance.objects.bulk_update(to_update, ['is_present', 'marked_by'], batch_size=BULK_BATCH_SIZE)
+        result['updated'] = len(to_update)
+
+    apply_summary_deltas(subject.id, summary_deltas)
+    invalidate_dashboards(students=summary_deltas)
+    return result
+
+
+def apply_summary_deltas(subject_id, deltas):
+    """Shift AttendanceSummary counters for one subject.
+
+    ``deltas`` maps student id -> (total delta, present delta). Students with
+    the same delta are updated together, so a full sheet costs at most a few
+    UPDATE statements. Must run inside the transaction that wrote the rows.
+    """
+    new_ids = [student_id for student_id, (total, _) in deltas.items() if total > 0]
+    if new_ids:
+        AttendanceSummary.objects.bulk_create(
+            [AttendanceSummary(student_id=student_id, subject_id=subject_id) for student_id in new_ids],
+            batch_size=BULK_BATCH_SIZE,
+            ignore_conflicts=True,
+        )
+
+    groups = defaultdict(list)
+    for student_id, delta in deltas.items():
+        if delta != (0, 0):
+            groups[delta].append(student_id)
+
+    for (total, present), student_ids in groups.items():
+        AttendanceSummary.objects.filter(subject_id=subject_id, student_id__in=student_ids).update(
+            total=F('total') + total,
+            present=F('present') + present,
+        )
+
+
+def summary_counts_from_attendance():
+    """Aggregate the raw rows into {(student_id, subject_id): (total, present)}.
+
+    Archived rows from closed terms are included, matching what the summary
+    table has counted since they were first marked.
+    """
+    counts = defaultdict(lambda: (0, 0))
+    for model in (Attendance, ArchivedAttendance):
+        rows = model.objects.values('student_id', 'subject_id').annotate(
+            total=Count('id'),
+            present=Count('id', filter=Q(is_present=True)),
+        ).order_by()
+        for row in rows.iterator():
+            key = (row['student_id'], row['subject_id'])
+            total, present = counts[key]
+            counts[key] = (total + row['total'], present + row['present'])
+    return dict(counts)
+
+
+def rebuild_attendance_summaries():
+    """Recreate every AttendanceSummary row from the raw Attendance table"""
+    counts = summary_counts_from_attendance()
+    with transaction.atomic():
+        AttendanceSummary.objects.all().delete()
+        AttendanceSummary.objects.bulk_create(
+            [
+                AttendanceSummary(student_id=student_id, subject_id=subject_id, total=total, present=present)
+                for (student_id, subject_id), (total, present) in counts.items()
+            ],
+            batch_size=BULK_BATCH_SIZE,
+        )
+    return len(counts)
+
+
+def verify_attendance_summaries():
+    """Compare AttendanceSummary with the raw rows and return the mismatches.
+
+    Each mismatch is a (student_id, subject_id, expected, actual) tuple where
+    expected/actual are (total, present) pairs, or None when the row is missing.
+    """
+    expected = summary_counts_from_attendance()
+    actual = {
+        (row['student_id'], row['subject_id']): (row['total'], row['present'])
+        for row in AttendanceSummary.objects.values('student_id', 'subject_id', 'total', 'present').iterator()
+    }
+
+    mismatches = []
+    for key in expected.keys() | actual.keys():
+        expected_counts = expected.get(key)
+        actual_counts = actual.get(key)
+        # A zeroed summary row is equivalent to no rows at all
+        if actual_counts == (0, 0) and expected_counts is None:
+            continue
+        if expected_counts != actual_counts:
+            mismatches.append((key[0], key[1], expected_counts, actual_counts))
+    return sorted(mismatches)
+
+
+def parse_present(value):
+    """True or False from a JSON boolean or the strings "true"/"false", else None.
+
+    bool() would read "false" and "0" from an offline payload as present.
+    """
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str) and value.strip().lower() in ('true', 'false'):
+        return value.strip().lower() == 'true'
+    return None
+
+
+def sync_attendance_sheets(teacher, sheets):
+    """Apply a batch of offline attendance sheets, skipping ones already applied.
+
+    Each sheet is a dict with ``key`` (client-generated idempotency key),
+    ``subject`` (id), ``date`` (YYYY-MM-DD), ``period`` and ``marks`` mapping
+    student id -> true/false (see parse_present), holding only the students
+    that changed. A sheet whose key has been seen before is not written
+    again; its original counts are returned with status ``duplicate``.
+
+    Returns one result dict per sheet, in request order.
+    """
+    keys = [str(sheet.get('key', '')) for sheet in sheets]
+    seen = {
+        sync_key.key: sync_key
+        for sync_key in AttendanceSyncKey.objects.filter(teacher=teacher, key__in=[key for key in keys if key])
+    }
+    subjects = {subject.id: subject for subject in Subject.objects.filter(teacher=teacher)}
+    valid_periods = {period for period, _ in TimeTable.PERIOD_CHOICES}
+
+    # Resolve every student id named in the batch in one query
+    student_ids = set()
+    for sheet in sheets:
+        marks = sheet.get('marks')
+        if isinstance(marks, dict):
+            student_ids.update(int(student_id) for student_id in marks if str(student_id).isdigit())
+    semester_of = dict(Student.objects.filter(id__in=student_ids).values_list('id', 'semester'))
+
+    results = []
+    for key, sheet in zip(keys, sheets):
+        result = {'key': key}
+        results.append(result)
+
+        if key in seen:
+            sync_key = seen[key]
+            result.update(status='duplicate', created=sync_key.created,
+                          updated=sync_key.updated, unchanged=sync_key.unchanged)
+            continue
+
+        subject_id = str(sheet.get('subject', ''))
+        subject = subjects.get(int(subject_id)) if subject_id.isdigit() else None
+        marks = sheet.get('marks')
+        try:
+            sheet_date = date_cls.fromisoformat(str(sheet.get('date')))
+        except ValueError:
+            sheet_date = None
+
+        if not key or len(key) > 64:
+            result.update(status='error', error='Missing or invalid idempotency key')
+        elif subject is None:
+            result.update(status='error', error='Subject not found')
+        elif sheet_date is None:
+            result.update(status='error', error='Invalid date')
+        elif sheet.get('period') not in valid_periods:
+            result.update(status='error', error='Invalid period')
+        elif not isinstance(marks, dict) or any(parse_present(value) is None for value in marks.values()):
+            result.update(status='error', error='Marks must map student ids to true/false')
+        else:
+            sheet_marks = {
+                int(student_id): parse_present(is_present)
+                for student_id, is_present in marks.items()
+                if str(student_id).isdigit() and semester_of.get(int(student_id)) == subject.semester
+            }
+            try:
+                with transaction.atomic():
+                    counts = bulk_mark_attendance(subject, sheet_date, sheet['period'], sheet_marks, teacher)
+                    # The unique key makes a concurrent replay of this sheet roll back here
+                    seen[key] = AttendanceSyncKey.objects.create(
+                        key=key, teacher=teacher, subject=subject,
+                        date=sheet_date, period=sheet['period'], **counts
+                    )
+            except ValidationError as e:
+                result.update(status='error', error=e.messages[0])
+            except IntegrityError:
+                result.update(status='duplicate', created=0, updated=0, unchanged=len(sheet_marks))
+            else:
+                result.update(status='applied', ignored=len(marks) - len(sheet_marks), **counts)
+
+    return results
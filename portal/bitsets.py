@@ -0,0 +1,207 @@
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from datetime import timedelta
+from django.db import transaction
+from .models import Attendance, ArchivedAttendance, AttendanceBitmap, Subject, TimeTable
+
+# Position of each period within a day, in timetable order
+PERIOD_ORDER = {period: index for index, (period, _) in enumerate(TimeTable.PERIOD_CHOICES)}
+DAY_NAMES = [day for day, _ in TimeTable.DAYS_CHOICES]
+
+
+# Encoding
+
+def encode(flags):
+    """Pack a sequence of booleans into little-endian bytes, flag ``i`` -> bit ``i``"""
+    value = 0
+    for index, flag in enumerate(flags):
+        if flag:
+            value |= 1 << index
+    return from_int(value, len(flags))
+
+
+def decode(data, length):
+    """Unpack ``length`` booleans from bytes produced by encode()"""
+    value = to_int(data)
+    return [bool(value >> index & 1) for index in range(length)]
+
+
+def to_int(data):
+    return int.from_bytes(bytes(data), 'little')
+
+
+def from_int(value, length):
+    return value.to_bytes((length + 7) // 8, 'little')
+
+
+def popcount(value):
+    return bin(value).count('1')
+
+
+def longest_run(value):
+    """Length of the longest run of consecutive set bits"""
+    run = 0
+    while value:
+        value &= value >> 1
+        run += 1
+    return run
+
+
+def range_mask(start, stop):
+    """Bits ``start`` (inclusive) to ``stop`` (exclusive) set"""
+    return ((1 << max(stop - start, 0)) - 1) << start
+
+
+# Queries on a bitmap
+
+def present_count(bitmap):
+    return popcount(to_int(bitmap.present))
+
+
+def recorded_count(bitmap):
+    return popcount(to_int(bitmap.recorded))
+
+
+def absent_count(bitmap):
+    return popcount(to_int(bitmap.recorded) & ~to_int(bitmap.present))
+
+
+def longest_streak(bitmap):
+    """Most consecutive scheduled sessions attended"""
+    return longest_run(to_int(bitmap.present))
+
+
+def percentage_between(bitmap, grid, start, end):
+    """Attendance percentage over sessions dated ``start`` to ``end`` inclusive.
+
+    ``grid`` is the session list the bitmap was built from (session_grid()).
+    """
+    dates = [session_date for session_date, _ in grid]
+    mask = range_mask(bisect_left(dates, start), bisect_right(dates, end))
+    recorded = popcount(to_int(bitmap.recorded) & mask)
+    present = popcount(to_int(bitmap.present) & mask)
+    return round(present / recorded * 100, 1) if recorded else 0
+
+
+# Building bitmaps
+
+def session_grid(slots, start, end):
+    """List every scheduled (date, period) between ``start`` and ``end`` inclusive.
+
+    ``slots`` are the (day, period) pairs a subject occupies in a batch
+    timetable. Sessions are ordered by date, then by period within the day.
+    """
+    periods_by_day = defaultdict(list)
+    for day, period in slots:
+        periods_by_day[day].append(period)
+    for periods in periods_by_day.values():
+        periods.sort(key=PERIOD_ORDER.get)
+
+    grid = []
+    current = start
+    while current <= end:
+        if current.weekday() < len(DAY_NAMES):
+            for period in periods_by_day.get(DAY_NAMES[current.weekday()], ()):
+                grid.append((current, period))
+        current += timedelta(days=1)
+    return grid
+
+
+def grid_for(batch, subject, term):
+    slots = TimeTable.objects.filter(batch=batch, subject=subject).values_list('day', 'period')
+    return session_grid(slots, term.start_date, term.end_date)
+
+
+def build_term_bitmaps(term, subjects=None):
+    """(Re)build AttendanceBitmap rows for every student and subject in ``term``.
+
+    Reads the live and archived Attendance rows for each batch and subject
+    once. The students are the ones with rows in the term, not whoever is
+    in the subject's semester now, so past terms keep their own cohort.
+    Rows that do not fall on the timetable grid (extra classes) have no bit
+    and are skipped. Returns (bitmaps written, off-grid rows skipped).
+    """
+    if subjects is None:
+        subjects = Subject.objects.all()
+    slots_by_key = defaultdict(list)
+    for batch, subject_id, day, period in TimeTable.objects.filter(
+        subject__in=subjects
+    ).values_list('batch', 'subject_id', 'day', 'period'):
+        slots_by_key[(batch, subject_id)].append((day, period))
+
+    written = 0
+    skipped = 0
+
+    for (batch, subject_id), slots in slots_by_key.items():
+        grid = session_grid(slots, term.start_date, term.end_date)
+        index = {session: position for position, session in enumerate(grid)}
+
+        student_ids = set()
+        recorded = defaultdict(int)
+        present = defaultdict(int)
+        for model in (Attendance, ArchivedAttendance):
+            rows = model.objects.filter(
+                subject_id=subject_id,
+                student__batch=batch,
+                date__gte=term.start_date,
+                date__lte=term.end_date,
+            ).values_list('student_id', 'date', 'period', 'is_present')
+            for student_id, session_date, period, is_present in rows.iterator():
+                student_ids.add(student_id)
+                position = index.get((session_date, period))
+                if position is None:
+                    skipped += 1
+                    continue
+                recorded[student_id] |= 1 << position
+                if is_present:
+                    present[student_id] |= 1 << position
+        if not student_ids:
+            continue
+
+        with transaction.atomic():
+            AttendanceBitmap.objects.filter(term=term, subject_id=subject_id, student_id__in=student_ids).delete()
+            AttendanceBitmap.objects.bulk_create([
+                AttendanceBitmap(
+                    student_id=student_id,
+                    subject_id=subject_id,
+                    term=term,
+                    session_count=len(grid),
+                    recorded=from_int(recorded[student_id], len(grid)),
+                    present=from_int(present[student_id], len(grid)),
+                )
+                for student_id in student_ids
+            ], batch_size=500)
+        written += len(student_ids)
+
+    return written, skipped
+
+
+# History
+
+def term_history(student):
+    """Per-term, per-subject attendance figures for ``student`` from their bitmaps.
+
+    One query; every figure is a popcount on the stored bits. Returns
+    [{'term', 'subjects': [{'subject', 'present', 'recorded', 'absent',
+    'percentage', 'streak'}]}], latest term first.
+    """
+    bitmaps = (
+        AttendanceBitmap.objects.filter(student=student)
+        .select_related('term', 'subject')
+        .order_by('-term__start_date', 'subject__code')
+    )
+    history = []
+    for bitmap in bitmaps:
+        if not history or history[-1]['term'].id != bitmap.term_id:
+            history.append({'term': bitmap.term, 'subjects': []})
+        present = present_count(bitmap)
+        recorded = recorded_count(bitmap)
+        history[-1]['subjects'].append({
+            'subject': bitmap.subject,
+            'present': present,
+            'recorded': recorded,
+            'absent': recorded - present,
+            'percentage': round(present / recorded * 100, 1) if recorded else 0,
+            'streak': longest_streak(bitmap),
+        })
+    return history
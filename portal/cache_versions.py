@@ -0,0 +1,51 @@
+import time
+from urllib.parse import quote
+from django.core.cache import cache
+from django.db import transaction
+
+# Caches that are retired by scope rather than key by key. A cached value's
+# key embeds the current version token of every scope it depends on. Bumping
+# a scope writes a new token, so values cached under the old one are never
+# read again and simply age out; no key pattern deletes are needed.
+
+
+def version_key(prefix, scope):
+    # Scopes can hold batch names, and memcached does not accept spaces in keys
+    return f'{prefix}:version:{quote(str(scope), safe=":")}'
+
+
+def versions(prefix, scopes):
+    """The current tokens of ``scopes``, joined into one string for a cache key.
+
+    A version key the cache has evicted is seeded with a fresh token rather
+    than read as a fixed default, which would serve again whatever was
+    cached under that default before the eviction.
+    """
+    version_keys = [version_key(prefix, scope) for scope in scopes]
+    tokens = cache.get_many(version_keys)
+    missing = [key for key in version_keys if key not in tokens]
+    if missing:
+        token = time.time_ns()
+        for key in missing:
+            cache.add(key, token, None)
+        # add() loses to a concurrent bump; read back whichever won
+        seeded = cache.get_many(missing)
+        tokens.update({key: seeded.get(key, token) for key in missing})
+    return '.'.join(str(tokens[key]) for key in version_keys)
+
+
+def bump(prefix, *scopes):
+    """Give ``scopes`` new tokens once the current transaction commits; None scopes are skipped.
+
+    Bumping after the commit means a request racing the write cannot cache
+    the pre-commit state under the new token.
+    """
+    version_keys = [version_key(prefix, scope) for scope in scopes if scope is not None]
+    if not version_keys:
+        return
+
+    def write():
+        token = time.time_ns()
+        cache.set_many({key: token for key in version_keys}, None)
+
+    transaction.on_commit(write)
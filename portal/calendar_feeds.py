@@ -0,0 +1,132 @@
+import hashlib
+from datetime import datetime, time as time_cls, timedelta, timezone as dt_timezone
+from urllib.parse import quote
+from django.contrib.auth.models import User
+from django.core import signing
+from django.core.cache import cache
+from django.utils import timezone
+from .models import AcademicTerm, TimeTable
+from .timetables import TIMETABLE_CACHE_TIMEOUT, TIMETABLE_DAYS, timetable_cache_key, schedule_index
+
+FEED_TOKEN_SALT = 'portal.calendar_feeds'
+ICS_PRODID = '-//Yenepoya Portal//Timetable//EN'
+
+
+# Per-user feed tokens. Calendar apps cannot log in, so the feed URL itself
+# carries a signed user id; it stays valid until SECRET_KEY changes.
+
+def feed_token(user):
+    return signing.Signer(salt=FEED_TOKEN_SALT).sign(str(user.pk))
+
+
+def user_from_token(token):
+    try:
+        user_id = signing.Signer(salt=FEED_TOKEN_SALT).unsign(token)
+    except signing.BadSignature:
+        return None
+    return User.objects.filter(pk=user_id, is_active=True).first()
+
+
+# Period times. PERIOD_CHOICES labels use a 12-hour clock without am/pm
+# ('12:30 - 1:30'); classes run 8 to 5, so hours below 8 are afternoon.
+
+def _parse_clock(label):
+    hour, minute = (int(part) for part in label.strip().split(':'))
+    if hour < 8:
+        hour += 12
+    return time_cls(hour, minute)
+
+
+PERIOD_TIMES = {
+    period: tuple(_parse_clock(part) for part in label.split('-'))
+    for period, label in TimeTable.PERIOD_CHOICES
+}
+
+
+# Building feeds
+
+def _escape(text):
+    return str(text).replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,').replace('\n', '\\n')
+
+
+def _fold(line):
+    """Split content lines longer than 75 octets, as RFC 5545 requires"""
+    data = line.encode('utf-8')
+    if len(data) <= 75:
+        return line
+    parts = []
+    while data:
+        cut = 75 if not parts else 74
+        # Never split inside a multi-byte character
+        while cut < len(data) and (data[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(data[:cut].decode('utf-8'))
+        data = data[cut:]
+    return '\r\n '.join(parts)
+
+
+def _utc_stamp(day, clock):
+    local = timezone.make_aware(datetime.combine(day, clock))
+    return local.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def _feed_window():
+    """(first Monday, last day) covered by the weekly recurrences.
+
+    Uses the current open AcademicTerm when there is one, otherwise starts
+    this week and recurs without an end.
+    """
+    today = timezone.localdate()
+    term = AcademicTerm.objects.filter(is_closed=False, end_date__gte=today).order_by('start_date').first()
+    start = term.start_date if term else today
+    return start - timedelta(days=start.weekday()), term.end_date if term else None
+
+
+def build_calendar(name, entries):
+    week_start, until = _feed_window()
+    stamp = timezone.now().astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+    lines = [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        f'PRODID:{ICS_PRODID}',
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+        f'X-WR-CALNAME:{_escape(name)}',
+    ]
+    for entry in entries:
+        if entry['period'] not in PERIOD_TIMES or entry['day'] not in TIMETABLE_DAYS:
+            continue
+        day = week_start + timedelta(days=TIMETABLE_DAYS.index(entry['day']))
+        start, end = PERIOD_TIMES[entry['period']]
+        rule = 'RRULE:FREQ=WEEKLY'
+        if until:
+            rule += f';UNTIL={_utc_stamp(until, time_cls(23, 59, 59))}'
+        lines += [
+            'BEGIN:VEVENT',
+            f"UID:{quote(entry['batch'])}-{entry['day']}-{quote(entry['period'])}@yenepoya-portal",
+            f'DTSTAMP:{stamp}',
+            f'DTSTART:{_utc_stamp(day, start)}',
+            f'DTEND:{_utc_stamp(day, end)}',
+            rule,
+            f"SUMMARY:{_escape(entry['subject_name'])} ({_escape(entry['subject_code'])})",
+            f"LOCATION:{_escape(entry['room'])}",
+            f"DESCRIPTION:{_escape(entry['batch'])} - {_escape(entry['teacher_name'])}",
+            'END:VEVENT',
+        ]
+    lines.append('END:VCALENDAR')
+    return '\r\n'.join(_fold(line) for line in lines) + '\r\n'
+
+
+def calendar_feed(kind, key):
+    """(body, strong ETag) of the ICS feed for a batch or teacher, built once per timetable version"""
+    # A batch feed only changes with its own batch; a teacher's can change with any
+    scopes = ['all', f'batch:{key}'] if kind == 'batch' else ['all', 'batches']
+    cache_key = timetable_cache_key(f'ics:{kind}:{quote(str(key))}', scopes)
+    feed = cache.get(cache_key)
+    if feed is None:
+        entries = schedule_index()[kind].get(key, [])
+        name = f'{key} Timetable' if kind == 'batch' else 'My Teaching Timetable'
+        body = build_calendar(name, entries)
+        feed = (body, '"%s"' % hashlib.sha256(body.encode('utf-8')).hexdigest())
+        cache.set(cache_key, feed, TIMETABLE_CACHE_TIMEOUT)
+    return feed
@@ -0,0 +1,314 @@
+import hashlib
+import os
+import re
+import uuid
+from collections import OrderedDict
+from datetime import timedelta
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import UploadedFile
+from django.db import transaction
+from django.utils import timezone
+from django.utils.text import get_valid_filename
+from .forms import AssignmentSubmissionForm, MaterialForm
+from .models import Assignment, AssignmentSubmission, Subject, UploadSession
+
+# Chunks are read from the request and written to disk this many bytes at a
+# time, so a worker never holds more than one block of a file in memory
+BLOCK_SIZE = 64 * 1024
+
+# Size the client is told to send, and the most one request may carry
+CHUNK_SIZE = 4 * 1024 * 1024
+MAX_CHUNK_SIZE = 16 * 1024 * 1024
+
+UPLOAD_SIZE_LIMITS = {
+    'submission': 100 * 1024 * 1024,
+    'material': 500 * 1024 * 1024,
+}
+MAX_OPEN_UPLOADS = 5
+STALE_UPLOAD_AGE = timedelta(days=1)
+
+_SHA256_RE = re.compile(r'^[0-9a-f]{64}$')
+
+# Running SHA-256 of recent sessions in this process: upload id -> (offset,
+# hasher). hashlib objects cannot be stored in the database, so a chunk that
+# lands on another worker rebuilds the digest from the part file instead.
+_hashers = OrderedDict()
+_MAX_HASHERS = 64
+
+
+def part_path(session):
+    return os.path.join(settings.CHUNKED_UPLOAD_DIR, f'{session.upload_id}.part')
+
+
+def _remove_file(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _remove_part(session):
+    _remove_file(part_path(session))
+
+
+def _hasher_at(session):
+    """SHA-256 of the first ``session.received`` bytes of the part file"""
+    offset, hasher = _hashers.pop(session.upload_id, (None, None))
+    if offset == session.received:
+        return hasher
+
+    hasher = hashlib.sha256()
+    remaining = session.received
+    with open(part_path(session), 'rb') as part:
+        while remaining:
+            block = part.read(min(BLOCK_SIZE, remaining))
+            if not block:
+                break
+            hasher.update(block)
+            remaining -= len(block)
+    return hasher
+
+
+def _remember_hasher(session, hasher):
+    _hashers[session.upload_id] = (session.received, hasher)
+    while len(_hashers) > _MAX_HASHERS:
+        _hashers.popitem(last=False)
+
+
+def _locked_session(user, upload_id):
+    """The user's session, row-locked for the rest of the transaction"""
+    return UploadSession.objects.select_for_update().get(upload_id=upload_id, user=user)
+
+
+def _offset_error(received):
+    return ValidationError('Expected offset %(received)s.', code='offset', params={'received': received})
+
+
+def _receive_chunk(session, offset, stream):
+    """Spool ``stream`` to a file of its own next to the part file; returns (path, length)"""
+    path = f'{part_path(session)}.{uuid.uuid4().hex}.chunk'
+    written = 0
+    try:
+        with open(path, 'wb') as chunk:
+            while True:
+                block = stream.read(BLOCK_SIZE)
+                if not block:
+                    break
+                written += len(block)
+                if written > MAX_CHUNK_SIZE or offset + written > session.size:
+                    raise ValidationError('The chunk is too large.')
+                chunk.write(block)
+    except BaseException:
+        _remove_file(path)
+        raise
+    return path, written
+
+
+class ChunkedUploadedFile(UploadedFile):
+    """A finished part file; FileSystemStorage moves it into MEDIA_ROOT instead of copying it"""
+
+    def __init__(self, path, name, size, sha256):
+        super().__init__(open(path, 'rb'), name, None, size, None)
+        self.path = path
+        self.sha256 = sha256
+
+    def temporary_file_path(self):
+        return self.path
+
+    def close(self):
+        try:
+            return self.file.close()
+        except FileNotFoundError:
+            # The file was moved, so there is nothing to close
+            pass
+
+
+# Protocol steps
+
+def start_upload(user, target, filename, size, sha256=''):
+    """Open an UploadSession with an empty part file.
+
+    ``sha256`` is the optional hex digest of the whole file, checked on
+    finalize. Raises ValidationError for a bad target, name or size.
+    """
+    if target not in UPLOAD_SIZE_LIMITS:
+        raise ValidationError('Unknown upload target.')
+    if target == 'submission' and not hasattr(user, 'student'):
+        raise ValidationError('Only students can upload submissions.')
+    if target == 'material' and not hasattr(user, 'teacher'):
+        raise ValidationError('Only teachers can upload materials.')
+
+    filename = get_valid_filename(os.path.basename(str(filename or '')))[:255] if filename else ''
+    if not filename:
+        raise ValidationError('A file name is required.')
+    if not isinstance(size, int) or isinstance(size, bool) or size <= 0:
+        raise ValidationError('The file size must be a positive number of bytes.')
+    if size > UPLOAD_SIZE_LIMITS[target]:
+        raise ValidationError(f'Files may be at most {UPLOAD_SIZE_LIMITS[target] // (1024 * 1024)} MB.')
+    sha256 = str(sha256 or '').lower()
+    if sha256 and not _SHA256_RE.match(sha256):
+        raise ValidationError('sha256 must be a hex SHA-256 digest.')
+    if UploadSession.objects.filter(user=user).count() >= MAX_OPEN_UPLOADS:
+        raise ValidationError(f'Finish or cancel your other uploads first (at most {MAX_OPEN_UPLOADS} at a time).')
+
+    session = UploadSession.objects.create(user=user, target=target, filename=filename, size=size, sha256=sha256)
+    os.makedirs(settings.CHUNKED_UPLOAD_DIR, exist_ok=True)
+    open(part_path(session), 'wb').close()
+    return session
+
+
+def append_chunk(user, upload_id, offset, stream):
+    """Write the bytes of ``stream`` at ``offset`` and return the updated session.
+
+    ``offset`` must equal the bytes received so far; anything else raises
+    ValidationError with code 'offset' so the client can resume from
+    ``session.received``. Bytes past ``received`` left by an interrupted
+    request are overwritten.
+
+    The body is spooled to disk before the session row is locked, so a
+    slow client holds no lock; the lock only covers the offset check and
+    a local copy into the part file.
+    """
+    session = UploadSession.objects.get(upload_id=upload_id, user=user)
+    if offset != session.received:
+        raise _offset_error(session.received)
+
+    chunk_path, length = _receive_chunk(session, offset, stream)
+    try:
+        with transaction.atomic():
+            session = _locked_session(user, upload_id)
+            # Another request may have appended while this one was reading
+            if offset != session.received:
+                raise _offset_error(session.received)
+
+            path = part_path(session)
+            if not os.path.exists(path):
+                raise ValidationError('The partial file is gone; start the upload again.', code='missing')
+
+            hasher = _hasher_at(session)
+            with open(path, 'r+b') as part, open(chunk_path, 'rb') as chunk:
+                part.seek(offset)
+                part.truncate()
+                while True:
+                    block = chunk.read(BLOCK_SIZE)
+                    if not block:
+                        break
+                    part.write(block)
+                    hasher.update(block)
+
+            session.received = offset + length
+            session.save(update_fields=['received', 'updated_at'])
+    finally:
+        _remove_file(chunk_path)
+    _remember_hasher(session, hasher)
+    return session
+
+
+def finalize_upload(user, upload_id, data):
+    """Check the assembled file and bind it to its target.
+
+    ``data`` carries the target's form fields: ``assignment_id`` for a
+    submission, or the MaterialForm fields for a material. Returns the saved
+    AssignmentSubmission or Material. The session and its part file are gone
+    afterwards; a failed check raises ValidationError and leaves them be.
+    """
+    with transaction.atomic():
+        session = _locked_session(user, upload_id)
+        if session.received != session.size:
+            raise ValidationError(f'Received {session.received} of {session.size} bytes.', code='incomplete')
+
+        hasher = _hasher_at(session)
+        # Kept in case the target's form fields are rejected and finalize is retried
+        _remember_hasher(session, hasher)
+        digest = hasher.hexdigest()
+        if session.sha256 and digest != session.sha256:
+            raise ValidationError('The file does not match its checksum; start the upload again.', code='checksum')
+
+        upload = ChunkedUploadedFile(part_path(session), session.filename, session.size, digest)
+        try:
+            bound = BINDERS[session.target](user, upload, data)
+        finally:
+            upload.close()
+        session.delete()
+    _hashers.pop(session.upload_id, None)
+    _remove_part(session)
+    return bound
+
+
+def cancel_upload(user, upload_id):
+    with transaction.atomic():
+        session = _locked_session(user, upload_id)
+        session.delete()
+    _hashers.pop(session.upload_id, None)
+    _remove_part(session)
+
+
+def _form_errors(form):
+    return ValidationError([f'{field}: {error}' if field != '__all__' else error
+                            for field, errors in form.errors.items() for error in errors])
+
+
+def _bind_submission(user, upload, data):
+    student = user.student
+    try:
+        assignment = Assignment.objects.get(id=data.get('assignment_id'), subject__semester=student.semester)
+    except (Assignment.DoesNotExist, ValueError, TypeError):
+        raise ValidationError('Unknown assignment.')
+
+    form = AssignmentSubmissionForm(files={'answer_file': upload})
+    if not form.is_valid():
+        raise _form_errors(form)
+
+    submission, created = AssignmentSubmission.objects.get_or_create(
+        assignment=assignment,
+        student=student,
+        defaults={'answer_file': upload}
+    )
+    if not created:
+        submission.answer_file = upload
+        submission.submitted_at = timezone.now()
+        submission.save()
+    return submission
+
+
+def _bind_material(user, upload, data):
+    teacher = user.teacher
+    form = MaterialForm(data, {'file': upload})
+    form.fields['subject'].queryset = Subject.objects.filter(teacher=teacher)
+    if not form.is_valid():
+        raise _form_errors(form)
+
+    material = form.save(commit=False)
+    material.teacher = teacher
+    material.save()
+    return material
+
+
+BINDERS = {
+    'submission': _bind_submission,
+    'material': _bind_material,
+}
+
+
+# Housekeeping
+
+def purge_stale_uploads(older_than=STALE_UPLOAD_AGE):
+    """Drop sessions idle for ``older_than`` and part files without a session"""
+    cutoff = timezone.now() - older_than
+    stale = list(UploadSession.objects.filter(updated_at__lt=cutoff))
+    UploadSession.objects.filter(id__in=[session.id for session in stale]).delete()
+    for session in stale:
+        _hashers.pop(session.upload_id, None)
+        _remove_part(session)
+
+    orphans = 0
+    if os.path.isdir(settings.CHUNKED_UPLOAD_DIR):
+        live = {f'{upload_id}.part' for upload_id in UploadSession.objects.values_list('upload_id', flat=True)}
+        for name in os.listdir(settings.CHUNKED_UPLOAD_DIR):
+            path = os.path.join(settings.CHUNKED_UPLOAD_DIR, name)
+            # Skip files younger than the cutoff; their session may be mid-create
+            if name not in live and os.path.getmtime(path) < cutoff.timestamp():
+                os.remove(path)
+                orphans += 1
+    return len(stale), orphans
@@ -0,0 +1,145 @@
+from django.core.cache import cache
+from django.db.models import Count, Sum
+from django.utils import timezone
+from .cache_versions import bump, versions
+from .models import (
+    Assignment, AssignmentSubmission, AttendanceSummary, Doubt, DoubtCounter, ExamResult, Material, Subject
+)
+
+# Snapshots also expire on their own, as a backstop for writes that bypass signals
+DASHBOARD_CACHE_TIMEOUT = 15 * 60
+DASHBOARD_STATS_KEYS = {'hits': 'dashboard:stats:hits', 'misses': 'dashboard:stats:misses'}
+
+# Most queries one dashboard request may run, cold (snapshot rebuilt) and warm
+# (snapshot cached), whatever the data volume. Warm requests still load the
+# session, the user and both role profiles. Enforced by portal.tests.test_dashboard.
+DASHBOARD_QUERY_BUDGET = {
+    'student': {'cold': 9, 'warm': 4},
+    'teacher': {'cold': 8, 'warm': 4},
+}
+
+# Snapshots are retired through version tokens (portal.cache_versions) for
+# each student, semester and teacher they show.
+
+
+def _scopes_for(user):
+    if hasattr(user, 'student'):
+        student = user.student
+        return 'student', student.id, [f'student:{student.id}', f'semester:{student.semester}']
+    if hasattr(user, 'teacher'):
+        teacher = user.teacher
+        return 'teacher', teacher.id, [f'teacher:{teacher.id}']
+    return None, None, []
+
+
+def _snapshot_key(role, owner_id, scopes):
+    return f'dashboard:snapshot:{role}:{owner_id}:{versions("dashboard", scopes)}'
+
+
+def _count(name):
+    key = DASHBOARD_STATS_KEYS[name]
+    # add() is a no-op when the counter exists, so incr() always has a key
+    cache.add(key, 0, None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+
+
+def build_student_snapshot(student):
+    totals = AttendanceSummary.objects.filter(student=student).aggregate(
+        total=Sum('total'), present=Sum('present')
+    )
+    total_classes = totals['total'] or 0
+    present_classes = totals['present'] or 0
+    attendance_percentage = (present_classes / total_classes * 100) if total_classes > 0 else 0
+
+    # Assignments that are still open now; the view drops any that fall due
+    # while the snapshot is cached
+    pending_assignments = list(
+        Assignment.objects.filter(
+            subject__semester=student.semester,
+            due_date__gte=timezone.now()
+        ).exclude(submissions__student=student).select_related('subject').order_by('due_date')
+    )
+
+    return {
+        'attendance_percentage': round(attendance_percentage, 1),
+        'pending_assignments': pending_assignments,
+        'unresolved_doubts': Doubt.objects.filter(student=student, is_resolved=False).count(),
+        'recent_materials': list(
+            Material.objects.filter(subject__semester=student.semester, is_active=True)
+            .select_related('subject', 'teacher__user')
+            .order_by('-uploaded_at')[:5]
+        ),
+        'recent_results': list(
+            ExamResult.objects.filter(student=student).select_related('subject').order_by('-published_at')[:3]
+        ),
+    }
+
+
+def build_teacher_snapshot(teacher):
+    subjects = list(Subject.objects.filter(teacher=teacher))
+    return {
+        'subjects': subjects,
+        'subjects_count': len(subjects),
+        'pending_doubts': DoubtCounter.objects.filter(teacher=teacher).values_list('unresolved', flat=True).first() or 0,
+        'recent_assignments': list(
+            Assignment.objects.filter(teacher=teacher)
+            .select_related('subject')
+            .annotate(submission_count=Count('submissions'))
+            .order_by('-created_at')[:5]
+        ),
+        'recent_submissions': list(
+            AssignmentSubmission.objects.filter(assignment__teacher=teacher)
+            .select_related('assignment', 'student__user')
+            .order_by('-submitted_at')[:5]
+        ),
+    }
+
+
+def dashboard_snapshot(user):
+    """Cached dashboard context for ``user``, or None for users with no role"""
+    role, owner_id, scopes = _scopes_for(user)
+    if role is None:
+        return None
+
+    key = _snapshot_key(role, owner_id, scopes)
+    snapshot = cache.get(key)
+    if snapshot is not None:
+        _count('hits')
+        return snapshot
+
+    _count('misses')
+    if role == 'student':
+        snapshot = build_student_snapshot(user.student)
+    else:
+        snapshot = build_teacher_snapshot(user.teacher)
+    cache.set(key, snapshot, DASHBOARD_CACHE_TIMEOUT)
+    return snapshot
+
+
+def invalidate_dashboards(students=(), semesters=(), teachers=()):
+    """Retire the cached dashboards of the given student, semester and teacher ids.
+
+    Runs after the surrounding transaction commits, so a request racing the
+    write cannot cache the pre-commit state under the new version.
+    """
+    bump(
+        'dashboard',
+        *[f'student:{student_id}' for student_id in students],
+        *[f'semester:{semester}' for semester in semesters],
+        *[f'teacher:{teacher_id}' for teacher_id in teachers if teacher_id],
+    )
+
+
+def dashboard_cache_stats():
+    counts = cache.get_many(list(DASHBOARD_STATS_KEYS.values()))
+    stats = {name: counts.get(key, 0) for name, key in DASHBOARD_STATS_KEYS.items()}
+    lookups = stats['hits'] + stats['misses']
+    stats['hit_rate'] = round(stats['hits'] / lookups * 100, 1) if lookups else 0
+    return stats
+
+
+def reset_dashboard_cache_stats():
+    cache.delete_many(list(DASHBOARD_STATS_KEYS.values()))
@@ -0,0 +1,113 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.db.models import Count, F, Prefetch, Q
+from .dashboard_cache import invalidate_dashboards
+from .models import Doubt, DoubtCounter, DoubtReply, Subject
+
+INBOX_PAGE_SIZE = 20
+INBOX_ORDER = ('is_resolved', '-asked_at', '-id')
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+# Unresolved counters
+
+def adjust_unresolved(deltas):
+    """Shift DoubtCounter.unresolved by {teacher id: delta} with F() updates.
+
+    Rows are created on the first increment only: a decrement can come from
+    a cascade that is deleting the teacher as well.
+    """
+    deltas = {teacher_id: delta for teacher_id, delta in deltas.items() if teacher_id and delta}
+    new_ids = [teacher_id for teacher_id, delta in deltas.items() if delta > 0]
+    if new_ids:
+        DoubtCounter.objects.bulk_create(
+            [DoubtCounter(teacher_id=teacher_id) for teacher_id in new_ids], ignore_conflicts=True
+        )
+    for teacher_id, delta in deltas.items():
+        DoubtCounter.objects.filter(teacher_id=teacher_id).update(unresolved=F('unresolved') + delta)
+
+
+def recount_unresolved(teacher_ids=None):
+    """Recompute counters from the doubts themselves, for all teachers or the given ones"""
+    subjects = Subject.objects.exclude(teacher=None)
+    if teacher_ids is not None:
+        subjects = subjects.filter(teacher_id__in=[teacher_id for teacher_id in teacher_ids if teacher_id])
+    counts = dict(
+        subjects.values('teacher_id')
+        .annotate(unresolved=Count('doubt', filter=Q(doubt__is_resolved=False)))
+        .values_list('teacher_id', 'unresolved')
+    )
+    if teacher_ids is not None:
+        counts = {teacher_id: counts.get(teacher_id, 0) for teacher_id in teacher_ids if teacher_id}
+    DoubtCounter.objects.bulk_create(
+        [DoubtCounter(teacher_id=teacher_id) for teacher_id in counts], ignore_conflicts=True
+    )
+    for teacher_id, unresolved in counts.items():
+        DoubtCounter.objects.filter(teacher_id=teacher_id).update(unresolved=unresolved)
+
+
+def unresolved_count(teacher):
+    return DoubtCounter.objects.filter(teacher=teacher).values_list('unresolved', flat=True).first() or 0
+
+
+def resolve_doubt(doubt):
+    """Mark ``doubt`` resolved with a single-column UPDATE.
+
+    Doubt's signals do not fire, so its teacher's counter and the affected
+    dashboards are updated here; a doubt already resolved changes nothing.
+    """
+    resolved = Doubt.objects.filter(pk=doubt.pk, is_resolved=False).update(is_resolved=True)
+    doubt.is_resolved = True
+    if resolved:
+        teacher_id = Subject.objects.filter(pk=doubt.subject_id).values_list('teacher_id', flat=True).first()
+        adjust_unresolved({teacher_id: -1})
+        invalidate_dashboards(students=[doubt.student_id], teachers=[teacher_id])
+    return bool(resolved)
+
+
+# Keyset pagination
+
+def encode_cursor(doubt):
+    micros = (doubt.asked_at - _EPOCH) // timedelta(microseconds=1)
+    return f'{int(doubt.is_resolved)}.{micros}.{doubt.id}'
+
+
+def decode_cursor(cursor):
+    """(is_resolved, asked_at, id) from encode_cursor(), or None if malformed"""
+    try:
+        resolved, micros, doubt_id = (int(part) for part in cursor.split('.'))
+        return bool(resolved), _EPOCH + timedelta(microseconds=micros), doubt_id
+    except (AttributeError, ValueError, OverflowError):
+        return None
+
+
+def inbox_page(teacher, cursor=None, size=INBOX_PAGE_SIZE):
+    """One page of a teacher's doubts, unresolved first and newest first within each.
+
+    ``cursor`` is the ``next_cursor`` of the previous page. Rows after it are
+    found by seeking the doubt_inbox_order index rather than counting an
+    OFFSET, so deep pages cost the same as the first. Two queries: the page
+    with students and subjects, then the replies with their teachers.
+    """
+    doubts = Doubt.objects.filter(subject__teacher=teacher)
+    position = decode_cursor(cursor) if cursor else None
+    if position:
+        resolved, asked_at, doubt_id = position
+        doubts = doubts.filter(
+            Q(is_resolved__gt=resolved)
+            | Q(is_resolved=resolved, asked_at__lt=asked_at)
+            | Q(is_resolved=resolved, asked_at=asked_at, id__lt=doubt_id)
+        )
+    rows = list(
+        doubts.select_related('student__user', 'subject')
+        .prefetch_related(Prefetch(
+            'replies', queryset=DoubtReply.objects.select_related('teacher__user').order_by('replied_at')
+        ))
+        .order_by(*INBOX_ORDER)[:size + 1]
+    )
+    page = rows[:size]
+    return {
+        'doubts': page,
+        'next_cursor': encode_cursor(page[-1]) if len(rows) > size else None,
+        'is_first_page': position is None,
+    }
@@ -0,0 +1,163 @@
+import math
+import re
+import threading
+from collections import defaultdict
+from django.core.paginator import Paginator
+from django.db import connection
+from django.db.models import Max, Prefetch
+from django.db.models.expressions import RawSQL
+from .cache_versions import bump, versions
+from .models import Doubt, DoubtReply
+
+DOUBT_SEARCH_PAGE_SIZE = 10
+# Ranked candidates considered per query, from doubts and from replies each
+MAX_SEARCH_CANDIDATES = 200
+SUGGESTION_LIMIT = 5
+
+# A match in the title counts this many times a match in the question or a reply
+TITLE_WEIGHT = 2
+
+_TOKEN_RE = re.compile(r'\w+')
+_STOPWORDS = frozenset('''
+    a an and are as at be but by can do does for from how i in is it its me my of on or so that the
+    this to was what when where which who why will with you your
+'''.split())
+
+
+def tokenize(text):
+    return [token for token in _TOKEN_RE.findall(text.lower()) if len(token) > 1 and token not in _STOPWORDS]
+
+
+# MySQL: FULLTEXT indexes from migration 0021
+
+_DOUBT_MATCH = 'MATCH (portal_doubt.title, portal_doubt.question) AGAINST (%s IN NATURAL LANGUAGE MODE)'
+_REPLY_MATCH = 'MATCH (portal_doubtreply.reply) AGAINST (%s IN NATURAL LANGUAGE MODE)'
+
+
+def _mysql_scores(query, scope):
+    """{doubt id: relevance} from the FULLTEXT indexes, in two queries"""
+    scores = defaultdict(float)
+    doubt_hits = (
+        scope.annotate(score=RawSQL(_DOUBT_MATCH, [query]))
+        .filter(score__gt=0)
+        .order_by('-score')
+        .values_list('id', 'score')[:MAX_SEARCH_CANDIDATES]
+    )
+    for doubt_id, score in doubt_hits:
+        scores[doubt_id] += score * TITLE_WEIGHT
+    reply_hits = (
+        DoubtReply.objects.filter(doubt__in=scope)
+        .annotate(score=RawSQL(_REPLY_MATCH, [query]))
+        .filter(score__gt=0)
+        .values('doubt_id')
+        .annotate(best=Max('score'))
+        .order_by('-best')
+        .values_list('doubt_id', 'best')[:MAX_SEARCH_CANDIDATES]
+    )
+    for doubt_id, score in reply_hits:
+        scores[doubt_id] += score
+    return scores
+
+
+# Everything else (SQLite test runs): an inverted index held in this process,
+# rebuilt when a doubt or reply changes
+
+class InvertedIndex:
+    def __init__(self, version):
+        self.version = version
+        self.postings = defaultdict(dict)  # term -> {doubt id: weighted term count}
+        self.doubt_count = 0
+
+    def add(self, doubt_id, text, weight=1):
+        for term in tokenize(text):
+            posting = self.postings[term]
+            posting[doubt_id] = posting.get(doubt_id, 0) + weight
+
+    def scores(self, terms, allowed_ids):
+        """tf-idf relevance of the ``allowed_ids`` doubts containing any of ``terms``"""
+        scores = defaultdict(float)
+        for term in set(terms):
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+            idf = math.log(1 + self.doubt_count / len(posting))
+            for doubt_id, count in posting.items():
+                if doubt_id in allowed_ids:
+                    scores[doubt_id] += (1 + math.log(count)) * idf
+        return scores
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def _current_version():
+    # Shared through the cache, so a change seen by one worker rebuilds every worker's index
+    return versions('doubt_search', ['index'])
+
+
+def inverted_index():
+    global _index
+    version = _current_version()
+    with _index_lock:
+        if _index is None or _index.version != version:
+            index = InvertedIndex(version)
+            for doubt_id, title, question in Doubt.objects.values_list('id', 'title', 'question').iterator():
+                index.add(doubt_id, title, TITLE_WEIGHT)
+                index.add(doubt_id, question)
+                index.doubt_count += 1
+            for doubt_id, reply in DoubtReply.objects.values_list('doubt_id', 'reply').iterator():
+                index.add(doubt_id, reply)
+            _index = index
+        return _index
+
+
+def invalidate_doubt_index():
+    bump('doubt_search', 'index')
+
+
+def _index_scores(query, scope):
+    terms = tokenize(query)
+    if not terms:
+        return {}
+    allowed_ids = set(scope.values_list('id', flat=True))
+    return inverted_index().scores(terms, allowed_ids)
+
+
+# Entry points
+
+def ranked_doubt_ids(query, scope):
+    """Ids of the ``scope`` doubts matching ``query``, best first"""
+    query = query.strip()
+    if not query:
+        return []
+    scores = _mysql_scores(query, scope) if connection.vendor == 'mysql' else _index_scores(query, scope)
+    return sorted(scores, key=lambda doubt_id: (-scores[doubt_id], -doubt_id))[:MAX_SEARCH_CANDIDATES]
+
+
+def _doubts_in_order(ids):
+    doubts = (
+        Doubt.objects.filter(id__in=ids)
+        .select_related('student__user', 'subject')
+        .prefetch_related(Prefetch('replies', queryset=DoubtReply.objects.select_related('teacher__user')))
+        .in_bulk()
+    )
+    return [doubts[doubt_id] for doubt_id in ids if doubt_id in doubts]
+
+
+def search_doubts(query, scope, page=1, per_page=DOUBT_SEARCH_PAGE_SIZE):
+    """One page of ``scope`` doubts matching ``query``, ranked by relevance.
+
+    At most four queries whatever the result count: the ranking (one with
+    the in-process index, two on MySQL), then the page's doubts and their
+    replies.
+    """
+    paginator = Paginator(ranked_doubt_ids(query, scope), per_page)
+    results = paginator.get_page(page)
+    results.object_list = _doubts_in_order(list(results.object_list))
+    return results
+
+
+def similar_doubts(text, scope, limit=SUGGESTION_LIMIT):
+    """Likely duplicates of a doubt being written, best match first"""
+    return _doubts_in_order(ranked_doubt_ids(text, scope)[:limit])
@@ -0,0 +1,164 @@
+from collections import defaultdict
+from datetime import timedelta
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from .models import ExamSchedule, Student, Subject
+
+SESSIONS = [session for session, _ in ExamSchedule.SESSION_CHOICES]
+
+# Sundays have no exams
+EXAM_WEEKDAYS = (0, 1, 2, 3, 4, 5)
+
+
+# Conflict graph
+
+def paper_groups(subjects):
+    """{(semester, batch): (student count, [subject ids])} for the candidates of ``subjects``.
+
+    Every student sits every paper of their semester, so students are only
+    ever counted per (semester, batch) group, never one by one.
+    """
+    subjects_by_semester = defaultdict(list)
+    for subject_id, semester in subjects.values_list('id', 'semester'):
+        subjects_by_semester[semester].append(subject_id)
+
+    counts = Student.objects.filter(semester__in=list(subjects_by_semester)).values_list('semester', 'batch')
+    sizes = defaultdict(int)
+    for semester, batch in counts.iterator():
+        sizes[(semester, batch)] += 1
+    return {group: (size, subjects_by_semester[group[0]]) for group, size in sizes.items()}
+
+
+def conflict_graph(groups):
+    """Sparse adjacency {subject id: set of subject ids sharing a candidate}, plus candidate counts"""
+    adjacency = defaultdict(set)
+    candidates = defaultdict(int)
+    for size, subject_ids in groups.values():
+        for subject_id in subject_ids:
+            candidates[subject_id] += size
+            adjacency[subject_id].update(other for other in subject_ids if other != subject_id)
+    return adjacency, candidates
+
+
+def color_papers(adjacency, candidates, capacity):
+    """DSatur colouring: {subject id: slot index}.
+
+    Papers sharing a candidate never get the same slot, and the papers in a
+    slot never seat more than ``capacity`` candidates. The next paper is the
+    one whose neighbours already use the most distinct slots, ties broken by
+    degree and then by size; it takes the lowest slot that fits.
+    """
+    colors = {}
+    loads = defaultdict(int)
+    neighbour_colors = {paper: set() for paper in candidates}
+    uncolored = set(candidates)
+
+    while uncolored:
+        paper = max(
+            uncolored,
+            key=lambda p: (len(neighbour_colors[p]), len(adjacency[p]), candidates[p], -p),
+        )
+        slot = 0
+        while slot in neighbour_colors[paper] or loads[slot] + candidates[paper] > capacity:
+            slot += 1
+        colors[paper] = slot
+        loads[slot] += candidates[paper]
+        uncolored.discard(paper)
+        for neighbour in adjacency[paper]:
+            if neighbour in uncolored:
+                neighbour_colors[neighbour].add(slot)
+    return colors
+
+
+# Slots and rooms
+
+def exam_slots(start, count, sessions_per_day=2):
+    """The first ``count`` (date, session) slots from ``start``, skipping Sundays"""
+    slots = []
+    day = start
+    while len(slots) < count:
+        if day.weekday() in EXAM_WEEKDAYS:
+            slots.extend((day, session) for session in SESSIONS[:sessions_per_day])
+        day += timedelta(days=1)
+    return slots[:count]
+
+
+def allocate_rooms(papers, candidates, rooms):
+    """Seat the papers of one slot: {subject id: [room names]}.
+
+    Largest papers first; a paper fills rooms in order and may spill into
+    the next one, which the next paper then continues to fill.
+    """
+    seats = [[name, capacity] for name, capacity in rooms]
+    allocation = {}
+    index = 0
+    for paper in sorted(papers, key=lambda p: (-candidates[p], p)):
+        remaining = candidates[paper]
+        allocation[paper] = []
+        while remaining > 0:
+            name, free = seats[index]
+            if free == 0:
+                index += 1
+                continue
+            taken = min(free, remaining)
+            seats[index][1] -= taken
+            remaining -= taken
+            allocation[paper].append(name)
+    return allocation
+
+
+# Entry points
+
+def schedule_exams(exam_type, start, rooms, semesters=None, sessions_per_day=2):
+    """Plan a conflict-free exam timetable for every subject of ``semesters``.
+
+    ``rooms`` is a list of (name, seats). Returns unsaved ExamSchedule rows.
+    Raises ValidationError when a paper alone has more candidates than the
+    rooms can seat.
+    """
+    subjects = Subject.objects.all()
+    if semesters:
+        subjects = subjects.filter(semester__in=semesters)
+
+    adjacency, candidates = conflict_graph(paper_groups(subjects))
+    capacity = sum(seats for _, seats in rooms)
+    too_big = [paper for paper, size in candidates.items() if size > capacity]
+    if too_big:
+        codes = ', '.join(Subject.objects.filter(id__in=too_big[:10]).values_list('code', flat=True))
+        more = f' and {len(too_big) - 10} more' if len(too_big) > 10 else ''
+        raise ValidationError(f'The rooms seat {capacity} candidates, fewer than sit {codes}{more}.')
+
+    colors = color_papers(adjacency, candidates, capacity)
+    slots = exam_slots(start, max(colors.values(), default=-1) + 1, sessions_per_day)
+    papers_by_slot = defaultdict(list)
+    for paper, color in colors.items():
+        papers_by_slot[color].append(paper)
+
+    rows = []
+    for color, papers in sorted(papers_by_slot.items()):
+        date, session = slots[color]
+        for paper, allocated in allocate_rooms(papers, candidates, rooms).items():
+            rows.append(ExamSchedule(
+                exam_type=exam_type,
+                subject_id=paper,
+                date=date,
+                session=session,
+                rooms=', '.join(dict.fromkeys(allocated)),
+                candidates=candidates[paper],
+            ))
+    return sorted(rows, key=lambda row: (row.date, SESSIONS.index(row.session), row.subject_id))
+
+
+def save_exam_schedule(exam_type, rows):
+    """Replace the ``exam_type`` schedule of the planned subjects with ``rows``"""
+    with transaction.atomic():
+        ExamSchedule.objects.filter(exam_type=exam_type, subject_id__in=[row.subject_id for row in rows]).delete()
+        ExamSchedule.objects.bulk_create(rows)
+    return len(rows)
+
+
+def student_exam_schedule(student, exam_type):
+    return (
+        ExamSchedule.objects.filter(exam_type=exam_type, subject__semester=student.semester)
+        .select_related('subject')
+    )
@@ -0,0 +1,146 @@
+import csv
+import io
+from django.db import transaction
+from .dashboard_cache import invalidate_dashboards
+from .models import AssignmentSubmission
+
+MAX_BATCH_GRADES = 1000
+GRADE_CSV_REQUIRED = ('registration_number', 'marks')
+# A blank CSV cell leaves its field as it is; this one clears it
+GRADE_CSV_CLEAR = '-'
+
+
+def _parse_marks(value, max_marks):
+    """(marks or None, error or None); blank marks clear the grade"""
+    if value is None or str(value).strip() == '':
+        return None, None
+    try:
+        number = float(str(value).strip())
+    except ValueError:
+        return None, f'"{value}" is not a number'
+    if not number.is_integer():
+        return None, 'marks must be a whole number'
+    if not 0 <= number <= max_marks:
+        return None, f'marks must be between 0 and {max_marks}'
+    return int(number), None
+
+
+def grade_submissions(assignment, grades):
+    """Validate and save many grades of one assignment at once.
+
+    ``grades`` is a list of dicts with ``submission`` (an id) and
+    optionally ``marks`` and ``feedback``, plus an optional ``label`` used
+    in error messages; a field left out keeps its value. Every entry is
+    checked against ``assignment.max_marks`` first; if any is invalid
+    nothing is saved. Otherwise all changes go out in a single bulk_update.
+    Returns (number of submissions updated, errors), errors being a list of
+    {'label', 'error'} dicts.
+    """
+    if len(grades) > MAX_BATCH_GRADES:
+        return 0, [{'label': None, 'error': f'At most {MAX_BATCH_GRADES} grades per request'}]
+
+    ids = []
+    for grade in grades:
+        try:
+            ids.append(int(grade.get('submission')))
+        except (TypeError, ValueError, AttributeError):
+            ids.append(None)
+    submissions = AssignmentSubmission.objects.filter(assignment=assignment, id__in=[i for i in ids if i]).in_bulk()
+
+    errors = []
+    changed = {}
+    for index, (grade, submission_id) in enumerate(zip(grades, ids)):
+        label = grade.get('label', index + 1) if isinstance(grade, dict) else index + 1
+        submission = submissions.get(submission_id)
+        if submission is None:
+            errors.append({'label': label, 'error': 'unknown submission'})
+            continue
+        if submission_id in changed:
+            errors.append({'label': label, 'error': 'graded twice in this batch'})
+            continue
+
+        if 'marks' in grade:
+            marks, error = _parse_marks(grade['marks'], assignment.max_marks)
+            if error:
+                errors.append({'label': label, 'error': error})
+                continue
+            submission.marks = marks
+        feedback = grade.get('feedback')
+        if feedback is not None and not isinstance(feedback, str):
+            errors.append({'label': label, 'error': 'feedback must be text'})
+            continue
+
+        if feedback is not None:
+            submission.feedback = feedback.strip()
+        changed[submission_id] = submission
+
+    if errors:
+        return 0, errors
+
+    with transaction.atomic():
+        # bulk_update skips the post_save signals, so the dashboards are retired here
+        AssignmentSubmission.objects.bulk_update(changed.values(), ['marks', 'feedback'], batch_size=500)
+        invalidate_dashboards(
+            students=[submission.student_id for submission in changed.values()],
+            teachers=[assignment.teacher_id],
+        )
+    return len(changed), []
+
+
+def import_grades_csv(assignment, uploaded_file):
+    """Grade an assignment from a CSV with registration_number, marks and optional feedback columns.
+
+    The manifest.csv of the submissions ZIP works as a starting point;
+    extra columns are ignored. Blank marks and feedback cells keep their
+    values, so rows left unfilled change nothing; GRADE_CSV_CLEAR clears
+    one. Errors are labelled with CSV line numbers.
+    Returns the same (updated, errors) as grade_submissions().
+    """
+    try:
+        text = io.TextIOWrapper(uploaded_file, encoding='utf-8-sig')
+        reader = csv.DictReader(text)
+        columns = [column.strip() for column in reader.fieldnames or []]
+    except UnicodeDecodeError:
+        return 0, [{'label': None, 'error': 'The file is not UTF-8 text'}]
+    missing = [column for column in GRADE_CSV_REQUIRED if column not in columns]
+    if missing:
+        return 0, [{'label': None, 'error': f'Missing column(s): {", ".join(missing)}'}]
+    reader.fieldnames = columns
+
+    try:
+        rows = [(reader.line_num, row) for row in reader]
+    except (UnicodeDecodeError, csv.Error) as e:
+        return 0, [{'label': None, 'error': f'Could not read the CSV: {e}'}]
+
+    submission_ids = dict(
+        AssignmentSubmission.objects.filter(assignment=assignment)
+        .values_list('student__registration_number', 'id')
+    )
+    grades = []
+    errors = []
+    for line, row in rows:
+        registration_number = (row.get('registration_number') or '').strip()
+        if not registration_number:
+            continue
+        if registration_number not in submission_ids:
+            errors.append({'label': f'line {line}', 'error': f'no submission from {registration_number}'})
+            continue
+        grade = {'submission': submission_ids[registration_number], 'label': f'line {line}'}
+        for field, cleared in (('marks', None), ('feedback', '')):
+            value = (row.get(field) or '').strip()
+            if value == GRADE_CSV_CLEAR:
+                grade[field] = cleared
+            elif value:
+                grade[field] = value
+        if 'marks' in grade or 'feedback' in grade:
+            grades.append(grade)
+
+    if errors:
+        return 0, errors
+    return grade_submissions(assignment, grades)
+
+
+def describe_grade_errors(errors, limit=5):
+    shown = [f"{e['label']}: {e['error']}" if e['label'] is not None else e['error'] for e in errors[:limit]]
+    more = f' and {len(errors) - limit} more' if len(errors) > limit else ''
+    return '; '.join(shown) + more
@@ -0,0 +1,35 @@
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from portal.archival import ARCHIVE_CHUNK_SIZE, archive_term
+from portal.models import AcademicTerm
+
+
+class Command(BaseCommand):
+    help = 'Move Attendance rows from closed academic terms into the archive table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--term', type=int, help='ID of the term to archive (default: every closed term)')
+        parser.add_argument('--chunk-size', type=int, default=ARCHIVE_CHUNK_SIZE)
+        parser.add_argument('--pause', type=float, default=0.0, help='Seconds to sleep between chunks')
+
+    def handle(self, *args, **options):
+        if options['term']:
+            terms = AcademicTerm.objects.filter(id=options['term'])
+            if not terms.exists():
+                raise CommandError(f"Academic term {options['term']} does not exist")
+        else:
+            terms = AcademicTerm.objects.filter(is_closed=True, end_date__lt=timezone.localdate())
+
+        for term in terms:
+            self.stdout.write(f'Archiving {term}...')
+            try:
+                moved = archive_term(
+                    term,
+                    chunk_size=options['chunk_size'],
+                    pause=options['pause'],
+                    progress=lambda count: self.stdout.write(f'  {count} rows moved'),
+                )
+            except ValidationError as e:
+                raise CommandError(e.messages[0])
+            self.stdout.write(self.style.SUCCESS(f'Archived {moved} attendance rows from {term.name}'))
@@ -0,0 +1,116 @@
+import random
+import time
+from datetime import date, timedelta
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Count, Q
+from portal.bitsets import build_term_bitmaps, grid_for, longest_streak, percentage_between, present_count, recorded_count
+from portal.models import AcademicTerm, Attendance, AttendanceBitmap, Student, Subject, Teacher, TimeTable
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a throwaway test database with a semester of attendance and compare '
+        'row-based Attendance queries with AttendanceBitmap lookups'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=5000)
+        parser.add_argument('--weeks', type=int, default=16)
+        parser.add_argument('--lookups', type=int, default=500, help='Random student/subject pairs to time')
+
+    def handle(self, *args, **options):
+        creation = connection.creation
+        old_name = connection.settings_dict['NAME']
+        creation.create_test_db(verbosity=0, autoclobber=True, keepdb=False)
+        try:
+            self.run(options)
+        finally:
+            creation.destroy_test_db(old_name, verbosity=0)
+
+    def seed(self, students, weeks):
+        teacher = Teacher.objects.create(
+            user=User.objects.create(username='bench-teacher'), employee_number='BENCH-T', qualification='-'
+        )
+        subjects = Subject.objects.bulk_create([
+            Subject(name=f'Subject {i}', code=f'BENCH-{i}', semester=5, teacher=teacher) for i in range(5)
+        ])
+        periods = ['Period 1', 'Period 2', 'Period 3', 'Period 4', 'Period 5']
+        days = [day for day, _ in TimeTable.DAYS_CHOICES]
+        batches = [batch for batch, _ in Student.BATCH_CHOICES]
+        TimeTable.objects.bulk_create([
+            TimeTable(batch=batch, day=day, period=period, subject=subjects[(d + p) % len(subjects)])
+            for batch in batches for d, day in enumerate(days) for p, period in enumerate(periods)
+        ])
+
+        users = User.objects.bulk_create([User(username=f'bench-{i}') for i in range(students)])
+        student_objs = Student.objects.bulk_create([
+            Student(user=user, campus_id=f'BENCH{i}', registration_number=f'BENCHREG{i}',
+                    batch=batches[i % len(batches)], phone='0')
+            for i, user in enumerate(users)
+        ])
+
+        start = date.today() - timedelta(days=weeks * 7 + 7)
+        start -= timedelta(days=start.weekday())
+        term = AcademicTerm.objects.create(
+            name='Benchmark term', start_date=start, end_date=start + timedelta(days=weeks * 7 - 1), is_closed=True
+        )
+
+        rng = random.Random(5)
+        rows = []
+        for batch in batches:
+            batch_students = [s.id for s in student_objs if s.batch == batch]
+            for entry in TimeTable.objects.filter(batch=batch):
+                for week in range(weeks):
+                    session_date = start + timedelta(days=week * 7 + days.index(entry.day))
+                    rows.extend(
+                        Attendance(student_id=student_id, subject_id=entry.subject_id, date=session_date,
+                                   period=entry.period, is_present=rng.random() < 0.8)
+                        for student_id in batch_students
+                    )
+                    if len(rows) >= 20000:
+                        Attendance.objects.bulk_create(rows, batch_size=2000)
+                        rows = []
+        Attendance.objects.bulk_create(rows, batch_size=2000)
+        return term, student_objs, subjects
+
+    def run(self, options):
+        self.stdout.write(f"Seeding {options['students']} students over {options['weeks']} weeks...")
+        started = time.perf_counter()
+        term, students, subjects = self.seed(options['students'], options['weeks'])
+        self.stdout.write(f'  {Attendance.objects.count()} attendance rows in {time.perf_counter() - started:.1f}s')
+
+        started = time.perf_counter()
+        written, _ = build_term_bitmaps(term)
+        self.stdout.write(f'  built {written} bitmaps in {time.perf_counter() - started:.1f}s')
+
+        rng = random.Random(7)
+        pairs = [(rng.choice(students), rng.choice(subjects)) for _ in range(options['lookups'])]
+        middle = term.start_date + (term.end_date - term.start_date) / 2
+
+        started = time.perf_counter()
+        for student, subject in pairs:
+            rows = Attendance.objects.filter(student=student, subject=subject)
+            rows.aggregate(total=Count('id'), present=Count('id', filter=Q(is_present=True)))
+            rows.filter(date__gte=middle).aggregate(total=Count('id'), present=Count('id', filter=Q(is_present=True)))
+            list(rows.order_by('date', 'period').values_list('is_present', flat=True))  # streaks need every row
+        row_time = time.perf_counter() - started
+
+        grids = {}
+        started = time.perf_counter()
+        for student, subject in pairs:
+            bitmap = AttendanceBitmap.objects.get(student=student, subject=subject, term=term)
+            key = (student.batch, subject.id)
+            if key not in grids:
+                grids[key] = grid_for(student.batch, subject, term)
+            present_count(bitmap)
+            recorded_count(bitmap)
+            percentage_between(bitmap, grids[key], middle, term.end_date)
+            longest_streak(bitmap)
+        bitmap_time = time.perf_counter() - started
+
+        lookups = options['lookups']
+        self.stdout.write(f'Row-based queries: {row_time * 1000 / lookups:.2f} ms per student/subject')
+        self.stdout.write(f'Bitmap lookups:    {bitmap_time * 1000 / lookups:.2f} ms per student/subject')
+        self.stdout.write(self.style.SUCCESS(f'Speed-up: {row_time / bitmap_time:.1f}x'))
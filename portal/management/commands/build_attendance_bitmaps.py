@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+from portal.bitsets import build_term_bitmaps
+from portal.models import AcademicTerm, Subject
+
+
+class Command(BaseCommand):
+    help = 'Backfill AttendanceBitmap rows for a term from Attendance and the timetable grid'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--term', type=int, help='ID of the term to build (default: every term)')
+        parser.add_argument('--subject', help='Only build bitmaps for this subject code')
+
+    def handle(self, *args, **options):
+        terms = AcademicTerm.objects.all()
+        if options['term']:
+            terms = terms.filter(id=options['term'])
+            if not terms.exists():
+                raise CommandError(f"Academic term {options['term']} does not exist")
+
+        subjects = None
+        if options['subject']:
+            subjects = Subject.objects.filter(code=options['subject'])
+            if not subjects.exists():
+                raise CommandError(f"Subject {options['subject']} does not exist")
+
+        for term in terms:
+            written, skipped = build_term_bitmaps(term, subjects)
+            self.stdout.write(self.style.SUCCESS(
+                f'{term.name}: wrote {written} bitmaps ({skipped} off-grid attendance rows skipped)'
+            ))
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from portal.query_plans import full_scans, hot_queries, seed_attendance
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a throwaway test database with a large attendance dataset, EXPLAIN the hot '
+        'Attendance queries and fail if any of them falls back to a full table scan'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=1000)
+        parser.add_argument('--subjects', type=int, default=6)
+        parser.add_argument('--days', type=int, default=30)
+        parser.add_argument('--show-plans', action='store_true', help='Print every query plan')
+
+    def handle(self, *args, **options):
+        creation = connection.creation
+        old_name = connection.settings_dict['NAME']
+        creation.create_test_db(verbosity=0, autoclobber=True, keepdb=False)
+        try:
+            self.stdout.write(
+                f"Seeding {options['students']} students x {options['subjects']} subjects x "
+                f"{options['days']} days into the test database..."
+            )
+            student, subject = seed_attendance(options['students'], options['subjects'], options['days'])
+
+            failures = []
+            for name, queryset in hot_queries(student, subject).items():
+                plan = queryset.explain()
+                scanned = full_scans(plan)
+                if options['show_plans']:
+                    self.stdout.write(f'--- {name}\n{plan}')
+                if scanned:
+                    failures.append(f"{name}: full scan on {', '.join(sorted(scanned))}")
+                    self.stdout.write(self.style.ERROR(f'FAIL {name}'))
+                else:
+                    self.stdout.write(self.style.SUCCESS(f'ok   {name}'))
+        finally:
+            creation.destroy_test_db(old_name, verbosity=0)
+
+        if failures:
+            raise CommandError('Hot queries fell back to full table scans:\n' + '\n'.join(failures))
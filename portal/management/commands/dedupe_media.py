@@ -0,0 +1,116 @@
+import os
+import time
+from collections import Counter
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.core.management.base import BaseCommand
+from portal.models import MediaBlob
+from portal.storage import BLOB_DIR, STAGING_DIR, blob_fields, content_storage, file_digest, is_blob_name
+
+# Staging files older than this belong to saves that died half way
+STAGING_MAX_AGE = 60 * 60
+WALK_BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = (
+        'Move media files stored before content-addressed storage into blobs, recount blob '
+        'references and remove unreferenced blobs. Run it while uploads are quiet.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Report what would change without changing it')
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        self.migrate_legacy_files(dry_run)
+        self.reconcile_references(dry_run)
+        self.remove_orphans(dry_run)
+
+    def migrate_legacy_files(self, dry_run):
+        moved = missing = 0
+        legacy_names = set()
+        for model, field_name in blob_fields():
+            rows = (
+                model.objects.exclude(**{f'{field_name}__isnull': True})
+                .exclude(**{field_name: ''})
+                .exclude(**{f'{field_name}__startswith': BLOB_DIR + '/'})
+                .values_list('pk', field_name)
+            )
+            for pk, name in rows.iterator():
+                if not content_storage.exists(name):
+                    self.stderr.write(f'{model.__name__} {pk}: {name} is missing')
+                    missing += 1
+                    continue
+                moved += 1
+                if dry_run:
+                    continue
+                with content_storage.open(name, 'rb') as f:
+                    new_name = content_storage.save(name, File(f, name=name))
+                # update() rather than save(): the signals would release the old name
+                model.objects.filter(pk=pk).update(**{field_name: new_name})
+                legacy_names.add(name)
+
+        for name in legacy_names:
+            FileSystemStorage.delete(content_storage, name)
+        self.stdout.write(f'{moved} files moved into blobs, {missing} missing')
+
+    def reconcile_references(self, dry_run):
+        references = Counter()
+        for model, field_name in blob_fields():
+            names = model.objects.filter(**{f'{field_name}__startswith': BLOB_DIR + '/'}).values_list(field_name, flat=True)
+            references.update(names.iterator())
+
+        fixed = 0
+        for blob in MediaBlob.objects.iterator():
+            actual = references.pop(blob.name, 0)
+            if blob.refs != actual:
+                fixed += 1
+                if not dry_run:
+                    MediaBlob.objects.filter(pk=blob.pk).update(refs=actual)
+
+        # Referenced blobs without a row, e.g. from a save that crashed half way
+        for name, count in references.items():
+            if not content_storage.exists(name):
+                self.stderr.write(f'{name} is referenced {count} times but missing')
+                continue
+            fixed += 1
+            if not dry_run:
+                path = content_storage.path(name)
+                MediaBlob.objects.create(name=name, sha256=file_digest(path), size=os.path.getsize(path), refs=count)
+        self.stdout.write(f'{fixed} reference counts corrected')
+
+    def remove_orphans(self, dry_run):
+        removed = 0
+        for name in MediaBlob.objects.filter(refs__lte=0).values_list('name', flat=True).iterator():
+            removed += 1
+            if not dry_run:
+                content_storage.collect(name)
+
+        # Files without a MediaBlob row, checked against the table a batch at a time
+        root = content_storage.path(BLOB_DIR)
+        staging = content_storage.path(STAGING_DIR)
+        batch = []
+        for directory, _, files in os.walk(root):
+            for filename in files:
+                path = os.path.join(directory, filename)
+                if directory == staging:
+                    if time.time() - os.path.getmtime(path) > STAGING_MAX_AGE:
+                        removed += 1
+                        if not dry_run:
+                            os.remove(path)
+                    continue
+                batch.append(os.path.relpath(path, content_storage.location).replace(os.sep, '/'))
+                if len(batch) >= WALK_BATCH_SIZE:
+                    removed += self.remove_unknown(batch, dry_run)
+                    batch = []
+        removed += self.remove_unknown(batch, dry_run)
+        self.stdout.write(self.style.SUCCESS(f'{removed} unreferenced files removed'))
+
+    def remove_unknown(self, names, dry_run):
+        known = set(MediaBlob.objects.filter(name__in=names).values_list('name', flat=True))
+        unknown = [name for name in names if name not in known and is_blob_name(name)]
+        if not dry_run:
+            for name in unknown:
+                FileSystemStorage.delete(content_storage, name)
+        return len(unknown)
@@ -0,0 +1,54 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from portal.models import TimeTable
+from portal.timetable_solver import (
+    apply_timetable, describe_clash, generate_timetable, timetable_batches,
+    timetable_clashes,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate a clash-free weekly TimeTable from Subject.credits, Subject.teacher, the batches '
+        'with students and the given rooms, or report clashes in the current timetable with --check'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch', action='append', dest='batches', help='Batch to generate (repeatable; default all)')
+        parser.add_argument('--room', action='append', dest='rooms', help='Room to use (repeatable; default the rooms already in the timetable)')
+        parser.add_argument('--seed', type=int, default=0, help='Seed for the search tie order')
+        parser.add_argument('--dry-run', action='store_true', help='Solve and report without saving')
+        parser.add_argument('--check', action='store_true', help='Only report clashes in the existing timetable')
+
+    def handle(self, *args, **options):
+        if options['check']:
+            clashes = timetable_clashes()
+            for clash in clashes:
+                self.stdout.write(describe_clash(*clash))
+            if clashes:
+                raise CommandError(f'{len(clashes)} clashes in the current timetable')
+            self.stdout.write(self.style.SUCCESS('No clashes in the current timetable'))
+            return
+
+        rooms = options['rooms'] or sorted(
+            room for room in TimeTable.objects.values_list('room', flat=True).distinct() if room
+        )
+        if not rooms:
+            raise CommandError('No rooms given and none found in the current timetable; pass --room')
+
+        started = time.monotonic()
+        rows, unplaced = generate_timetable(rooms, options['batches'], seed=options['seed'])
+        elapsed = time.monotonic() - started
+        batches = timetable_batches(options['batches'])
+        self.stdout.write(f'Planned {len(rows)} sessions for {len(batches)} batches in {elapsed:.2f}s')
+
+        if unplaced:
+            for batch, subject, missing in unplaced:
+                self.stderr.write(f'{batch}: {missing} sessions of {subject.code} could not be placed')
+            raise CommandError('No clash-free timetable found; add rooms or reduce credits. Nothing was saved.')
+
+        if options['dry_run']:
+            self.stdout.write('Dry run; nothing saved')
+            return
+        apply_timetable(rows, batches)
+        self.stdout.write(self.style.SUCCESS(f'Saved the timetable for {", ".join(batches)}'))
@@ -0,0 +1,17 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from portal.chunked_uploads import STALE_UPLOAD_AGE, purge_stale_uploads
+
+
+class Command(BaseCommand):
+    help = 'Delete chunked uploads that were abandoned before being finalized'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hours', type=float, default=STALE_UPLOAD_AGE.total_seconds() / 3600,
+            help='Idle time after which an upload counts as abandoned',
+        )
+
+    def handle(self, *args, **options):
+        sessions, orphans = purge_stale_uploads(timedelta(hours=options['hours']))
+        self.stdout.write(self.style.SUCCESS(f'Removed {sessions} stale uploads and {orphans} orphaned part files'))
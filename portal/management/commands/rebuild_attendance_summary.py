@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+from portal.attendance_engine import rebuild_attendance_summaries, verify_attendance_summaries
+
+
+class Command(BaseCommand):
+    help = 'Rebuild AttendanceSummary from the raw Attendance rows, or verify it with --verify-only'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify-only',
+            action='store_true',
+            help='Compare the summary table with the raw rows without rewriting it',
+        )
+
+    def handle(self, *args, **options):
+        if not options['verify_only']:
+            count = rebuild_attendance_summaries()
+            self.stdout.write(f'Rebuilt {count} attendance summary rows')
+
+        mismatches = verify_attendance_summaries()
+        if mismatches:
+            for student_id, subject_id, expected, actual in mismatches[:20]:
+                self.stderr.write(
+                    f'student={student_id} subject={subject_id} expected={expected} actual={actual}'
+                )
+            raise CommandError(f'{len(mismatches)} attendance summary rows do not match the raw rows')
+
+        self.stdout.write(self.style.SUCCESS('Attendance summaries match the raw rows'))
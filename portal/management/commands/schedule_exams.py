@@ -0,0 +1,56 @@
+import time
+from datetime import datetime
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from portal.exam_scheduler import save_exam_schedule, schedule_exams
+from portal.models import ExamResult, Subject
+
+
+def parse_room(value):
+    name, _, seats = value.rpartition(':')
+    if not name or not seats.isdigit():
+        raise ValueError(f'Room must look like NAME:SEATS, got {value!r}')
+    return name, int(seats)
+
+
+class Command(BaseCommand):
+    help = (
+        'Plan a conflict-free exam timetable: papers that share candidates (same semester) never share '
+        'a slot, and no slot seats more candidates than the rooms hold'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--exam-type', required=True, choices=[choice for choice, _ in ExamResult.EXAM_TYPE_CHOICES])
+        parser.add_argument('--start', required=True, help='First exam day, YYYY-MM-DD')
+        parser.add_argument('--room', action='append', dest='rooms', required=True, help='NAME:SEATS (repeatable)')
+        parser.add_argument('--semester', action='append', type=int, dest='semesters', help='Semester to schedule (repeatable; default all)')
+        parser.add_argument('--sessions-per-day', type=int, choices=[1, 2], default=2)
+        parser.add_argument('--dry-run', action='store_true', help='Print the plan without saving it')
+
+    def handle(self, *args, **options):
+        try:
+            start = datetime.strptime(options['start'], '%Y-%m-%d').date()
+            rooms = [parse_room(room) for room in options['rooms']]
+        except ValueError as error:
+            raise CommandError(error)
+
+        started = time.monotonic()
+        try:
+            rows = schedule_exams(
+                options['exam_type'], start, rooms, options['semesters'], options['sessions_per_day']
+            )
+        except ValidationError as error:
+            raise CommandError(error.message)
+        elapsed = time.monotonic() - started
+
+        codes = dict(Subject.objects.filter(id__in=[row.subject_id for row in rows]).values_list('id', 'code'))
+        for row in rows:
+            self.stdout.write(f'{row.date} {row.session}  {codes[row.subject_id]:<12} {row.candidates:>5}  {row.rooms}')
+        slots = len({(row.date, row.session) for row in rows})
+        self.stdout.write(f'Planned {len(rows)} papers into {slots} slots in {elapsed:.2f}s')
+
+        if options['dry_run']:
+            self.stdout.write('Dry run; nothing saved')
+            return
+        save_exam_schedule(options['exam_type'], rows)
+        self.stdout.write(self.style.SUCCESS('Exam schedule saved'))
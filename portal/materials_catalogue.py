@@ -0,0 +1,62 @@
+import hashlib
+from django.core.cache import cache
+from .cache_versions import bump, versions
+from .models import Material
+
+# Catalogues change only when materials do, so they are kept until a version
+# bump retires them; the timeout is a backstop for teacher name changes
+CATALOGUE_CACHE_TIMEOUT = 60 * 60
+
+# Template context name of each material type's section
+CATALOGUE_SECTIONS = {
+    'notes': 'notes',
+    'question_bank': 'question_banks',
+    'reference': 'references',
+    'slides': 'slides',
+}
+
+# Version scopes: one per semester for Material rows, 'all' for Subject and
+# Teacher edits, which can show up in any semester's catalogue
+
+
+def invalidate_catalogues(*scopes):
+    """Retire cached catalogues for the given scopes once the current transaction commits"""
+    bump('materials', *scopes)
+
+
+def build_catalogue(semester):
+    """({section: [Material]}, digest) for a semester's active materials, from a single query"""
+    sections = {section: [] for section in CATALOGUE_SECTIONS.values()}
+    digest = hashlib.sha256()
+    materials = (
+        Material.objects.filter(subject__semester=semester, is_active=True)
+        .select_related('subject', 'teacher__user')
+        .order_by('-uploaded_at')
+    )
+    for material in materials:
+        section = CATALOGUE_SECTIONS.get(material.material_type)
+        if section is None:
+            continue
+        sections[section].append(material)
+        digest.update(repr((
+            material.pk, material.title, material.file.name, material.uploaded_at, material.material_type,
+            material.subject.name, material.teacher.user.get_full_name(),
+        )).encode('utf-8'))
+    return sections, digest.hexdigest()
+
+
+def semester_catalogue(semester):
+    """Cached build_catalogue() for ``semester``, shared by every student in it"""
+    tokens = versions('materials', ['all', f'semester:{semester}'])
+    key = f'materials:catalogue:{semester}:{tokens}'
+    catalogue = cache.get(key)
+    if catalogue is None:
+        catalogue = build_catalogue(semester)
+        cache.set(key, catalogue, CATALOGUE_CACHE_TIMEOUT)
+    return catalogue
+
+
+def catalogue_etag(digest, user):
+    """Strong ETag of a student's materials page: the catalogue plus the user shown in the page header"""
+    page = f'{digest}:{user.pk}:{user.get_full_name()}:{user.username}'
+    return '"%s"' % hashlib.sha256(page.encode('utf-8')).hexdigest()
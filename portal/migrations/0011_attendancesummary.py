@@ -0,0 +1,43 @@
+# Generated by Django 4.2.7 on 2026-10-17 21:01
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+import django.db.models.deletion
+
+
+def backfill_summaries(apps, schema_editor):
+    Attendance = apps.get_model('portal', 'Attendance')
+    AttendanceSummary = apps.get_model('portal', 'AttendanceSummary')
+    rows = Attendance.objects.values('student_id', 'subject_id').annotate(
+        total=Count('id'),
+        present=Count('id', filter=Q(is_present=True)),
+    ).order_by()
+    AttendanceSummary.objects.bulk_create(
+        [AttendanceSummary(**row) for row in rows.iterator()],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portal', '0010_alter_timetable_room'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttendanceSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total', models.IntegerField(default=0)),
+                ('present', models.IntegerField(default=0)),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attendance_summaries', to='portal.student')),
+                ('subject', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attendance_summaries', to='portal.subject')),
+            ],
+            options={
+                'verbose_name_plural': 'Attendance summaries',
+                'unique_together': {('student', 'subject')},
+            },
+        ),
+        migrations.RunPython(backfill_summaries, migrations.RunPython.noop),
+    ]
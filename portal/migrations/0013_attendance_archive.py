@@ -0,0 +1,47 @@
+# Generated by Django 4.2.7 on 2026-10-17 21:04
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portal', '0012_attendance_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AcademicTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('start_date', models.DateField()),
+                ('end_date', models.DateField()),
+                ('is_closed', models.BooleanField(default=False, help_text='Closed terms can be moved to the attendance archive')),
+                ('archived_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['-start_date'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedAttendance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('period', models.CharField(choices=[('Period 1', '8:30 - 9:25'), ('Period 2', '9:25 - 10:20'), ('Break', '10:20 - 10:40'), ('Period 3', '10:40 - 11:35'), ('Period 4', '11:35 - 12:30'), ('Period 5', '12:30 - 1:30'), ('Lunch Break', '1:30 - 2:15')], max_length=15)),
+                ('is_present', models.BooleanField(default=False)),
+                ('marked_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('marked_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='portal.teacher')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_attendances', to='portal.student')),
+                ('subject', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='portal.subject')),
+                ('term', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='archived_attendances', to='portal.academicterm')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['student', '-date', '-period'], name='archived_student_recent')],
+                'unique_together': {('student', 'subject', 'date', 'period')},
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-17 21:06
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portal', '0014_attendancebitmap'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttendanceSyncKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64, unique=True)),
+                ('date', models.DateField()),
+                ('period', models.CharField(choices=[('Period 1', '8:30 - 9:25'), ('Period 2', '9:25 - 10:20'), ('Break', '10:20 - 10:40'), ('Period 3', '10:40 - 11:35'), ('Period 4', '11:35 - 12:30'), ('Period 5', '12:30 - 1:30'), ('Lunch Break', '1:30 - 2:15')], max_length=15)),
+                ('created', models.IntegerField(default=0)),
+                ('updated', models.IntegerField(default=0)),
+                ('unchanged', models.IntegerField(default=0)),
+                ('received_at', models.DateTimeField(auto_now_add=True)),
+                ('subject', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='portal.subject')),
+                ('teacher', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attendance_sync_keys', to='portal.teacher')),
+            ],
+        ),
+    ]
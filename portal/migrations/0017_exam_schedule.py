@@ -0,0 +1,30 @@
+# Generated by Django 4.2.7 on 2026-10-17 21:17
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portal', '0016_attendance_subject_date_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExamSchedule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('exam_type', models.CharField(choices=[('internal_1', 'Internal Assessment 1'), ('internal_2', 'Internal Assessment 2'), ('internal_3', 'Internal Assessment 3'), ('semester', 'Semester End Exam'), ('assignment', 'Assignment')], max_length=20)),
+                ('date', models.DateField()),
+                ('session', models.CharField(choices=[('FN', 'Forenoon'), ('AN', 'Afternoon')], default='FN', max_length=2)),
+                ('rooms', models.CharField(blank=True, help_text='Comma-separated rooms seating this paper', max_length=200)),
+                ('candidates', models.PositiveIntegerField(default=0)),
+                ('subject', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='exam_schedules', to='portal.subject')),
+            ],
+            options={
+                'ordering': ['date', 'session'],
+                'unique_together': {('exam_type', 'subject')},
+            },
+        ),
+    ]
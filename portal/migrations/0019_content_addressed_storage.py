@@ -0,0 +1,45 @@
+# Generated by Django 4.2.7 on 2026-10-17 21:26
+
+from django.db import migrations, models
+import portal.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portal', '0018_upload_session'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('sha256', models.CharField(db_index=True, max_length=64)),
+                ('size', models.BigIntegerField()),
+                ('refs', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='assignment',
+            name='question_file',
+            field=models.FileField(blank=True, null=True, storage=portal.storage.ContentAddressedStorage(), upload_to='assignments/questions'),
+        ),
+        migrations.AlterField(
+            model_name='assignmentsubmission',
+            name='answer_file',
+            field=models.FileField(storage=portal.storage.ContentAddressedStorage(), upload_to='assignments/submissions/'),
+        ),
+        migrations.AlterField(
+            model_name='bulkuserimport',
+            name='file',
+            field=models.FileField(help_text='\n                                <a href="/admin/portal/bulkuserimport/download-template/?user_type=student"\n                                class="button"\n                                style="margin-bottom:1em;margin-top:0.5em;display:inline-block;"\n                                target="_blank">Download Student Template</a>\n                                <a href="/admin/portal/bulkuserimport/download-template/?user_type=teacher"\n                                class="button"\n                                style="margin-bottom:1em;margin-left:0.5em;display:inline-block;"\n                                target="_blank">Download Teacher Template</a>\n                                ', storage=portal.storage.ContentAddressedStorage(), upload_to='bulk_imports/'),
+        ),
+        migrations.AlterField(
+            model_name='material',
+            name='file',
+            field=models.FileField(storage=portal.storage.ContentAddressedStorage(), upload_to='materials/'),
+        ),
+    ]
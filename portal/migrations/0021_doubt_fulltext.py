@@ -0,0 +1,34 @@
+# Generated by Django 4.2.7 on 2026-10-17 21:33
+
+from django.db import migrations
+
+# Used by portal.doubt_search. Other databases search with an in-process index.
+FULLTEXT_INDEXES = [
+    ('portal_doubt', 'portal_doubt_title_question_ft', '(title, question)'),
+    ('portal_doubtreply', 'portal_doubtreply_reply_ft', '(reply)'),
+]
+
+
+def create_fulltext_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'mysql':
+        return
+    for table, name, columns in FULLTEXT_INDEXES:
+        schema_editor.execute(f'CREATE FULLTEXT INDEX {name} ON {table} {columns}')
+
+
+def drop_fulltext_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'mysql':
+        return
+    for table, name, _ in FULLTEXT_INDEXES:
+        schema_editor.execute(f'DROP INDEX {name} ON {table}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portal', '0020_document_signature'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fulltext_indexes, drop_fulltext_indexes),
+    ]
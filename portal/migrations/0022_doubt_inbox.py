@@ -0,0 +1,44 @@
+# Generated by Django 4.2.7 on 2026-10-17 21:36
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+import django.db.models.deletion
+
+
+def backfill_counters(apps, schema_editor):
+    Teacher = apps.get_model('portal', 'Teacher')
+    DoubtCounter = apps.get_model('portal', 'DoubtCounter')
+    rows = Teacher.objects.annotate(
+        unresolved=Count('subjects__doubt', filter=Q(subjects__doubt__is_resolved=False))
+    ).values_list('id', 'unresolved')
+    DoubtCounter.objects.bulk_create(
+        [DoubtCounter(teacher_id=teacher_id, unresolved=unresolved) for teacher_id, unresolved in rows.iterator()],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portal', '0021_doubt_fulltext'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DoubtCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('unresolved', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='doubt',
+            index=models.Index(fields=['subject', 'is_resolved', '-asked_at', '-id'], name='doubt_inbox_order'),
+        ),
+        migrations.AddField(
+            model_name='doubtcounter',
+            name='teacher',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='doubt_counter', to='portal.teacher'),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
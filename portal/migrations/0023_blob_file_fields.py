@@ -0,0 +1,34 @@
+# Generated by Django 4.2.7 on 2026-10-17 21:55
+
+from django.db import migrations
+import portal.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portal', '0022_doubt_inbox'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='assignment',
+            name='question_file',
+            field=portal.storage.BlobFileField(blank=True, null=True, storage=portal.storage.ContentAddressedStorage(), upload_to='assignments/questions'),
+        ),
+        migrations.AlterField(
+            model_name='assignmentsubmission',
+            name='answer_file',
+            field=portal.storage.BlobFileField(storage=portal.storage.ContentAddressedStorage(), upload_to='assignments/submissions/'),
+        ),
+        migrations.AlterField(
+            model_name='bulkuserimport',
+            name='file',
+            field=portal.storage.BlobFileField(help_text='\n                                <a href="/admin/portal/bulkuserimport/download-template/?user_type=student"\n                                class="button"\n                                style="margin-bottom:1em;margin-top:0.5em;display:inline-block;"\n                                target="_blank">Download Student Template</a>\n                                <a href="/admin/portal/bulkuserimport/download-template/?user_type=teacher"\n                                class="button"\n                                style="margin-bottom:1em;margin-left:0.5em;display:inline-block;"\n                                target="_blank">Download Teacher Template</a>\n                                ', storage=portal.storage.ContentAddressedStorage(), upload_to='bulk_imports/'),
+        ),
+        migrations.AlterField(
+            model_name='material',
+            name='file',
+            field=portal.storage.BlobFileField(storage=portal.storage.ContentAddressedStorage(), upload_to='materials/'),
+        ),
+    ]
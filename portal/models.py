@@ -1,9 +1,10 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils import timezone
 from django.utils.safestring import mark_safe
 import uuid
+from .storage import BlobFileField, content_storage
 
 class UserProfile(models.Model):
     USER_TYPE_CHOICES = [
@@ -139,17 +140,138 @@ class Attendance(models.Model):
     
     class Meta:
         unique_together = ['student', 'subject', 'date', 'period']
-    
+        # (student, subject) lookups are served by the unique_together index prefix
+        indexes = [
+            models.Index(fields=['student', 'is_present'], name='attendance_student_present'),
+            models.Index(fields=['student', '-date', '-period'], name='attendance_student_recent'),
+            models.Index(fields=['-date', 'student'], name='attendance_date_student'),
+            models.Index(fields=['subject', 'date'], name='attendance_subject_date'),
+        ]
+
+    def save(self, *args, **kwargs):
+        # Keep the row and its AttendanceSummary counters in one transaction
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            return super().delete(*args, **kwargs)
+
     def __str__(self):
         status = "Present" if self.is_present else "Absent"
         return f"{self.student.campus_id} - {self.subject.name} - {self.date} - {status}"
 
-class Assignment(models.Model):
+class AttendanceSummary(models.Model):
+    """Running attendance counters per student and subject, kept in step with Attendance"""
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='attendance_summaries')
+    subject = models.ForeignKey(Subject, on_delete=models.CASCADE, related_name='attendance_summaries')
+    total = models.IntegerField(default=0)
+    present = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ['student', 'subject']
+        verbose_name_plural = 'Attendance summaries'
+
+    @property
+    def percentage(self):
+        return round(self.present / self.total * 100, 1) if self.total > 0 else 0
+
+    def __str__(self):
+        return f"{self.student.campus_id} - {self.subject.name} - {self.present}/{self.total}"
+
+class AttendanceSyncKey(models.Model):
+    """Idempotency key of an attendance sheet sent through the offline sync endpoint"""
+    key = models.CharField(max_length=64, unique=True)
+    teacher = models.ForeignKey(Teacher, on_delete=models.CASCADE, related_name='attendance_sync_keys')
+    subject = models.ForeignKey(Subject, on_delete=models.CASCADE)
+    date = models.DateField()
+    period = models.CharField(max_length=15, choices=TimeTable.PERIOD_CHOICES)
+    created = models.IntegerField(default=0)
+    updated = models.IntegerField(default=0)
+    unchanged = models.IntegerField(default=0)
+    received_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.key} - {self.subject.name} - {self.date} - {self.period}"
+
+class AcademicTerm(models.Model):
+    name = models.CharField(max_length=100, unique=True)
+    start_date = models.DateField()
+    end_date = models.DateField()
+    is_closed = models.BooleanField(default=False, help_text='Closed terms can be moved to the attendance archive')
+    archived_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-start_date']
+
+    def __str__(self):
+        return f"{self.name} ({self.start_date} - {self.end_date})"
+
+class ArchivedAttendance(models.Model):
+    """Attendance rows from closed terms, moved out of the live table"""
+    term = models.ForeignKey(AcademicTerm, on_delete=models.PROTECT, related_name='archived_attendances')
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='archived_attendances')
+    subject = models.ForeignKey(Subject, on_delete=models.CASCADE)
+    date = models.DateField()
+    period = models.CharField(max_length=15, choices=TimeTable.PERIOD_CHOICES)
+    is_present = models.BooleanField(default=False)
+    marked_by = models.ForeignKey(Teacher, on_delete=models.SET_NULL, null=True)
+    marked_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ['student', 'subject', 'date', 'period']
+        indexes = [
+            models.Index(fields=['student', '-date', '-period'], name='archived_student_recent'),
+        ]
+
+    def __str__(self):
+        status = "Present" if self.is_present else "Absent"
+        return f"{self.student.campus_id} - {self.subject.name} - {self.date} - {status} (archived)"
+
+class AttendanceBitmap(models.Model):
+    """A student's attendance in one subject for one term, one bit per scheduled session.
+
+    Bit ``i`` refers to the i-th session of the subject in the student's batch
+    timetable, in date and period order (see portal.bitsets.session_grid).
+    """
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='attendance_bitmaps')
+    subject = models.ForeignKey(Subject, on_delete=models.CASCADE)
+    term = models.ForeignKey(AcademicTerm, on_delete=models.CASCADE, related_name='attendance_bitmaps')
+    session_count = models.IntegerField(default=0)
+    recorded = models.BinaryField(default=b'')
+    present = models.BinaryField(default=b'')
+    built_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['student', 'subject', 'term']
+
+    def __str__(self):
+        return f"{self.student.campus_id} - {self.subject.name} - {self.term.name}"
+
+class StoredFilesMixin:
+    """For models whose FileFields use content_storage.
+
+    Storing a file takes a MediaBlob reference before the row is written.
+    Saving in one transaction means a failed INSERT or UPDATE gives the
+    reference back instead of leaving the blob referenced by nothing; the
+    file itself is then swept by dedupe_media.
+    """
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            return super().delete(*args, **kwargs)
+
+class Assignment(StoredFilesMixin, models.Model):
     title = models.CharField(max_length=200)
     description = models.TextField()
     subject = models.ForeignKey(Subject, on_delete=models.CASCADE, related_name='assignments')
     teacher = models.ForeignKey(Teacher, on_delete=models.CASCADE)
-    question_file = models.FileField(upload_to='assignments/questions', blank=True, null=True)
+    question_file = BlobFileField(upload_to='assignments/questions', blank=True, null=True, storage=content_storage)
     due_date = models.DateTimeField()
     max_marks = models.IntegerField(default=100)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -160,10 +282,10 @@ class Assignment(models.Model):
     def is_overdue(self):
         return timezone.now() > self.due_date
 
-class AssignmentSubmission(models.Model):
+class AssignmentSubmission(StoredFilesMixin, models.Model):
     assignment = models.ForeignKey(Assignment, on_delete=models.CASCADE, related_name='submissions')
     student = models.ForeignKey(Student, on_delete=models.CASCADE)
-    answer_file = models.FileField(upload_to='assignments/submissions/')
+    answer_file = BlobFileField(upload_to='assignments/submissions/', storage=content_storage)
     submitted_at = models.DateTimeField(auto_now_add=True)
     marks = models.IntegerField(null=True, blank=True, validators=[MinValueValidator(0)])
     feedback = models.TextField(blank=True)
@@ -187,6 +309,12 @@ class Doubt(models.Model):
     question = models.TextField()
     asked_at = models.DateTimeField(auto_now_add=True)
     is_resolved = models.BooleanField(default=False)
+
+    class Meta:
+        # Teacher inbox order, walked with keyset pagination (portal.doubt_inbox)
+        indexes = [
+            models.Index(fields=['subject', 'is_resolved', '-asked_at', '-id'], name='doubt_inbox_order'),
+        ]
     
     def __str__(self):
         return f"{self.student.campus_id} - {self.title}"
@@ -199,14 +327,24 @@ class DoubtReply(models.Model):
     
     def save(self, *args, **kwargs):
         super().save(*args, **kwargs)
-        # Mark doubt as resolved when teacher replies
-        self.doubt.is_resolved = True
-        self.doubt.save()
+        # Mark doubt as resolved when teacher replies. A single-column update,
+        # so the unresolved counters are moved here rather than by Doubt's signals
+        if not self.doubt.is_resolved:
+            from .doubt_inbox import resolve_doubt
+            resolve_doubt(self.doubt)
     
     def __str__(self):
         return f"Reply to: {self.doubt.title}"
 
-class Material(models.Model):
+class DoubtCounter(models.Model):
+    """Unresolved doubts in a teacher's subjects, kept in step by portal.doubt_inbox"""
+    teacher = models.OneToOneField(Teacher, on_delete=models.CASCADE, related_name='doubt_counter')
+    unresolved = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.teacher.employee_number}: {self.unresolved} unresolved"
+
+class Material(StoredFilesMixin, models.Model):
     MATERIAL_TYPE_CHOICES = [
         ('notes', 'Notes'),
         ('question_bank', 'Question Bank'),
@@ -218,7 +356,7 @@ class Material(models.Model):
     subject = models.ForeignKey(Subject, on_delete=models.CASCADE, related_name='materials')
     teacher = models.ForeignKey(Teacher, on_delete=models.CASCADE)
     description = models.TextField()
-    file = models.FileField(upload_to='materials/')
+    file = BlobFileField(upload_to='materials/', storage=content_storage)
     material_type = models.CharField(max_length=20, choices=MATERIAL_TYPE_CHOICES, default='notes')
     uploaded_at = models.DateTimeField(auto_now_add=True)
     is_active = models.BooleanField(default=True)
@@ -270,6 +408,27 @@ class ExamResult(models.Model):
     def __str__(self):
         return f"{self.student.campus_id} - {self.subject.name} - {self.get_exam_type_display()} - {self.grade}"
 
+class ExamSchedule(models.Model):
+    """When and where one subject's paper is sat, as planned by portal.exam_scheduler"""
+    SESSION_CHOICES = [
+        ('FN', 'Forenoon'),
+        ('AN', 'Afternoon'),
+    ]
+    
+    exam_type = models.CharField(max_length=20, choices=ExamResult.EXAM_TYPE_CHOICES)
+    subject = models.ForeignKey(Subject, on_delete=models.CASCADE, related_name='exam_schedules')
+    date = models.DateField()
+    session = models.CharField(max_length=2, choices=SESSION_CHOICES, default='FN')
+    rooms = models.CharField(max_length=200, blank=True, help_text='Comma-separated rooms seating this paper')
+    candidates = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        unique_together = ['exam_type', 'subject']
+        ordering = ['date', 'session']
+    
+    def __str__(self):
+        return f"{self.subject.code} - {self.get_exam_type_display()} - {self.date} {self.session}"
+
 class HallTicketRequest(models.Model):
     STATUS_CHOICES = [
         ('pending', 'Pending'),
@@ -315,7 +474,7 @@ class Notification(models.Model):
     def __str__(self):
         return self.title
 
-class BulkUserImport(models.Model):
+class BulkUserImport(StoredFilesMixin, models.Model):
     STATUS_CHOICES = [
         ('pending', 'Pending'),
         ('processing', 'Processing'),
@@ -323,7 +482,7 @@ class BulkUserImport(models.Model):
         ('failed', 'Failed'),
     ]
     
-    file = models.FileField(upload_to='bulk_imports/',
+    file = BlobFileField(upload_to='bulk_imports/', storage=content_storage,
                             help_text=mark_safe(
                                 '''
                                 <a href="/admin/portal/bulkuserimport/download-template/?user_type=student"
@@ -348,4 +507,47 @@ class BulkUserImport(models.Model):
     error_log = models.TextField(blank=True)
     
     def __str__(self):
-        return f"Bulk Import - {self.user_type} - {self.status}"
\ No newline at end of file
+        return f"Bulk Import - {self.user_type} - {self.status}"
+
+
+class UploadSession(models.Model):
+    """A file arriving in chunks through portal.chunked_uploads, bound to its target on finalize"""
+    TARGET_CHOICES = [
+        ('submission', 'Assignment Submission'),
+        ('material', 'Material'),
+    ]
+    
+    upload_id = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='upload_sessions')
+    target = models.CharField(max_length=20, choices=TARGET_CHOICES)
+    filename = models.CharField(max_length=255)
+    size = models.BigIntegerField()
+    received = models.BigIntegerField(default=0)
+    sha256 = models.CharField(max_length=64, blank=True, help_text='Digest announced by the client, checked on finalize')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.user.username} - {self.filename} - {self.received}/{self.size}"
+
+class MediaBlob(models.Model):
+    """One stored file of portal.storage.ContentAddressedStorage and how many FileFields point at it"""
+    name = models.CharField(max_length=100, unique=True)
+    sha256 = models.CharField(max_length=64, db_index=True)
+    size = models.BigIntegerField()
+    refs = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"{self.name} ({self.refs} refs)"
+
+class DocumentSignature(models.Model):
+    """MinHash signature of a file's text, keyed by the file's SHA-256 (see portal.similarity)"""
+    sha256 = models.CharField(max_length=64, unique=True)
+    signature = models.BinaryField(default=b'')
+    shingle_count = models.IntegerField(default=0)
+    error = models.CharField(max_length=200, blank=True, help_text='Why no signature could be built')
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"{self.sha256[:12]} ({self.shingle_count} shingles)"
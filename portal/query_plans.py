@@ -0,0 +1,200 @@
+import re
+from datetime import date, timedelta
+from django.utils import timezone
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models import Count, Q, Sum
+from .models import (
+    Assignment, AssignmentSubmission, Attendance, AttendanceSummary, Doubt, ExamResult, Material,
+    Student, Subject, Teacher, TimeTable
+)
+from .doubt_inbox import recount_unresolved
+
+# Tables that grow with usage; a full scan on any of them is a regression
+LARGE_TABLES = {
+    Attendance._meta.db_table,
+    AttendanceSummary._meta.db_table,
+}
+
+# How each backend reports a full table scan in EXPLAIN output
+FULL_SCAN_PATTERNS = {
+    'sqlite': re.compile(r'\bSCAN (\w+)\b(?! USING)'),
+    'mysql': re.compile(r'Table scan on (\w+)'),
+    'postgresql': re.compile(r'Seq Scan on (\w+)'),
+}
+
+
+def full_scans(plan, vendor=None):
+    """Return the large tables that ``plan`` reads with a full table scan"""
+    pattern = FULL_SCAN_PATTERNS.get(vendor or connection.vendor)
+    if pattern is None:
+        return set()
+    return {table for table in pattern.findall(plan) if table in LARGE_TABLES}
+
+
+def hot_queries(student, subject):
+    """The Attendance queries that portal.views runs on every page view or submit"""
+    today = date.today()
+    return {
+        'attendance: recent records': (
+            Attendance.objects.filter(student=student).order_by('-date', '-period')[:20]
+        ),
+        'attendance: per-subject summary': (
+            AttendanceSummary.objects.filter(student=student)
+        ),
+        'dashboard: overall summary': (
+            AttendanceSummary.objects.filter(student=student).values('student')
+            .annotate(total_classes=Sum('total'), present_classes=Sum('present'))
+        ),
+        'attendance: present count': (
+            Attendance.objects.filter(student=student, is_present=True).values('student')
+            .annotate(count=Count('id'))
+        ),
+        'attendance: student and subject': (
+            Attendance.objects.filter(student=student, subject=subject).order_by('-date')
+        ),
+        'attendance: existing sheet rows': (
+            Attendance.objects.filter(
+                subject=subject,
+                date=today,
+                period='Period 1',
+                student_id__in=[student.id],
+            )
+        ),
+        'report: shortfall aggregate': (
+            Attendance.objects.filter(subject__semester=subject.semester, student__batch=student.batch)
+            .values('student_id', 'subject_id')
+            .annotate(total=Count('id'), present=Count('id', filter=Q(is_present=True)))
+            .order_by()
+        ),
+        'calendar: student days': (
+            Attendance.objects.filter(student=student, date__gte=today - timedelta(days=182), date__lte=today)
+            .values('date').annotate(total=Count('id')).order_by()
+        ),
+        'calendar: subject days': (
+            Attendance.objects.filter(subject=subject, date__gte=today - timedelta(days=182), date__lte=today)
+            .values('date').annotate(total=Count('id')).order_by()
+        ),
+        'admin: date hierarchy': (
+            Attendance.objects.filter(date__gte=today - timedelta(days=7), date__lte=today)
+            .order_by('-date', 'student')[:100]
+        ),
+    }
+
+
+def seed_attendance(students=1000, subjects=6, days=30, batch_size=2000):
+    """Fill the current database with a large synthetic semester of attendance"""
+    teacher_user = User.objects.create(username='plan-check-teacher')
+    teacher = Teacher.objects.create(user=teacher_user, employee_number='PLAN-T', qualification='-')
+    subject_objs = Subject.objects.bulk_create([
+        Subject(name=f'Subject {i}', code=f'PLAN-{i}', semester=5, teacher=teacher)
+        for i in range(subjects)
+    ])
+
+    users = User.objects.bulk_create([
+        User(username=f'plan-check-{i}') for i in range(students)
+    ])
+    student_objs = Student.objects.bulk_create([
+        Student(
+            user=user,
+            campus_id=f'PLAN{i}',
+            registration_number=f'PLANREG{i}',
+            batch=Student.BATCH_CHOICES[i % len(Student.BATCH_CHOICES)][0],
+            phone='0',
+        )
+        for i, user in enumerate(users)
+    ])
+
+    periods = [choice[0] for choice in TimeTable.PERIOD_CHOICES if choice[0] not in ('Break', 'Lunch Break')]
+    start = date.today() - timedelta(days=days)
+    rows = []
+    summaries = []
+    for s_index, student in enumerate(student_objs):
+        for j, subject in enumerate(subject_objs):
+            present = 0
+            for day in range(days):
+                is_present = (s_index + j + day) % 5 != 0
+                present += is_present
+                rows.append(Attendance(
+                    student=student,
+                    subject=subject,
+                    date=start + timedelta(days=day),
+                    period=periods[j % len(periods)],
+                    is_present=is_present,
+                    marked_by=teacher,
+                ))
+            summaries.append(AttendanceSummary(student=student, subject=subject, total=days, present=present))
+            if len(rows) >= batch_size:
+                Attendance.objects.bulk_create(rows, batch_size=batch_size)
+                rows = []
+    Attendance.objects.bulk_create(rows, batch_size=batch_size)
+    AttendanceSummary.objects.bulk_create(summaries, batch_size=batch_size)
+
+    # Refresh planner statistics so the plans reflect the seeded volume
+    with connection.cursor() as cursor:
+        if connection.vendor == 'mysql':
+            cursor.execute('ANALYZE TABLE ' + ', '.join(sorted(LARGE_TABLES)))
+        elif connection.vendor in ('sqlite', 'postgresql'):
+            cursor.execute('ANALYZE')
+
+    return student_objs[0], subject_objs[0]
+
+
+def seed_dashboard(scale=1, prefix='dash'):
+    """Fill the current database with ``scale`` x a small semester of dashboard rows.
+
+    Returns (student user, teacher user) whose dashboards show the seeded rows.
+    """
+    teacher_user = User.objects.create(username=f'{prefix}-teacher', first_name='Dash', last_name='Teacher')
+    teacher = Teacher.objects.create(user=teacher_user, employee_number=f'{prefix.upper()}-T', qualification='-')
+    subjects = Subject.objects.bulk_create([
+        Subject(name=f'{prefix} subject {i}', code=f'{prefix.upper()}-{i}', semester=5, teacher=teacher)
+        for i in range(2 * scale)
+    ])
+    users = User.objects.bulk_create([
+        User(username=f'{prefix}-student-{i}', first_name='Dash', last_name=str(i)) for i in range(5 * scale)
+    ])
+    students = Student.objects.bulk_create([
+        Student(user=user, campus_id=f'{prefix.upper()}{i}', registration_number=f'{prefix.upper()}REG{i}',
+                semester=5, batch='Batch 1', phone='0')
+        for i, user in enumerate(users)
+    ])
+
+    now = timezone.now()
+    assignments = Assignment.objects.bulk_create([
+        Assignment(title=f'Assignment {i}', description='-', subject=subjects[i % len(subjects)],
+                   teacher=teacher, due_date=now + timedelta(days=i + 1))
+        for i in range(6 * scale)
+    ])
+    # The first student leaves every other assignment pending
+    AssignmentSubmission.objects.bulk_create([
+        AssignmentSubmission(assignment=assignment, student=student, answer_file='assignments/submissions/seed.pdf')
+        for a_index, assignment in enumerate(assignments)
+        for s_index, student in enumerate(students)
+        if s_index or a_index % 2
+    ])
+    Material.objects.bulk_create([
+        Material(title=f'Material {i}', subject=subjects[i % len(subjects)], teacher=teacher,
+                 description='-', file='materials/seed.pdf')
+        for i in range(6 * scale)
+    ])
+    ExamResult.objects.bulk_create([
+        ExamResult(student=student, subject=subject, exam_type=exam_type, marks_obtained=80, grade='A',
+                   published_by=teacher)
+        for student in students
+        for subject in subjects
+        for exam_type in ('internal_1', 'internal_2')
+    ])
+    Doubt.objects.bulk_create([
+        Doubt(student=students[i % len(students)], subject=subjects[i % len(subjects)],
+              title=f'Doubt {i}', question='-')
+        for i in range(4 * scale)
+    ])
+    # bulk_create skips the signals that keep the counters
+    recount_unresolved([teacher.id])
+    AttendanceSummary.objects.bulk_create([
+        AttendanceSummary(student=student, subject=subject, total=10, present=8)
+        for student in students
+        for subject in subjects
+    ])
+    return students[0].user, teacher_user
@@ -0,0 +1,131 @@
+import csv
+from collections import defaultdict
+from io import BytesIO
+import numpy as np
+import pandas as pd
+from django.db.models import Count, Q
+from .models import Attendance, ArchivedAttendance
+
+# Minimum attendance percentage required to sit the exam
+ATTENDANCE_THRESHOLD = 75
+
+# Longest date range the calendar API will aggregate
+MAX_CALENDAR_DAYS = 366
+
+SHORTFALL_COLUMNS = [
+    'registration_number', 'campus_id', 'student_name', 'batch',
+    'subject_code', 'subject_name', 'present', 'total', 'percentage', 'classes_needed',
+]
+SHORTFALL_GROUP_FIELDS = (
+    'student__registration_number',
+    'student__campus_id',
+    'student__user__first_name',
+    'student__user__last_name',
+    'student__batch',
+    'subject__code',
+    'subject__name',
+)
+
+
+def attendance_shortfall(semester, batch=None, threshold=ATTENDANCE_THRESHOLD):
+    """Return a DataFrame of every student below ``threshold`` percent in each subject.
+
+    Only students currently in ``semester`` are reported; rows earlier
+    cohorts left in the same subjects are not counted. Counts come from one
+    grouped query over Attendance and one over ArchivedAttendance, so closed
+    terms count just as they do in AttendanceSummary and the calendar.
+    Percentages and the number of consecutive classes each student must
+    attend to reach the threshold are computed column-wise on the arrays.
+    """
+    frames = []
+    for model in (Attendance, ArchivedAttendance):
+        records = model.objects.filter(subject__semester=semester, student__semester=semester)
+        if batch:
+            records = records.filter(student__batch=batch)
+        rows = records.values(*SHORTFALL_GROUP_FIELDS).annotate(
+            total=Count('id'),
+            present=Count('id', filter=Q(is_present=True)),
+        ).order_by()
+        frames.append(pd.DataFrame.from_records(list(rows), columns=[*SHORTFALL_GROUP_FIELDS, 'total', 'present']))
+
+    df = pd.concat(frames, ignore_index=True)
+    if df.empty:
+        return pd.DataFrame(columns=SHORTFALL_COLUMNS)
+    df = df.groupby(list(SHORTFALL_GROUP_FIELDS), as_index=False, dropna=False)[['total', 'present']].sum()
+
+    total = df['total'].to_numpy(dtype=np.int64)
+    present = df['present'].to_numpy(dtype=np.int64)
+    df['percentage'] = np.round(np.divide(present * 100, total, where=total > 0, out=np.zeros(len(df))), 1)
+
+    # Attending x more classes in a row gives (present + x) / (total + x) >= t,
+    # so x = ceil((t * total - 100 * present) / (100 - t)) in whole percent.
+    shortfall = threshold * total - 100 * present
+    df['classes_needed'] = np.maximum(-(-shortfall // (100 - threshold)), 0)
+
+    df = df[shortfall > 0].copy()
+    df['student_name'] = (df['student__user__first_name'] + ' ' + df['student__user__last_name']).str.strip()
+    df = df.rename(columns={
+        'student__registration_number': 'registration_number',
+        'student__campus_id': 'campus_id',
+        'student__batch': 'batch',
+        'subject__code': 'subject_code',
+        'subject__name': 'subject_name',
+    })
+    return df[SHORTFALL_COLUMNS].sort_values(['subject_code', 'registration_number']).reset_index(drop=True)
+
+
+class Echo:
+    """File-like object whose write() hands the line back, for streaming csv.writer output"""
+    def write(self, value):
+        return value
+
+
+def shortfall_csv_rows(df):
+    """Yield the report as CSV lines, one row at a time"""
+    writer = csv.writer(Echo())
+    yield writer.writerow(SHORTFALL_COLUMNS)
+    for row in df.itertuples(index=False, name=None):
+        yield writer.writerow(row)
+
+
+def shortfall_xlsx(df):
+    """Render the report as XLSX bytes"""
+    buffer = BytesIO()
+    with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
+        df.to_excel(writer, index=False, sheet_name='Shortfall')
+    return buffer.getvalue()
+
+
+def attendance_calendar(start, end, student=None, subject=None):
+    """Per-day attendance counts between ``start`` and ``end`` as parallel arrays.
+
+    Filter by ``student`` for a student's own calendar or by ``subject`` for a
+    class. Live and archived rows are grouped by date in a single UNION ALL
+    query. Returns {'dates': [...], 'present': [...], 'total': [...]}.
+    """
+    filters = {'date__gte': start, 'date__lte': end}
+    if student is not None:
+        filters['student'] = student
+    if subject is not None:
+        filters['subject'] = subject
+
+    per_day = [
+        model.objects.filter(**filters).values('date').annotate(
+            total=Count('id'),
+            present=Count('id', filter=Q(is_present=True)),
+        ).order_by()
+        for model in (Attendance, ArchivedAttendance)
+    ]
+
+    # A term boundary can put one date in both tables; fold those together
+    counts = defaultdict(lambda: [0, 0])
+    for row in per_day[0].union(per_day[1], all=True):
+        counts[row['date']][0] += row['present']
+        counts[row['date']][1] += row['total']
+
+    dates = sorted(counts)
+    return {
+        'dates': [day.isoformat() for day in dates],
+        'present': [counts[day][0] for day in dates],
+        'total': [counts[day][1] for day in dates],
+    }
@@ -0,0 +1,260 @@
+from django.db import models
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from .models import (
+    AcademicTerm, Assignment, AssignmentSubmission, Attendance, BulkUserImport, Doubt, DoubtReply, ExamResult,
+    Material, Student, Subject, Teacher, TimeTable
+)
+from .assignment_queries import forget_semester_student_counts
+from .attendance_engine import apply_summary_deltas, is_moving_to_archive
+from .dashboard_cache import invalidate_dashboards
+from .doubt_inbox import adjust_unresolved, recount_unresolved
+from .doubt_search import invalidate_doubt_index
+from .materials_catalogue import invalidate_catalogues
+from .storage import ContentAddressedStorage
+from .timetables import invalidate_timetables
+
+# Single-row Attendance writes (admin edits, shell, update_or_create) keep
+# AttendanceSummary in step here. bulk_mark_attendance bypasses signals and
+# applies its own deltas; rows deleted by archive_term still count.
+
+@receiver(pre_save, sender=Attendance)
+def remember_previous_attendance(sender, instance, raw=False, **kwargs):
+    instance._summary_previous = None
+    if raw or not instance.pk:
+        return
+    instance._summary_previous = (
+        Attendance.objects.filter(pk=instance.pk)
+        .values_list('student_id', 'subject_id', 'is_present')
+        .first()
+    )
+
+@receiver(post_save, sender=Attendance)
+def update_summary_on_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_summary_previous', None)
+    if previous and previous[:2] == (instance.student_id, instance.subject_id):
+        apply_summary_deltas(instance.subject_id, {
+            instance.student_id: (0, int(instance.is_present) - int(previous[2]))
+        })
+    else:
+        if previous:
+            old_student_id, old_subject_id, old_present = previous
+            apply_summary_deltas(old_subject_id, {old_student_id: (-1, -int(old_present))})
+        apply_summary_deltas(instance.subject_id, {instance.student_id: (1, int(instance.is_present))})
+    instance._summary_previous = None
+
+@receiver(post_delete, sender=Attendance)
+def update_summary_on_delete(sender, instance, **kwargs):
+    if is_moving_to_archive():
+        return
+    apply_summary_deltas(instance.subject_id, {instance.student_id: (-1, -int(instance.is_present))})
+
+# Dashboard snapshots. Each write retires only the dashboards that show it:
+# the owning student, every student of the subject's semester, or the teacher.
+
+def _subject_scope(subject_id):
+    return Subject.objects.filter(pk=subject_id).values_list('semester', 'teacher_id').first() or (None, None)
+
+@receiver([post_save, post_delete], sender=Attendance)
+@receiver([post_save, post_delete], sender=ExamResult)
+def invalidate_student_dashboard(sender, instance, raw=False, **kwargs):
+    if not raw and not is_moving_to_archive():
+        invalidate_dashboards(students=[instance.student_id])
+
+@receiver(pre_save, sender=Assignment)
+@receiver(pre_save, sender=Material)
+def remember_previous_semester(sender, instance, raw=False, **kwargs):
+    instance._previous_semester = None
+    if not raw and instance.pk:
+        instance._previous_semester = (
+            sender.objects.filter(pk=instance.pk).values_list('subject__semester', flat=True).first()
+        )
+
+@receiver([post_save, post_delete], sender=Assignment)
+@receiver([post_save, post_delete], sender=Material)
+def invalidate_semester_dashboards(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    # A row moved to another semester's subject leaves both dashboards stale
+    semester, _ = _subject_scope(instance.subject_id)
+    previous = getattr(instance, '_previous_semester', None)
+    invalidate_dashboards(
+        semesters=[scope for scope in {semester, previous} if scope], teachers=[instance.teacher_id]
+    )
+
+@receiver(pre_save, sender=Subject)
+def remember_previous_subject_scope(sender, instance, raw=False, **kwargs):
+    instance._previous_scope = None
+    if not raw and instance.pk:
+        instance._previous_scope = Subject.objects.filter(pk=instance.pk).values_list('semester', 'teacher_id').first()
+
+@receiver([post_save, post_delete], sender=Subject)
+def invalidate_subject_dashboards(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    # Teacher dashboards list their subjects; reassigning one changes two teachers
+    previous_semester, previous_teacher_id = getattr(instance, '_previous_scope', None) or (None, None)
+    invalidate_dashboards(
+        semesters=[scope for scope in {instance.semester, previous_semester} if scope],
+        teachers=[instance.teacher_id, previous_teacher_id],
+    )
+
+@receiver([post_save, post_delete], sender=AssignmentSubmission)
+def invalidate_submission_dashboards(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    teacher_id = Assignment.objects.filter(pk=instance.assignment_id).values_list('teacher_id', flat=True).first()
+    invalidate_dashboards(students=[instance.student_id], teachers=[teacher_id])
+
+@receiver([post_save, post_delete], sender=Doubt)
+def invalidate_doubt_dashboards(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    _, teacher_id = _subject_scope(instance.subject_id)
+    invalidate_dashboards(students=[instance.student_id], teachers=[teacher_id])
+
+# Timetable grids and feeds. A TimeTable edit retires its batch (and its old
+# batch if it moved); Subject and Teacher edits can appear in any batch's
+# grid, and AcademicTerm dates bound every calendar feed.
+
+@receiver(pre_save, sender=TimeTable)
+def remember_previous_batch(sender, instance, raw=False, **kwargs):
+    instance._previous_batch = None
+    if not raw and instance.pk:
+        instance._previous_batch = TimeTable.objects.filter(pk=instance.pk).values_list('batch', flat=True).first()
+
+@receiver([post_save, post_delete], sender=TimeTable)
+def invalidate_batch_timetable(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_previous_batch', None)
+    invalidate_timetables(f'batch:{instance.batch}', f'batch:{previous}' if previous else None, 'batches')
+
+@receiver([post_save, post_delete], sender=Subject)
+@receiver([post_save, post_delete], sender=Teacher)
+@receiver([post_save, post_delete], sender=AcademicTerm)
+def invalidate_all_timetables(sender, instance, raw=False, **kwargs):
+    if not raw:
+        invalidate_timetables('all')
+
+# Per-semester student counts behind the assignment submission statistics
+
+@receiver([post_save, post_delete], sender=Student)
+def invalidate_semester_student_counts(sender, instance, raw=False, **kwargs):
+    if not raw:
+        forget_semester_student_counts()
+
+# Per-teacher unresolved doubt counters. Replies resolve doubts through
+# doubt_inbox.resolve_doubt, which moves the counter itself.
+
+@receiver(pre_save, sender=Doubt)
+def remember_previous_doubt_state(sender, instance, raw=False, **kwargs):
+    instance._counter_previous = None
+    if not raw and instance.pk:
+        instance._counter_previous = (
+            Doubt.objects.filter(pk=instance.pk).values_list('subject__teacher_id', 'is_resolved').first()
+        )
+
+@receiver(post_save, sender=Doubt)
+def count_saved_doubt(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    deltas = {}
+    previous = getattr(instance, '_counter_previous', None)
+    if previous and not previous[1]:
+        deltas[previous[0]] = -1
+    if not instance.is_resolved:
+        _, teacher_id = _subject_scope(instance.subject_id)
+        deltas[teacher_id] = deltas.get(teacher_id, 0) + 1
+    adjust_unresolved(deltas)
+    instance._counter_previous = None
+
+@receiver(post_delete, sender=Doubt)
+def count_deleted_doubt(sender, instance, **kwargs):
+    if not instance.is_resolved:
+        _, teacher_id = _subject_scope(instance.subject_id)
+        adjust_unresolved({teacher_id: -1})
+
+@receiver(post_save, sender=Subject)
+def recount_reassigned_doubts(sender, instance, created, raw=False, **kwargs):
+    previous = getattr(instance, '_previous_scope', None)
+    if not raw and previous and previous[1] != instance.teacher_id:
+        recount_unresolved([previous[1], instance.teacher_id])
+
+# Student materials catalogues, one per semester. A Material edit retires
+# its semester (and its old one if it moved); Subject and Teacher edits can
+# appear in any semester's catalogue.
+
+@receiver([post_save, post_delete], sender=Material)
+def invalidate_semester_catalogue(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    semester, _ = _subject_scope(instance.subject_id)
+    previous = getattr(instance, '_previous_semester', None)
+    invalidate_catalogues(
+        f'semester:{semester}' if semester else None,
+        f'semester:{previous}' if previous and previous != semester else None,
+    )
+
+@receiver([post_save, post_delete], sender=Subject)
+@receiver([post_save, post_delete], sender=Teacher)
+def invalidate_all_catalogues(sender, instance, raw=False, **kwargs):
+    if not raw:
+        invalidate_catalogues('all')
+
+# Doubt search. Without MySQL FULLTEXT the search runs on an in-process index,
+# rebuilt after any doubt or reply changes.
+
+@receiver([post_save, post_delete], sender=Doubt)
+@receiver([post_save, post_delete], sender=DoubtReply)
+def invalidate_doubt_search(sender, instance, raw=False, **kwargs):
+    if not raw:
+        invalidate_doubt_index()
+
+# Content-addressed media. Each FileField value holds one reference to its
+# blob; replacing or deleting the value releases it (see portal.storage).
+
+def _stored_file_fields(instance):
+    return [
+        field for field in instance._meta.concrete_fields
+        if isinstance(field, models.FileField) and isinstance(field.storage, ContentAddressedStorage)
+    ]
+
+@receiver(pre_save, sender=Assignment)
+@receiver(pre_save, sender=AssignmentSubmission)
+@receiver(pre_save, sender=Material)
+@receiver(pre_save, sender=BulkUserImport)
+def remember_stored_files(sender, instance, raw=False, **kwargs):
+    instance._previous_files = {}
+    if raw or not instance.pk:
+        return
+    fields = _stored_file_fields(instance)
+    instance._previous_files = (
+        sender.objects.filter(pk=instance.pk).values(*[field.attname for field in fields]).first() or {}
+    )
+
+@receiver(post_save, sender=Assignment)
+@receiver(post_save, sender=AssignmentSubmission)
+@receiver(post_save, sender=Material)
+@receiver(post_save, sender=BulkUserImport)
+def release_replaced_files(sender, instance, raw=False, **kwargs):
+    stored = instance.__dict__.pop('_stored_files', set())
+    for field in _stored_file_fields(instance):
+        previous = getattr(instance, '_previous_files', {}).get(field.attname)
+        # Re-uploading identical content lands on the same blob name but still
+        # took a reference, so the old one is released all the same
+        if previous and (previous != getattr(instance, field.attname).name or field.attname in stored):
+            field.storage.delete(previous)
+    instance._previous_files = {}
+
+@receiver(post_delete, sender=Assignment)
+@receiver(post_delete, sender=AssignmentSubmission)
+@receiver(post_delete, sender=Material)
+@receiver(post_delete, sender=BulkUserImport)
+def release_deleted_files(sender, instance, **kwargs):
+    for field in _stored_file_fields(instance):
+        name = getattr(instance, field.attname).name
+        if name:
+            field.storage.delete(name)
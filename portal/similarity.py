@@ -0,0 +1,199 @@
+import hashlib
+import os
+import re
+import zipfile
+from collections import defaultdict
+from itertools import combinations
+from xml.etree import ElementTree
+import numpy as np
+from pypdf import PdfReader
+from pypdf.errors import PdfReadError
+from .models import DocumentSignature
+from .storage import digest_from_name, file_digest
+
+# Signatures have NUM_PERM slots, split into BANDS bands of ROWS slots for
+# LSH. Two files share a band bucket with probability 1 - (1 - J^ROWS)^BANDS
+# for Jaccard similarity J, which turns steeply around (1/BANDS)^(1/ROWS),
+# about 0.42; candidates are then checked against SIMILARITY_THRESHOLD.
+NUM_PERM = 128
+BANDS = 32
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 5
+SIMILARITY_THRESHOLD = 0.5
+
+# Text beyond these is ignored; long enough for any honest answer
+MAX_TEXT_CHARS = 2_000_000
+MAX_PDF_PAGES = 300
+# Uncompressed size of a DOCX's document.xml, so a zip bomb is refused unread
+MAX_DOCX_XML_BYTES = 50 * 1024 * 1024
+
+# The permutations must never change: cached signatures are only comparable
+# with signatures built from the same ones. RandomState streams are stable
+# across numpy versions.
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_random = np.random.RandomState(20240601)
+_PERM_A = _random.randint(1, _MERSENNE_PRIME, size=NUM_PERM, dtype=np.uint64)
+_PERM_B = _random.randint(0, _MERSENNE_PRIME, size=NUM_PERM, dtype=np.uint64)
+
+_WORD_RE = re.compile(r'\w+')
+_DOCX_TEXT = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}t'
+
+
+class UnreadableDocument(Exception):
+    pass
+
+
+# Text extraction
+
+def extract_text(f, extension):
+    """Plain text of a PDF, DOCX or TXT file object, at most MAX_TEXT_CHARS of it"""
+    try:
+        if extension == '.pdf':
+            parts = []
+            length = 0
+            for page in PdfReader(f).pages[:MAX_PDF_PAGES]:
+                text = page.extract_text() or ''
+                parts.append(text)
+                length += len(text) + 1
+                if length >= MAX_TEXT_CHARS:
+                    break
+            return '\n'.join(parts)[:MAX_TEXT_CHARS]
+        if extension == '.docx':
+            with zipfile.ZipFile(f) as docx:
+                if docx.getinfo('word/document.xml').file_size > MAX_DOCX_XML_BYTES:
+                    raise UnreadableDocument('The document is too large to compare')
+                root = ElementTree.fromstring(docx.read('word/document.xml'))
+            return ' '.join(node.text or '' for node in root.iter(_DOCX_TEXT))[:MAX_TEXT_CHARS]
+        if extension == '.txt':
+            return f.read(MAX_TEXT_CHARS * 4).decode('utf-8', errors='replace')[:MAX_TEXT_CHARS]
+    except (PdfReadError, zipfile.BadZipFile, KeyError, ElementTree.ParseError, ValueError) as e:
+        raise UnreadableDocument(f'Could not read the file: {e}'[:200])
+    raise UnreadableDocument(f'{extension or "This"} files are not compared')
+
+
+# MinHash
+
+def shingle_hashes(text):
+    """32-bit hashes of the distinct SHINGLE_SIZE-word shingles of ``text``"""
+    words = _WORD_RE.findall(text[:MAX_TEXT_CHARS].lower())
+    if len(words) < SHINGLE_SIZE:
+        shingles = {' '.join(words)} if words else set()
+    else:
+        shingles = {' '.join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+    return np.fromiter(
+        (int.from_bytes(hashlib.blake2b(s.encode('utf-8'), digest_size=4).digest(), 'little') for s in shingles),
+        dtype=np.uint64, count=len(shingles),
+    )
+
+
+def minhash(hashes, block_size=4096):
+    """NUM_PERM minimums of (a * h + b) mod p over ``hashes``, a block of shingles at a time"""
+    signature = np.full(NUM_PERM, np.iinfo(np.uint64).max, dtype=np.uint64)
+    for start in range(0, len(hashes), block_size):
+        block = hashes[start:start + block_size, np.newaxis]
+        # uint64 products wrap around, which still gives a usable hash family
+        permuted = (block * _PERM_A + _PERM_B) % _MERSENNE_PRIME
+        signature = np.minimum(signature, permuted.min(axis=0))
+    return signature
+
+
+def estimated_similarity(a, b):
+    return float(np.count_nonzero(a == b)) / NUM_PERM
+
+
+def build_signature(digest, field_file):
+    """An unsaved DocumentSignature for the file's text; failures are recorded in ``error``"""
+    extension = os.path.splitext(field_file.name)[1].lower()
+    try:
+        with field_file.open('rb') as f:
+            hashes = shingle_hashes(extract_text(f, extension))
+    except UnreadableDocument as e:
+        return DocumentSignature(sha256=digest, error=str(e)[:200])
+    except Exception as e:
+        # The parsers can fail in many ways on a malformed upload; one bad
+        # file must not stop the report for the others
+        return DocumentSignature(sha256=digest, error=f'Could not read the file: {type(e).__name__}: {e}'[:200])
+    if not len(hashes):
+        return DocumentSignature(sha256=digest, error='No text found')
+    return DocumentSignature(
+        sha256=digest, signature=minhash(hashes).astype('<u8').tobytes(), shingle_count=len(hashes)
+    )
+
+
+# Locality-sensitive hashing
+
+def candidate_pairs(signatures):
+    """Pairs of keys of ``signatures`` that share at least one band bucket"""
+    pairs = set()
+    for band in range(BANDS):
+        buckets = defaultdict(list)
+        for key, signature in signatures.items():
+            buckets[signature[band * ROWS:(band + 1) * ROWS].tobytes()].append(key)
+        for keys in buckets.values():
+            if len(keys) > 1:
+                pairs.update(combinations(sorted(keys), 2))
+    return pairs
+
+
+# Reports
+
+def similarity_report(submissions, compute=False, threshold=SIMILARITY_THRESHOLD):
+    """Near-duplicate pairs among ``submissions`` (AssignmentSubmission objects).
+
+    Signatures are cached in DocumentSignature by file SHA-256, so identical
+    files and re-runs cost nothing. With ``compute=False`` only cached
+    signatures are used and the rest are counted as pending; with
+    ``compute=True`` the missing ones are built first. Returns a dict with
+    'pairs' ([(submission, submission, similarity)], most similar first),
+    'analysed', 'pending', 'failed' ([(submission, reason)]) and 'built'.
+    """
+    submissions = [submission for submission in submissions if submission.answer_file]
+    digests = {}
+    for submission in submissions:
+        digest = digest_from_name(submission.answer_file.name)
+        if digest is None and compute:
+            # Stored before content-addressed storage; hash the file itself
+            try:
+                digest = file_digest(submission.answer_file.path)
+            except OSError:
+                pass
+        if digest:
+            digests[submission.id] = digest
+
+    cached = DocumentSignature.objects.in_bulk(set(digests.values()), field_name='sha256')
+    built = []
+    if compute:
+        by_digest = {digest: submission for submission in submissions
+                     for digest in [digests.get(submission.id)] if digest}
+        built = [build_signature(digest, by_digest[digest].answer_file)
+                 for digest in by_digest if digest not in cached]
+        DocumentSignature.objects.bulk_create(built, ignore_conflicts=True)
+        cached.update((signature.sha256, signature) for signature in built)
+
+    signatures = {}
+    failed = []
+    pending = 0
+    for submission in submissions:
+        record = cached.get(digests.get(submission.id))
+        if record is None:
+            pending += 1
+        elif record.error:
+            failed.append((submission, record.error))
+        else:
+            signatures[submission.id] = np.frombuffer(bytes(record.signature), dtype='<u8')
+
+    by_id = {submission.id: submission for submission in submissions}
+    pairs = []
+    for a, b in candidate_pairs(signatures):
+        similarity = estimated_similarity(signatures[a], signatures[b])
+        if similarity >= threshold:
+            pairs.append((by_id[a], by_id[b], similarity))
+    pairs.sort(key=lambda pair: (-pair[2], pair[0].id, pair[1].id))
+
+    return {
+        'pairs': pairs,
+        'analysed': len(signatures),
+        'pending': pending,
+        'failed': failed,
+        'built': len(built),
+    }
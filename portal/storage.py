@@ -0,0 +1,177 @@
+import hashlib
+import os
+import tempfile
+from django.apps import apps
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage
+from django.db.models.fields.files import FieldFile
+from django.db import IntegrityError, models, transaction
+from django.utils.deconstruct import deconstructible
+
+BLOB_DIR = 'blobs'
+STAGING_DIR = f'{BLOB_DIR}/staging'
+
+# Longest file extension kept on a blob name, so browsers and web servers
+# can still guess the content type
+MAX_EXTENSION_LENGTH = 10
+
+
+def blob_name(digest, extension=''):
+    """blobs/<aa>/<bb>/<sha256><ext>: two levels of 256 directories each.
+
+    65,536 leaf directories keep a few dozen files apiece even at millions
+    of blobs.
+    """
+    return f'{BLOB_DIR}/{digest[:2]}/{digest[2:4]}/{digest}{extension}'
+
+
+def is_blob_name(name):
+    return bool(name) and name.startswith(BLOB_DIR + '/') and not name.startswith(STAGING_DIR + '/')
+
+
+def digest_from_name(name):
+    """The SHA-256 a blob name was built from, or None for other names"""
+    if not is_blob_name(name):
+        return None
+    digest = os.path.splitext(name.rsplit('/', 1)[-1])[0]
+    return digest if len(digest) == 64 else None
+
+
+def file_digest(path, block_size=64 * 1024):
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+
+def _media_blob_model():
+    # Looked up lazily: models.py imports this module to build its FileFields
+    return apps.get_model('portal', 'MediaBlob')
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """FileSystemStorage that keeps one file per distinct content.
+
+    save() hashes the upload with SHA-256 and stores it once under
+    blob_name(); saving identical bytes again only adds a reference.
+    MediaBlob.refs counts the FileField values pointing at each blob, and
+    delete() releases one reference, removing the file with the last one
+    once the transaction commits. Names outside blobs/, from before this
+    backend, are plain FileSystemStorage files.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # The stored name comes from the content, not from upload_to
+        return name
+
+    def _stage(self, content):
+        """(staged path or None, sha256, size) of ``content``.
+
+        Uploads already on disk (chunked or temporary uploads) are hashed in
+        place; anything else is copied to a staging file while it is hashed.
+        """
+        if hasattr(content, 'temporary_file_path'):
+            path = content.temporary_file_path()
+            digest = getattr(content, 'sha256', None) or file_digest(path)
+            return None, digest, os.path.getsize(path)
+
+        staging_dir = self.path(STAGING_DIR)
+        os.makedirs(staging_dir, exist_ok=True)
+        hasher = hashlib.sha256()
+        size = 0
+        with tempfile.NamedTemporaryFile(dir=staging_dir, delete=False) as staged:
+            for chunk in content.chunks():
+                hasher.update(chunk)
+                staged.write(chunk)
+                size += len(chunk)
+        return staged.name, hasher.hexdigest(), size
+
+    def _add_reference(self, name, digest, size):
+        MediaBlob = _media_blob_model()
+        with transaction.atomic():
+            if MediaBlob.objects.filter(name=name).update(refs=models.F('refs') + 1):
+                return
+            try:
+                with transaction.atomic():
+                    MediaBlob.objects.create(name=name, sha256=digest, size=size, refs=1)
+            except IntegrityError:
+                # Someone stored the same content at the same moment
+                MediaBlob.objects.filter(name=name).update(refs=models.F('refs') + 1)
+
+    def _save(self, name, content):
+        extension = os.path.splitext(name)[1].lower()
+        if len(extension) > MAX_EXTENSION_LENGTH:
+            extension = ''
+        staged, digest, size = self._stage(content)
+        name = blob_name(digest, extension)
+
+        # Count the reference before the file exists, so a concurrent
+        # release of the same blob never sees it unreferenced and removes it
+        self._add_reference(name, digest, size)
+
+        full_path = self.path(name)
+        if os.path.exists(full_path):
+            if staged:
+                os.remove(staged)
+            return name
+
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        if staged:
+            os.replace(staged, full_path)
+        else:
+            file_move_safe(content.temporary_file_path(), full_path, allow_overwrite=True)
+        if self.file_permissions_mode is not None:
+            os.chmod(full_path, self.file_permissions_mode)
+        return name
+
+    def delete(self, name):
+        if not name:
+            return
+        if not is_blob_name(name):
+            transaction.on_commit(lambda: FileSystemStorage.delete(self, name))
+            return
+        _media_blob_model().objects.filter(name=name, refs__gt=0).update(refs=models.F('refs') - 1)
+        transaction.on_commit(lambda: self.collect(name))
+
+    def collect(self, name):
+        """Remove the blob ``name`` if nothing references it any more"""
+        MediaBlob = _media_blob_model()
+        with transaction.atomic():
+            blob = MediaBlob.objects.select_for_update().filter(name=name, refs__lte=0).first()
+            if blob is None:
+                return False
+            blob.delete()
+            FileSystemStorage.delete(self, name)
+        return True
+
+
+content_storage = ContentAddressedStorage()
+
+
+class BlobFieldFile(FieldFile):
+    def save(self, name, content, save=True):
+        super().save(name, content, save=False)
+        # Each store takes a reference, even when the content, and so the
+        # name, is what the field held before; post_save releases the old one
+        self.instance.__dict__.setdefault('_stored_files', set()).add(self.field.attname)
+        if save:
+            self.instance.save()
+
+    save.alters_data = True
+
+
+class BlobFileField(models.FileField):
+    """FileField that notes on its instance when it stores a new file (see BlobFieldFile)"""
+    attr_class = BlobFieldFile
+
+
+def blob_fields():
+    """(model, field name) of every FileField stored in content_storage"""
+    return [
+        (model, field.name)
+        for model in apps.get_app_config('portal').get_models()
+        for field in model._meta.get_fields()
+        if isinstance(field, models.FileField) and isinstance(field.storage, ContentAddressedStorage)
+    ]
@@ -0,0 +1,108 @@
+import csv
+import io
+import os
+import zipfile
+from django.utils import timezone
+from django.utils.text import slugify
+from .models import AssignmentSubmission
+
+MANIFEST_NAME = 'manifest.csv'
+MANIFEST_HEADER = ['registration_number', 'campus_id', 'name', 'submitted_at', 'is_late', 'marks', 'file']
+
+# Entries this large need ZIP64 headers, which must be chosen before writing
+ZIP64_LIMIT = zipfile.ZIP64_LIMIT
+
+
+class _ZipSink:
+    """Write-only file for ZipFile that hands the written bytes back in pieces.
+
+    Without tell() or seek() ZipFile treats it as unseekable and writes data
+    descriptors after each entry, so nothing needs to be rewritten later and
+    the archive can be sent as it is built.
+    """
+
+    def __init__(self):
+        self.pieces = []
+
+    def write(self, data):
+        self.pieces.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.pieces)
+        self.pieces = []
+        return data
+
+
+def archive_filename(assignment):
+    return f'{slugify(assignment.subject.code)}_{slugify(assignment.title)}_submissions.zip'
+
+
+def _entry_name(submission):
+    extension = os.path.splitext(submission.answer_file.name)[1].lower()
+    return f'{submission.student.registration_number}{extension}'
+
+
+def _zip_info(name, moment):
+    info = zipfile.ZipInfo(name, date_time=timezone.localtime(moment).timetuple()[:6])
+    info.compress_type = zipfile.ZIP_DEFLATED
+    return info
+
+
+def _csv_line(row):
+    line = io.StringIO()
+    csv.writer(line).writerow(row)
+    return line.getvalue().encode('utf-8')
+
+
+def stream_submissions_zip(assignment):
+    """Yield a ZIP of every submission of ``assignment`` as it is built.
+
+    Answer files are named by registration number and copied one storage
+    chunk at a time; manifest.csv lists submission times and late flags.
+    Submissions are read with iterator(), so memory stays flat however
+    large the class.
+    """
+    submissions = (
+        AssignmentSubmission.objects.filter(assignment=assignment)
+        .select_related('student__user')
+        .order_by('student__registration_number')
+    )
+    sink = _ZipSink()
+    with zipfile.ZipFile(sink, 'w', zipfile.ZIP_DEFLATED) as archive:
+        with archive.open(_zip_info(MANIFEST_NAME, timezone.now()), 'w') as manifest:
+            manifest.write(_csv_line(MANIFEST_HEADER))
+            for submission in submissions.iterator():
+                present = bool(submission.answer_file) and submission.answer_file.storage.exists(
+                    submission.answer_file.name
+                )
+                manifest.write(_csv_line([
+                    submission.student.registration_number,
+                    submission.student.campus_id,
+                    submission.student.user.get_full_name(),
+                    timezone.localtime(submission.submitted_at).isoformat(),
+                    'yes' if submission.is_late else 'no',
+                    '' if submission.marks is None else submission.marks,
+                    _entry_name(submission) if present else 'missing',
+                ]))
+        yield sink.drain()
+
+        for submission in submissions.iterator():
+            try:
+                source = submission.answer_file.open('rb')
+            except (FileNotFoundError, ValueError):
+                continue
+            with source:
+                large = submission.answer_file.size > ZIP64_LIMIT
+                with archive.open(_zip_info(_entry_name(submission), submission.submitted_at), 'w', force_zip64=large) as entry:
+                    for chunk in source.chunks():
+                        entry.write(chunk)
+                        data = sink.drain()
+                        if data:
+                            yield data
+            yield sink.drain()
+    # Closing the archive wrote the central directory
+    yield sink.drain()
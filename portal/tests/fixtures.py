@@ -0,0 +1,63 @@
+import shutil
+import tempfile
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from portal.models import Student, Subject, Teacher
+
+PASSWORD = 'portal-test-password'
+
+
+def make_teacher(username='teacher', employee_number='T-1'):
+    user = User.objects.create_user(username, password=PASSWORD, first_name='Test', last_name='Teacher')
+    return Teacher.objects.create(user=user, employee_number=employee_number, qualification='-')
+
+
+def make_subjects(teacher, count=2, semester=5, prefix='SUB'):
+    return [
+        Subject.objects.create(name=f'Subject {i}', code=f'{prefix}-{i}', semester=semester, teacher=teacher)
+        for i in range(count)
+    ]
+
+
+def make_students(count=5, semester=5, batch='Batch 1', prefix='student'):
+    students = []
+    for i in range(count):
+        user = User.objects.create_user(f'{prefix}-{i}', password=PASSWORD, first_name='Test', last_name=str(i))
+        students.append(Student.objects.create(
+            user=user, campus_id=f'{prefix.upper()}{i}', registration_number=f'{prefix.upper()}REG{i:03}',
+            semester=semester, batch=batch, phone='0',
+        ))
+    return students
+
+
+class PortalTestCase(TestCase):
+    """A teacher with two semester-5 subjects and five students in them.
+
+    Uploads go to a throwaway MEDIA_ROOT, the cache starts empty and static
+    files are served without the collectstatic manifest.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.media_root = tempfile.mkdtemp()
+        cls.addClassCleanup(shutil.rmtree, cls.media_root, ignore_errors=True)
+        settings = override_settings(
+            MEDIA_ROOT=cls.media_root,
+            CHUNKED_UPLOAD_DIR=f'{cls.media_root}/chunks',
+            STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage',
+        )
+        settings.enable()
+        cls.addClassCleanup(settings.disable)
+        super().setUpClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = make_teacher()
+        cls.subjects = make_subjects(cls.teacher)
+        cls.subject = cls.subjects[0]
+        cls.students = make_students()
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
@@ -0,0 +1,79 @@
+import io
+from datetime import date
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.urls import reverse
+from portal.archival import archive_term, recent_attendance_history
+from portal.attendance_engine import bulk_mark_attendance, verify_attendance_summaries
+from portal.models import AcademicTerm, ArchivedAttendance, Attendance, AttendanceSummary
+from .fixtures import PASSWORD, PortalTestCase
+
+
+class ArchiveTermTests(PortalTestCase):
+    def setUp(self):
+        super().setUp()
+        for day in range(1, 6):
+            bulk_mark_attendance(
+                self.subject, date(2023, 3, day), 'Period 1',
+                {student.id: (student.id + day) % 3 > 0 for student in self.students}, self.teacher,
+            )
+        self.summaries = list(AttendanceSummary.objects.values_list('student_id', 'total', 'present'))
+        self.term = AcademicTerm.objects.create(
+            name='Spring 2023', start_date=date(2023, 1, 1), end_date=date(2023, 6, 1), is_closed=True
+        )
+
+    def test_rows_move_and_summaries_still_count_them(self):
+        self.assertEqual(archive_term(self.term, chunk_size=7), 25)
+        self.assertFalse(Attendance.objects.exists())
+        self.assertEqual(ArchivedAttendance.objects.count(), 25)
+        self.assertCountEqual(AttendanceSummary.objects.values_list('student_id', 'total', 'present'), self.summaries)
+        self.assertEqual(verify_attendance_summaries(), [])
+        self.term.refresh_from_db()
+        self.assertIsNotNone(self.term.archived_at)
+
+    def test_rearchiving_replaces_the_archived_mark_once(self):
+        archive_term(self.term)
+        student = self.students[0]
+        Attendance.objects.create(student=student, subject=self.subject, date=date(2023, 3, 1),
+                                  period='Period 1', is_present=True)
+
+        self.assertEqual(archive_term(self.term), 1)
+        self.assertEqual(archive_term(self.term), 0)
+        self.assertEqual(ArchivedAttendance.objects.count(), 25)
+        archived = ArchivedAttendance.objects.get(student=student, date=date(2023, 3, 1))
+        self.assertIs(archived.is_present, True)
+        self.assertEqual(verify_attendance_summaries(), [])
+
+    def test_open_terms_are_refused(self):
+        self.term.is_closed = False
+        with self.assertRaises(ValidationError):
+            archive_term(self.term)
+
+    def test_closed_term_dates_can_no_longer_be_marked(self):
+        with self.assertRaises(ValidationError):
+            bulk_mark_attendance(self.subject, date(2023, 3, 1), 'Period 1', {self.students[0].id: True}, self.teacher)
+
+        sheet = Attendance.objects.filter(date=date(2023, 3, 2)).order_by('student_id')
+        before = list(sheet.values_list('student_id', 'is_present'))
+        self.client.login(username=self.teacher.user.username, password=PASSWORD)
+        # Nobody ticked: the sheet would mark everyone absent
+        response = self.client.post(reverse('attendance'), {
+            'date': '2023-03-02', 'subject': self.subject.id, 'period': 'Period 1',
+        }, follow=True)
+        self.assertContains(response, 'which is closed')
+        self.assertEqual(list(sheet.values_list('student_id', 'is_present')), before)
+
+    def test_command_archives_every_closed_term(self):
+        out = io.StringIO()
+        call_command('archive_attendance', '--chunk-size', '10', stdout=out)
+        self.assertIn('Archived 25 attendance rows from Spring 2023', out.getvalue())
+        self.assertFalse(Attendance.objects.exists())
+
+    def test_history_reaches_into_the_archive(self):
+        archive_term(self.term)
+        bulk_mark_attendance(self.subject, date(2024, 3, 4), 'Period 1', {self.students[0].id: True}, self.teacher)
+        with self.assertNumQueries(2):
+            history = recent_attendance_history(self.students[0], limit=3)
+            subjects = [record.subject.code for record in history]
+        self.assertEqual([record.date for record in history], [date(2024, 3, 4), date(2023, 3, 5), date(2023, 3, 4)])
+        self.assertEqual(subjects, [self.subject.code] * 3)
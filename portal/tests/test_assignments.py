@@ -0,0 +1,136 @@
+from datetime import timedelta
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.urls import reverse
+from django.utils import timezone
+from portal.assignment_queries import (
+    decode_cursor, encode_cursor, pending_students, semester_student_counts, student_assignments,
+    teacher_assignments_with_stats
+)
+from portal.models import Assignment, AssignmentSubmission
+from .fixtures import PASSWORD, PortalTestCase, make_students, make_subjects, make_teacher
+
+
+def submit(assignment, student, **fields):
+    return AssignmentSubmission.objects.create(
+        assignment=assignment, student=student,
+        answer_file=SimpleUploadedFile(f'{student.campus_id}.txt', f'answer by {student.campus_id}'.encode()),
+        **fields,
+    )
+
+
+class AssignmentTestCase(PortalTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        now = timezone.now()
+        # Five open assignments and three overdue, alternating between the two subjects
+        cls.assignments = [
+            Assignment.objects.create(title=f'Task {days}', description='-', subject=cls.subjects[days % 2],
+                                      teacher=cls.teacher, due_date=now + timedelta(days=days))
+            for days in (5, 4, 3, 2, 1, -1, -2, -3)
+        ]
+        other_subject = make_subjects(make_teacher('other', 'T-2'), count=1, semester=6, prefix='OTHER')[0]
+        Assignment.objects.create(title='Senior task', description='-', subject=other_subject,
+                                  teacher=other_subject.teacher, due_date=now + timedelta(days=1))
+
+
+class StudentAssignmentTests(AssignmentTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.student = cls.students[0]
+        submit(cls.assignments[1], cls.student)
+        submit(cls.assignments[6], cls.student, marks=7)
+        submit(cls.assignments[1], cls.students[1])
+
+    def titles(self, assignments):
+        return [assignment.title for assignment in assignments]
+
+    def test_one_query_per_page(self):
+        with self.assertNumQueries(1):
+            page, cursor = student_assignments(self.student, limit=3)
+            self.assertEqual([assignment.is_submitted for assignment in page], [False, True, False])
+            self.assertEqual(page[1].submission.student_id, self.student.id)
+            self.assertEqual(page[0].subject.code, 'SUB-1')
+        self.assertEqual(self.titles(page), ['Task 5', 'Task 4', 'Task 3'])
+
+        seen = self.titles(page)
+        while cursor:
+            page, cursor = student_assignments(self.student, cursor=cursor, limit=3)
+            seen += self.titles(page)
+        self.assertEqual(seen, [assignment.title for assignment in self.assignments])
+
+    def test_status_filters(self):
+        self.assertEqual(self.titles(student_assignments(self.student, 'submitted')[0]), ['Task 4', 'Task -2'])
+        self.assertEqual(self.titles(student_assignments(self.student, 'open')[0]),
+                         ['Task 5', 'Task 3', 'Task 2', 'Task 1'])
+        self.assertEqual(self.titles(student_assignments(self.student, 'overdue')[0]), ['Task -1', 'Task -3'])
+        # Another student's submission is not this student's
+        self.assertEqual(len(student_assignments(self.students[1], 'submitted')[0]), 1)
+
+    def test_cursors(self):
+        assignment = self.assignments[2]
+        self.assertEqual(decode_cursor(encode_cursor(assignment)), (assignment.due_date, assignment.id))
+        for cursor in ('', 'x', '1.2.3', None):
+            self.assertIsNone(decode_cursor(cursor))
+
+        # Rows sharing a due date are split by id
+        Assignment.objects.filter(pk__in=[a.pk for a in self.assignments[:4]]).update(
+            due_date=self.assignments[0].due_date)
+        page, cursor = student_assignments(self.student, limit=2)
+        page += student_assignments(self.student, cursor=cursor, limit=2)[0]
+        self.assertEqual([a.id for a in page], sorted((a.id for a in self.assignments[:4]), reverse=True))
+
+    def test_page(self):
+        self.client.login(username=self.student.user.username, password=PASSWORD)
+        response = self.client.get(reverse('assignments'), {'status': 'overdue'})
+        self.assertEqual(self.titles(response.context['assignments']), ['Task -1', 'Task -3'])
+        self.assertIsNone(response.context['next_cursor'])
+        # An unknown status lists everything
+        response = self.client.get(reverse('assignments'), {'status': 'nope', 'after': 'garbage'})
+        self.assertEqual(len(response.context['assignments']), 8)
+
+
+class SubmissionStatsTests(AssignmentTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.assignment = cls.assignments[5]
+        for student in cls.students[:3]:
+            # Created after the due date, so late
+            submit(cls.assignment, student, marks=5 if student is cls.students[0] else None)
+        submit(cls.assignments[0], cls.students[0])
+
+    def test_stats_in_one_query(self):
+        teacher_assignments_with_stats(self.teacher)
+        with self.assertNumQueries(1):
+            assignments = {a.id: a for a in teacher_assignments_with_stats(self.teacher)}
+        self.assertEqual(len(assignments), 8)
+        self.assertEqual(assignments[self.assignment.id].submission_stats,
+                         {'total': 5, 'submitted': 3, 'pending': 2, 'late': 3, 'graded': 1})
+        self.assertEqual(assignments[self.assignments[0].id].submission_stats,
+                         {'total': 5, 'submitted': 1, 'pending': 4, 'late': 0, 'graded': 0})
+
+    def test_student_counts_follow_student_changes(self):
+        self.assertEqual(semester_student_counts(), {5: 5})
+        with self.captureOnCommitCallbacks(execute=True):
+            make_students(count=2, semester=6, prefix='senior')
+        self.assertEqual(semester_student_counts(), {5: 5, 6: 2})
+
+    def test_pending_students(self):
+        self.assertEqual([student.campus_id for student in pending_students(self.assignment)],
+                         ['STUDENT3', 'STUDENT4'])
+
+    def test_submissions_page_and_api(self):
+        self.client.login(username=self.teacher.user.username, password=PASSWORD)
+        response = self.client.get(reverse('assignment_submissions', args=[self.assignment.id]))
+        self.assertEqual((response.context['total_students'], response.context['submitted_count']), (5, 3))
+        self.assertEqual(len(response.context['pending_students']), 2)
+
+        data = self.client.get(reverse('api_assignment_stats'), {'assignment': self.assignment.id}).json()
+        [row] = data['assignments']
+        self.assertEqual((row['subject'], row['submitted'], row['late']), ('SUB-1', 3, 3))
+        self.assertEqual(self.client.get(reverse('api_assignment_stats'), {'assignment': 0}).status_code, 404)
+
+        self.client.login(username=self.students[0].user.username, password=PASSWORD)
+        self.assertEqual(self.client.get(reverse('api_assignment_stats')).status_code, 403)
@@ -0,0 +1,75 @@
+from datetime import date
+from unittest import mock
+from django.db import connection
+from django.db.models import QuerySet
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from portal.attendance_engine import bulk_mark_attendance, verify_attendance_summaries
+from portal.models import Attendance, AttendanceSummary
+from .fixtures import PASSWORD, PortalTestCase
+
+DAY = date(2024, 3, 4)
+
+
+class BulkMarkAttendanceTests(PortalTestCase):
+    def summary(self, student):
+        return AttendanceSummary.objects.values_list('total', 'present').get(student=student, subject=self.subject)
+
+    def test_creates_then_updates_a_sheet(self):
+        marks = {student.id: True for student in self.students}
+        self.assertEqual(
+            bulk_mark_attendance(self.subject, DAY, 'Period 1', marks, self.teacher),
+            {'created': 5, 'updated': 0, 'unchanged': 0},
+        )
+
+        marks[self.students[0].id] = False
+        self.assertEqual(
+            bulk_mark_attendance(self.subject, DAY, 'Period 1', marks, self.teacher),
+            {'created': 0, 'updated': 1, 'unchanged': 4},
+        )
+        self.assertEqual(Attendance.objects.count(), 5)
+        self.assertEqual(self.summary(self.students[0]), (1, 0))
+        self.assertEqual(self.summary(self.students[1]), (1, 1))
+
+    def test_sheet_size_does_not_change_the_query_count(self):
+        small = {student.id: True for student in self.students[:2]}
+        with CaptureQueriesContext(connection) as small_queries:
+            bulk_mark_attendance(self.subject, DAY, 'Period 1', small, self.teacher)
+        full = {student.id: True for student in self.students}
+        with self.assertNumQueries(len(small_queries)):
+            bulk_mark_attendance(self.subject, DAY, 'Period 2', full, self.teacher)
+
+    def test_insert_race_is_retried_without_double_counting(self):
+        Attendance.objects.create(
+            student=self.students[0], subject=self.subject, date=DAY, period='Period 1', is_present=False
+        )
+        real_select_for_update = QuerySet.select_for_update
+        stale_reads = []
+
+        def select_for_update(queryset, *args, **kwargs):
+            locked = real_select_for_update(queryset, *args, **kwargs)
+            if queryset.model is Attendance and not stale_reads:
+                # The first read misses the row another submit just inserted
+                stale_reads.append(True)
+                return locked.none()
+            return locked
+
+        marks = {student.id: True for student in self.students}
+        with mock.patch.object(QuerySet, 'select_for_update', select_for_update):
+            result = bulk_mark_attendance(self.subject, DAY, 'Period 1', marks, self.teacher)
+
+        self.assertEqual(result, {'created': 4, 'updated': 1, 'unchanged': 0})
+        self.assertEqual(Attendance.objects.count(), 5)
+        self.assertEqual(verify_attendance_summaries(), [])
+
+    def test_teacher_marks_a_sheet_from_the_attendance_page(self):
+        self.client.login(username=self.teacher.user.username, password=PASSWORD)
+        response = self.client.post(reverse('attendance'), {
+            'date': DAY.isoformat(), 'subject': self.subject.id, 'period': 'Period 1',
+            **{f'student{student.id}': 'on' for student in self.students[:3]},
+        }, follow=True)
+        self.assertContains(response, '5 new, 0 updated, 0 unchanged')
+        self.assertEqual(
+            sorted(Attendance.objects.filter(is_present=True).values_list('student_id', flat=True)),
+            sorted(student.id for student in self.students[:3]),
+        )
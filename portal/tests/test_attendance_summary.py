@@ -0,0 +1,75 @@
+import io
+from datetime import date
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from portal.attendance_engine import (
+    parse_present, rebuild_attendance_summaries, verify_attendance_summaries
+)
+from portal.models import Attendance, AttendanceSummary
+from .fixtures import PortalTestCase
+
+DAY = date(2024, 3, 4)
+
+
+class AttendanceSummaryTests(PortalTestCase):
+    def summary(self, student, subject=None):
+        return AttendanceSummary.objects.values_list('total', 'present').get(
+            student=student, subject=subject or self.subject
+        )
+
+    def mark(self, student, is_present, period='Period 1', subject=None):
+        return Attendance.objects.create(student=student, subject=subject or self.subject, date=DAY,
+                                         period=period, is_present=is_present)
+
+    def test_single_row_writes_keep_the_summary_in_step(self):
+        student = self.students[0]
+        record = self.mark(student, True)
+        self.mark(student, False, period='Period 2')
+        self.assertEqual(self.summary(student), (2, 1))
+
+        record.is_present = False
+        record.save()
+        self.assertEqual(self.summary(student), (2, 0))
+
+        # Moving a row to another subject moves its count with it
+        record.subject = self.subjects[1]
+        record.is_present = True
+        record.save()
+        self.assertEqual(self.summary(student), (1, 0))
+        self.assertEqual(self.summary(student, self.subjects[1]), (1, 1))
+
+        record.delete()
+        self.assertEqual(self.summary(student, self.subjects[1]), (0, 0))
+        self.assertEqual(verify_attendance_summaries(), [])
+
+    def test_summary_percentage(self):
+        for period, is_present in (('Period 1', True), ('Period 2', True), ('Period 3', False)):
+            self.mark(self.students[0], is_present, period)
+        summary = AttendanceSummary.objects.get(student=self.students[0], subject=self.subject)
+        self.assertEqual(summary.percentage, 66.7)
+
+    def test_rebuild_repairs_drifted_rows(self):
+        self.mark(self.students[0], True)
+        self.mark(self.students[1], False)
+        AttendanceSummary.objects.filter(student=self.students[0]).update(total=9, present=9)
+        self.assertEqual(
+            verify_attendance_summaries(),
+            [(self.students[0].id, self.subject.id, (1, 1), (9, 9))],
+        )
+        with self.assertRaises(CommandError):
+            call_command('rebuild_attendance_summary', '--verify-only', stdout=io.StringIO(), stderr=io.StringIO())
+
+        self.assertEqual(rebuild_attendance_summaries(), 2)
+        self.assertEqual(verify_attendance_summaries(), [])
+        self.assertEqual(self.summary(self.students[0]), (1, 1))
+
+
+class ParsePresentTests(PortalTestCase):
+    def test_only_booleans_and_their_names_are_accepted(self):
+        self.assertIs(parse_present(True), True)
+        self.assertIs(parse_present(False), False)
+        self.assertIs(parse_present(' TRUE '), True)
+        self.assertIs(parse_present('false'), False)
+        for value in ('0', '1', '', 'yes', 1, 0, None, []):
+            with self.subTest(value=value):
+                self.assertIsNone(parse_present(value))
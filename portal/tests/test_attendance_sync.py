@@ -0,0 +1,73 @@
+import json
+from datetime import date
+from django.urls import reverse
+from portal.attendance_engine import MAX_SYNC_SHEETS, verify_attendance_summaries
+from portal.models import AcademicTerm, Attendance, AttendanceSyncKey
+from .fixtures import PASSWORD, PortalTestCase, make_students, make_subjects, make_teacher
+
+
+class AttendanceSyncTests(PortalTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.login(username=self.teacher.user.username, password=PASSWORD)
+
+    def sheet(self, key='sheet-1', **fields):
+        return {
+            'key': key, 'subject': self.subject.id, 'date': '2024-03-04', 'period': 'Period 1',
+            'marks': {str(student.id): True for student in self.students},
+            **fields,
+        }
+
+    def sync(self, *sheets):
+        return self.client.post(reverse('api_attendance_sync'), json.dumps({'sheets': list(sheets)}),
+                                content_type='application/json')
+
+    def test_a_retried_sheet_is_applied_once(self):
+        response = self.sync(self.sheet())
+        self.assertEqual(response.status_code, 200)
+        [result] = response.json()['results']
+        self.assertEqual((result['status'], result['created'], result['ignored']), ('applied', 5, 0))
+
+        # The client lost the response and sends the same key again
+        [result] = self.sync(self.sheet()).json()['results']
+        self.assertEqual((result['status'], result['created']), ('duplicate', 5))
+        self.assertEqual(Attendance.objects.count(), 5)
+        self.assertEqual(AttendanceSyncKey.objects.count(), 1)
+        self.assertEqual(verify_attendance_summaries(), [])
+
+    def test_a_new_key_for_changed_marks_updates_the_sheet(self):
+        self.sync(self.sheet())
+        [result] = self.sync(self.sheet('sheet-2', marks={str(self.students[0].id): 'false'})).json()['results']
+        self.assertEqual((result['status'], result['updated']), ('applied', 1))
+        self.assertIs(Attendance.objects.get(student=self.students[0]).is_present, False)
+
+    def test_each_sheet_gets_its_own_result(self):
+        other_subject = make_subjects(make_teacher('other', 'T-2'), count=1, prefix='OTHER')[0]
+        senior = make_students(count=1, semester=6, prefix='senior')[0]
+        AcademicTerm.objects.create(name='Closed', start_date=date(2023, 1, 1), end_date=date(2023, 6, 1),
+                                    is_closed=True)
+        results = self.sync(
+            self.sheet('ok', marks={str(self.students[0].id): True, str(senior.id): True}),
+            self.sheet('', period='Period 2'),
+            self.sheet('other', subject=other_subject.id),
+            self.sheet('bad-date', date='2024-02-30'),
+            self.sheet('bad-period', period='Period 9'),
+            self.sheet('closed', date='2023-03-01'),
+        ).json()['results']
+        self.assertEqual([result['status'] for result in results],
+                         ['applied', 'error', 'error', 'error', 'error', 'error'])
+        # Students outside the subject's semester are ignored, not marked
+        self.assertEqual(results[0]['ignored'], 1)
+        self.assertIn('closed', results[5]['error'])
+        self.assertEqual(Attendance.objects.count(), 1)
+
+    def test_malformed_requests(self):
+        self.assertEqual(self.sync(self.sheet(marks={str(self.students[0].id): '0'})).status_code, 400)
+        self.assertEqual(self.sync(*[self.sheet(f'k{i}') for i in range(MAX_SYNC_SHEETS + 1)]).status_code, 400)
+        self.assertEqual(self.client.post(reverse('api_attendance_sync'), 'nope',
+                                          content_type='application/json').status_code, 400)
+        self.assertEqual(self.client.get(reverse('api_attendance_sync')).status_code, 405)
+        self.assertFalse(Attendance.objects.exists())
+
+        self.client.login(username=self.students[0].user.username, password=PASSWORD)
+        self.assertEqual(self.sync(self.sheet()).status_code, 403)
@@ -0,0 +1,91 @@
+import io
+from datetime import date
+from django.core.management import call_command
+from django.urls import reverse
+from portal.attendance_engine import bulk_mark_attendance
+from portal.bitsets import (
+    absent_count, build_term_bitmaps, decode, encode, grid_for, longest_run, longest_streak,
+    percentage_between, present_count, recorded_count, session_grid, term_history
+)
+from portal.models import AcademicTerm, AttendanceBitmap, Student, TimeTable
+from .fixtures import PASSWORD, PortalTestCase
+
+
+class EncodingTests(PortalTestCase):
+    def test_round_trip(self):
+        flags = [True, False, False, True, True, True, False, False, True]
+        self.assertEqual(len(encode(flags)), 2)
+        self.assertEqual(decode(encode(flags), len(flags)), flags)
+        self.assertEqual(encode([]), b'')
+
+    def test_longest_run(self):
+        self.assertEqual(longest_run(0), 0)
+        self.assertEqual(longest_run(0b1011101110), 3)
+
+    def test_session_grid_follows_dates_then_periods(self):
+        grid = session_grid([('Wednesday', 'Period 3'), ('Monday', 'Period 2'), ('Monday', 'Period 1')],
+                            date(2024, 3, 4), date(2024, 3, 10))
+        self.assertEqual(grid, [
+            (date(2024, 3, 4), 'Period 1'), (date(2024, 3, 4), 'Period 2'), (date(2024, 3, 6), 'Period 3'),
+        ])
+
+
+class TermBitmapTests(PortalTestCase):
+    # Monday Period 1 and Wednesday Period 2 over two weeks: four sessions
+    MARKS = {
+        (date(2024, 3, 4), 'Period 1'): True,
+        (date(2024, 3, 6), 'Period 2'): True,
+        (date(2024, 3, 11), 'Period 1'): False,
+        (date(2024, 3, 13), 'Period 2'): True,
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        for day, period in (('Monday', 'Period 1'), ('Wednesday', 'Period 2')):
+            TimeTable.objects.create(batch='Batch 1', day=day, period=period, subject=cls.subject)
+        cls.term = AcademicTerm.objects.create(name='Spring', start_date=date(2024, 3, 4),
+                                               end_date=date(2024, 3, 15))
+        for (session_date, period), is_present in cls.MARKS.items():
+            bulk_mark_attendance(cls.subject, session_date, period,
+                                 {cls.students[0].id: is_present, cls.students[1].id: True}, cls.teacher)
+        # An extra class off the timetable grid
+        bulk_mark_attendance(cls.subject, date(2024, 3, 5), 'Period 3', {cls.students[0].id: True}, cls.teacher)
+
+    def test_bitmaps_hold_the_term(self):
+        self.assertEqual(build_term_bitmaps(self.term), (2, 1))
+        bitmap = AttendanceBitmap.objects.get(student=self.students[0], subject=self.subject)
+        self.assertEqual(bitmap.session_count, 4)
+        self.assertEqual(decode(bitmap.present, 4), list(self.MARKS.values()))
+        self.assertEqual((present_count(bitmap), recorded_count(bitmap), absent_count(bitmap)), (3, 4, 1))
+        self.assertEqual(longest_streak(bitmap), 2)
+
+        grid = grid_for('Batch 1', self.subject, self.term)
+        self.assertEqual(percentage_between(bitmap, grid, date(2024, 3, 11), date(2024, 3, 15)), 50.0)
+        self.assertEqual(percentage_between(bitmap, grid, date(2024, 3, 16), date(2024, 3, 20)), 0)
+
+    def test_rebuilding_replaces_the_rows(self):
+        build_term_bitmaps(self.term)
+        build_term_bitmaps(self.term)
+        self.assertEqual(AttendanceBitmap.objects.count(), 2)
+
+    def test_cohort_comes_from_the_term_rows(self):
+        # The class has since moved up a semester; its past term is still built
+        Student.objects.filter(pk__in=[student.pk for student in self.students]).update(semester=6)
+        self.assertEqual(build_term_bitmaps(self.term), (2, 1))
+        self.assertEqual(
+            set(AttendanceBitmap.objects.values_list('student_id', flat=True)),
+            {self.students[0].id, self.students[1].id},
+        )
+
+    def test_history_on_the_attendance_page(self):
+        call_command('build_attendance_bitmaps', stdout=io.StringIO())
+        with self.assertNumQueries(1):
+            history = term_history(self.students[0])
+            self.assertEqual(history[0]['term'].name, 'Spring')
+        self.assertEqual(history[0]['subjects'][0]['percentage'], 75.0)
+
+        self.client.login(username=self.students[0].user.username, password=PASSWORD)
+        response = self.client.get(reverse('attendance'))
+        self.assertContains(response, 'Past Terms')
+        self.assertContains(response, '3 / 4')
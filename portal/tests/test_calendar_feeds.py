@@ -0,0 +1,83 @@
+from datetime import timedelta
+from django.urls import reverse
+from django.utils import timezone
+from portal.calendar_feeds import PERIOD_TIMES, _fold, calendar_feed, feed_token, user_from_token
+from portal.models import AcademicTerm, TimeTable
+from .fixtures import PortalTestCase, make_teacher
+
+
+class CalendarFeedTests(PortalTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        TimeTable.objects.create(batch='Batch 1', day='Monday', period='Period 1', subject=cls.subject, room='LH 1')
+        TimeTable.objects.create(batch='Batch 2', day='Friday', period='Period 5', subject=cls.subjects[1],
+                                 room='Lab, 2nd Floor')
+        TimeTable.objects.create(batch='Batch 1', day='Monday', period='Break')
+
+    def feed(self, name, arg, user):
+        return self.client.get(reverse(name, args=[arg]), {'token': feed_token(user)})
+
+    def test_period_times_are_afternoon_after_noon(self):
+        self.assertEqual(str(PERIOD_TIMES['Period 1'][0]), '08:30:00')
+        self.assertEqual(str(PERIOD_TIMES['Period 5'][1]), '13:30:00')
+
+    def test_tokens(self):
+        token = feed_token(self.students[0].user)
+        self.assertEqual(user_from_token(token), self.students[0].user)
+        self.assertIsNone(user_from_token(token + 'x'))
+        self.assertIsNone(user_from_token(''))
+
+    def test_batch_feed(self):
+        response = self.feed('batch_calendar_feed', 'Batch 1', self.students[0].user)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/calendar; charset=utf-8')
+        body = response.content.decode()
+        self.assertTrue(body.startswith('BEGIN:VCALENDAR\r\n'))
+        self.assertEqual(body.count('BEGIN:VEVENT'), 1)
+        self.assertIn('SUMMARY:Subject 0 (SUB-0)', body)
+        # No open term: weekly from this week's Monday, 8:30 in Kolkata, without an end
+        monday = timezone.localdate() - timedelta(days=timezone.localdate().weekday())
+        self.assertIn(f'DTSTART:{monday:%Y%m%d}T030000Z', body)
+        self.assertIn('RRULE:FREQ=WEEKLY\r\n', body)
+
+        # Conditional requests get a 304 from the cached feed's ETag
+        again = self.client.get(reverse('batch_calendar_feed', args=['Batch 1']),
+                                {'token': feed_token(self.students[0].user)}, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(again.status_code, 304)
+
+    def test_teacher_feed_spans_batches_and_ends_with_the_term(self):
+        today = timezone.localdate()
+        AcademicTerm.objects.create(name='Current', start_date=today - timedelta(days=10),
+                                    end_date=today + timedelta(days=60))
+        body = self.feed('teacher_calendar_feed', self.teacher.id, self.teacher.user).content.decode()
+        self.assertEqual(body.count('BEGIN:VEVENT'), 2)
+        self.assertIn(f'UNTIL={today + timedelta(days=60):%Y%m%d}', body)
+        self.assertIn('LOCATION:Lab\\, 2nd Floor', body)
+
+    def test_access(self):
+        self.assertEqual(self.client.get(reverse('batch_calendar_feed', args=['Batch 1'])).status_code, 403)
+        self.assertEqual(self.client.get(reverse('batch_calendar_feed', args=['Batch 1']),
+                                         {'token': 'forged'}).status_code, 403)
+        # Students only get their own batch's feed
+        self.assertEqual(self.feed('batch_calendar_feed', 'Batch 2', self.students[0].user).status_code, 403)
+        self.assertEqual(self.feed('teacher_calendar_feed', self.teacher.id, self.students[0].user).status_code, 403)
+        other = make_teacher('other', 'T-2')
+        self.assertEqual(self.feed('batch_calendar_feed', 'Batch 2', other.user).status_code, 200)
+
+    def test_feeds_are_cached_per_timetable_version(self):
+        first = calendar_feed('batch', 'Batch 1')
+        with self.assertNumQueries(0):
+            self.assertEqual(calendar_feed('batch', 'Batch 1'), first)
+        with self.captureOnCommitCallbacks(execute=True):
+            TimeTable.objects.create(batch='Batch 1', day='Tuesday', period='Period 2', subject=self.subject)
+        body, etag = calendar_feed('batch', 'Batch 1')
+        self.assertNotEqual(etag, first[1])
+        self.assertEqual(body.count('BEGIN:VEVENT'), 2)
+
+    def test_long_lines_are_folded(self):
+        line = 'DESCRIPTION:' + 'é' * 60
+        folded = _fold(line)
+        self.assertTrue(all(len(part.encode()) <= 75 for part in folded.split('\r\n')))
+        self.assertEqual(folded.replace('\r\n ', ''), line)
+        self.assertEqual(_fold('SHORT'), 'SHORT')
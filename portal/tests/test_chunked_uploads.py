@@ -0,0 +1,163 @@
+import hashlib
+import io
+import json
+import os
+import time
+from datetime import timedelta
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+from portal import chunked_uploads
+from portal.chunked_uploads import (
+    MAX_OPEN_UPLOADS, append_chunk, cancel_upload, finalize_upload, part_path, purge_stale_uploads,
+    start_upload
+)
+from portal.models import Assignment, AssignmentSubmission, Material, UploadSession
+from .fixtures import PASSWORD, PortalTestCase
+
+CONTENT = b'chunked answer ' * 1000
+
+
+class ChunkedUploadTests(PortalTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.student = cls.students[0]
+        cls.assignment = Assignment.objects.create(title='Essay', description='-', subject=cls.subject,
+                                                   teacher=cls.teacher, due_date=timezone.now() + timedelta(days=1))
+
+    def setUp(self):
+        super().setUp()
+        chunked_uploads._hashers.clear()
+
+    def upload(self, user, content=CONTENT, chunk=4096, **kwargs):
+        session = start_upload(user, kwargs.pop('target', 'submission'), 'answer.txt', len(content), **kwargs)
+        for offset in range(0, len(content), chunk):
+            session = append_chunk(user, session.upload_id, offset, io.BytesIO(content[offset:offset + chunk]))
+        return session
+
+    def test_chunks_assemble_into_a_submission(self):
+        session = self.upload(self.student.user, sha256=hashlib.sha256(CONTENT).hexdigest())
+        self.assertEqual(session.received, len(CONTENT))
+        submission = finalize_upload(self.student.user, session.upload_id, {'assignment_id': self.assignment.id})
+        self.assertEqual(submission.answer_file.read(), CONTENT)
+        self.assertFalse(UploadSession.objects.exists())
+        self.assertFalse(os.path.exists(part_path(session)))
+
+    def test_digest_is_rebuilt_on_another_worker(self):
+        session = self.upload(self.student.user, sha256=hashlib.sha256(CONTENT).hexdigest())
+        # As if the last chunk had landed on a process without the running hasher
+        chunked_uploads._hashers.clear()
+        finalize_upload(self.student.user, session.upload_id, {'assignment_id': self.assignment.id})
+        self.assertEqual(AssignmentSubmission.objects.get().answer_file.read(), CONTENT)
+
+    def test_offsets_must_follow_on(self):
+        session = start_upload(self.student.user, 'submission', 'answer.txt', 10)
+        append_chunk(self.student.user, session.upload_id, 0, io.BytesIO(b'12345'))
+        with self.assertRaises(ValidationError) as raised:
+            append_chunk(self.student.user, session.upload_id, 3, io.BytesIO(b'45678'))
+        self.assertEqual((raised.exception.code, raised.exception.params), ('offset', {'received': 5}))
+        with self.assertRaisesMessage(ValidationError, 'too large'):
+            append_chunk(self.student.user, session.upload_id, 5, io.BytesIO(b'678901'))
+        with self.assertRaises(ValidationError) as raised:
+            finalize_upload(self.student.user, session.upload_id, {'assignment_id': self.assignment.id})
+        self.assertEqual(raised.exception.code, 'incomplete')
+        # Nothing a failed request sent is left in the part file
+        with open(part_path(session), 'rb') as part:
+            self.assertEqual(part.read(), b'12345')
+        self.assertFalse([name for name in os.listdir(os.path.dirname(part_path(session))) if name.endswith('.chunk')])
+
+    def test_failed_checks_leave_the_session(self):
+        session = self.upload(self.student.user, sha256='0' * 64)
+        with self.assertRaises(ValidationError) as raised:
+            finalize_upload(self.student.user, session.upload_id, {'assignment_id': self.assignment.id})
+        self.assertEqual(raised.exception.code, 'checksum')
+
+        session = self.upload(self.student.user)
+        with self.assertRaisesMessage(ValidationError, 'Unknown assignment'):
+            finalize_upload(self.student.user, session.upload_id, {'assignment_id': 'x'})
+        finalize_upload(self.student.user, session.upload_id, {'assignment_id': self.assignment.id})
+        self.assertEqual(UploadSession.objects.count(), 1)
+
+    def test_start_validation(self):
+        user = self.student.user
+        for args, message in (
+            (('exam', 'a.txt', 10), 'Unknown upload target'),
+            (('material', 'a.txt', 10), 'Only teachers'),
+            (('submission', '', 10), 'file name'),
+            (('submission', 'a.txt', 0), 'positive number'),
+            (('submission', 'a.txt', True), 'positive number'),
+            (('submission', 'a.txt', 101 * 1024 * 1024), 'at most 100 MB'),
+            (('submission', 'a.txt', 10, 'xyz'), 'sha256'),
+        ):
+            with self.subTest(message=message), self.assertRaisesMessage(ValidationError, message):
+                start_upload(user, *args)
+        self.assertEqual(start_upload(user, 'submission', '../../etc/pass wd', 10).filename, 'pass_wd')
+
+        for _ in range(MAX_OPEN_UPLOADS - 1):
+            start_upload(user, 'submission', 'a.txt', 10)
+        with self.assertRaisesMessage(ValidationError, 'Finish or cancel'):
+            start_upload(user, 'submission', 'a.txt', 10)
+
+    def test_material_and_cancel(self):
+        session = self.upload(self.teacher.user, target='material')
+        material = finalize_upload(self.teacher.user, session.upload_id, {
+            'title': 'Notes', 'subject': self.subject.id, 'description': '-', 'material_type': 'notes',
+        })
+        self.assertEqual((material.teacher, material.file.read()), (self.teacher, CONTENT))
+
+        session = start_upload(self.teacher.user, 'material', 'slides.pdf', 10)
+        with self.assertRaises(UploadSession.DoesNotExist):
+            cancel_upload(self.student.user, session.upload_id)
+        cancel_upload(self.teacher.user, session.upload_id)
+        self.assertFalse(os.path.exists(part_path(session)))
+        self.assertEqual(Material.objects.count(), 1)
+
+    def test_purge(self):
+        stale = start_upload(self.student.user, 'submission', 'old.txt', 10)
+        fresh = start_upload(self.student.user, 'submission', 'new.txt', 10)
+        UploadSession.objects.filter(pk=stale.pk).update(updated_at=timezone.now() - timedelta(days=2))
+        orphan = os.path.join(os.path.dirname(part_path(fresh)), 'gone.part')
+        open(orphan, 'wb').close()
+        old = time.time() - 3 * 24 * 60 * 60
+        os.utime(orphan, (old, old))
+
+        self.assertEqual(purge_stale_uploads(), (1, 1))
+        self.assertEqual(list(UploadSession.objects.all()), [fresh])
+        self.assertTrue(os.path.exists(part_path(fresh)))
+        self.assertFalse(os.path.exists(part_path(stale)))
+
+        out = io.StringIO()
+        call_command('purge_stale_uploads', hours=0, stdout=out)
+        self.assertIn('Removed 1 stale uploads', out.getvalue())
+
+    def test_api(self):
+        self.client.login(username=self.student.user.username, password=PASSWORD)
+        response = self.client.post(reverse('api_upload_start'), json.dumps({
+            'target': 'submission', 'filename': 'answer.txt', 'size': len(CONTENT),
+        }), content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        upload_id = response.json()['upload_id']
+
+        chunk_url = reverse('api_upload_chunk', args=[upload_id])
+        response = self.client.post(chunk_url, CONTENT[:100], content_type='application/octet-stream',
+                                    HTTP_UPLOAD_OFFSET='0')
+        self.assertEqual(response.json()['received'], 100)
+        response = self.client.post(chunk_url, CONTENT[100:], content_type='application/octet-stream',
+                                    HTTP_UPLOAD_OFFSET='0')
+        self.assertEqual((response.status_code, response.json()['received']), (409, 100))
+        self.assertEqual(self.client.post(chunk_url, b'', content_type='application/octet-stream').status_code, 400)
+        self.client.post(chunk_url, CONTENT[100:], content_type='application/octet-stream', HTTP_UPLOAD_OFFSET='100')
+        self.assertEqual(self.client.get(reverse('api_upload_detail', args=[upload_id])).json()['received'],
+                         len(CONTENT))
+
+        response = self.client.post(reverse('api_upload_finalize', args=[upload_id]),
+                                    json.dumps({'assignment_id': self.assignment.id}),
+                                    content_type='application/json')
+        self.assertEqual(response.json()['submission'], AssignmentSubmission.objects.get().id)
+        self.assertEqual(self.client.get(reverse('api_upload_detail', args=[upload_id])).status_code, 404)
+
+        # Other users' uploads are invisible
+        session = start_upload(self.students[1].user, 'submission', 'a.txt', 10)
+        self.assertEqual(self.client.delete(reverse('api_upload_detail', args=[session.upload_id])).status_code, 404)
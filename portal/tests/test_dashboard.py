@@ -0,0 +1,54 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from portal.dashboard_cache import DASHBOARD_QUERY_BUDGET
+from portal.query_plans import seed_dashboard
+
+# Size of the large dataset relative to the small one
+LARGE_SCALE = 5
+
+
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class DashboardQueryBudgetTests(TestCase):
+    """Each dashboard runs a fixed number of queries, cold and warm, whatever the data volume"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = {
+            'small': dict(zip(('student', 'teacher'), seed_dashboard(1, prefix='small'))),
+            'large': dict(zip(('student', 'teacher'), seed_dashboard(LARGE_SCALE, prefix='large'))),
+        }
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def assert_budget(self, role):
+        for size, users in self.users.items():
+            self.client.force_login(users[role])
+            for state, budget in DASHBOARD_QUERY_BUDGET[role].items():
+                with self.subTest(size=size, state=state):
+                    with CaptureQueriesContext(connection) as queries:
+                        response = self.client.get(reverse('dashboard'))
+                    self.assertEqual(response.status_code, 200)
+                    sql = '\n'.join(query['sql'] for query in queries.captured_queries)
+                    self.assertEqual(len(queries), budget, f'{role} {state} on the {size} dataset:\n{sql}')
+
+    def test_student_dashboard(self):
+        self.assert_budget('student')
+
+    def test_teacher_dashboard(self):
+        self.assert_budget('teacher')
+
+    def test_snapshot_shows_the_seeded_rows(self):
+        self.client.force_login(self.users['large']['teacher'])
+        response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.context['subjects_count'], 2 * LARGE_SCALE)
+        self.assertEqual(response.context['pending_doubts'], 4 * LARGE_SCALE)
+
+        self.client.force_login(self.users['large']['student'])
+        response = self.client.get(reverse('dashboard'))
+        # Half its own seed's assignments, and all of the small seed's in the same semester
+        self.assertEqual(response.context['pending_assignments_count'], 3 * LARGE_SCALE + 6)
@@ -0,0 +1,109 @@
+from datetime import date, timedelta
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.utils import timezone
+from portal import cache_versions
+from portal.attendance_engine import bulk_mark_attendance
+from portal.dashboard_cache import dashboard_cache_stats, dashboard_snapshot
+from portal.models import Assignment, Doubt, Material
+from .fixtures import PortalTestCase, make_students, make_subjects, make_teacher
+
+
+class CacheVersionTests(PortalTestCase):
+    def test_tokens_change_only_on_commit(self):
+        first = cache_versions.versions('test', ['a', 'b'])
+        self.assertEqual(cache_versions.versions('test', ['a', 'b']), first)
+        with self.captureOnCommitCallbacks() as callbacks:
+            cache_versions.bump('test', 'a', None)
+            self.assertEqual(cache_versions.versions('test', ['a', 'b']), first)
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(cache_versions.versions('test', ['a', 'b']), first)
+        self.assertEqual(cache_versions.versions('test', ['b']), first.split('.')[1])
+
+    def test_evicted_keys_get_a_fresh_token(self):
+        first = cache_versions.versions('test', ['batch:Batch 1'])
+        cache.delete(cache_versions.version_key('test', 'batch:Batch 1'))
+        self.assertNotEqual(cache_versions.versions('test', ['batch:Batch 1']), first)
+        # Keys stay memcached-safe
+        self.assertNotIn(' ', cache_versions.version_key('test', 'batch:Batch 1'))
+
+
+class DashboardInvalidationTests(PortalTestCase):
+    def setUp(self):
+        super().setUp()
+        self.student = self.students[0]
+
+    def snapshot(self, user):
+        before = dashboard_cache_stats()['misses']
+        snapshot = dashboard_snapshot(user)
+        return snapshot, dashboard_cache_stats()['misses'] > before
+
+    def assert_rebuilt(self, user, rebuilt=True):
+        self.assertEqual(self.snapshot(user)[1], rebuilt)
+
+    def test_snapshots_are_reused_until_a_write_retires_them(self):
+        self.assert_rebuilt(self.student.user)
+        self.assert_rebuilt(self.student.user, False)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            bulk_mark_attendance(self.subject, date(2024, 3, 4), 'Period 1', {self.student.id: True}, self.teacher)
+        snapshot, rebuilt = self.snapshot(self.student.user)
+        self.assertTrue(rebuilt)
+        self.assertEqual(snapshot['attendance_percentage'], 100.0)
+        # Only the marked students' dashboards were retired
+        self.assert_rebuilt(self.students[1].user)
+        self.assert_rebuilt(self.students[1].user, False)
+
+    def test_semester_and_teacher_scopes(self):
+        for user in (self.student.user, self.teacher.user):
+            self.assert_rebuilt(user)
+        senior = make_students(count=1, semester=6, prefix='senior')[0]
+        self.assert_rebuilt(senior.user)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Assignment.objects.create(title='Essay', description='-', subject=self.subject, teacher=self.teacher,
+                                      due_date=timezone.now() + timedelta(days=3))
+        snapshot, rebuilt = self.snapshot(self.student.user)
+        self.assertTrue(rebuilt)
+        self.assertEqual([assignment.title for assignment in snapshot['pending_assignments']], ['Essay'])
+        self.assert_rebuilt(self.teacher.user)
+        self.assert_rebuilt(senior.user, False)
+
+    def test_moving_a_material_retires_both_semesters(self):
+        senior = make_students(count=1, semester=6, prefix='senior')[0]
+        senior_subject = make_subjects(self.teacher, count=1, semester=6, prefix='SENIOR')[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            material = Material.objects.create(subject=self.subject, teacher=self.teacher, title='Notes',
+                                               description='-', file=SimpleUploadedFile('notes.pdf', b'notes'))
+        self.assertEqual(len(self.snapshot(self.student.user)[0]['recent_materials']), 1)
+        self.assert_rebuilt(senior.user)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            material.subject = senior_subject
+            material.save()
+        self.assertEqual(self.snapshot(self.student.user)[0]['recent_materials'], [])
+        self.assertEqual(len(self.snapshot(senior.user)[0]['recent_materials']), 1)
+
+    def test_reassigning_a_subject_retires_both_teachers(self):
+        other = make_teacher('other', 'T-2')
+        Doubt.objects.create(student=self.student, subject=self.subject, title='Why?', question='-')
+        self.assertEqual(self.snapshot(self.teacher.user)[0]['pending_doubts'], 1)
+        self.assertEqual(self.snapshot(other.user)[0]['pending_doubts'], 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.subject.teacher = other
+            self.subject.save()
+        snapshot = self.snapshot(self.teacher.user)[0]
+        self.assertEqual((snapshot['subjects_count'], snapshot['pending_doubts']), (1, 0))
+        snapshot = self.snapshot(other.user)[0]
+        self.assertEqual((snapshot['subjects_count'], snapshot['pending_doubts']), (1, 1))
+
+    def test_evicted_version_does_not_serve_a_stale_snapshot(self):
+        self.assert_rebuilt(self.student.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            bulk_mark_attendance(self.subject, date(2024, 3, 4), 'Period 1', {self.student.id: False}, self.teacher)
+        cache.delete(cache_versions.version_key('dashboard', f'student:{self.student.id}'))
+        snapshot, rebuilt = self.snapshot(self.student.user)
+        self.assertTrue(rebuilt)
+        self.assertEqual(snapshot['attendance_percentage'], 0)
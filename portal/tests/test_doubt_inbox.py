@@ -0,0 +1,82 @@
+from datetime import timedelta
+from django.contrib.admin.helpers import ACTION_CHECKBOX_NAME
+from django.contrib.auth.models import User
+from django.urls import reverse
+from django.utils import timezone
+from portal.doubt_inbox import INBOX_ORDER, decode_cursor, encode_cursor, inbox_page, unresolved_count
+from portal.models import Doubt, DoubtCounter, DoubtReply
+from .fixtures import PASSWORD, PortalTestCase, make_teacher, make_subjects
+
+
+class InboxPaginationTests(PortalTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        start = timezone.now() - timedelta(days=1)
+        for i in range(25):
+            doubt = Doubt.objects.create(
+                student=cls.students[i % len(cls.students)], subject=cls.subjects[i % 2],
+                title=f'Doubt {i}', question='-', is_resolved=i % 4 == 0,
+            )
+            # Pairs of doubts share a timestamp, so the id breaks ties
+            Doubt.objects.filter(pk=doubt.pk).update(asked_at=start + timedelta(minutes=i // 2))
+        other_subject = make_subjects(make_teacher('other', 'T-2'), count=1, prefix='OTHER')[0]
+        Doubt.objects.create(student=cls.students[0], subject=other_subject, title='Elsewhere', question='-')
+
+    def walk(self, size):
+        pages = []
+        cursor = None
+        while True:
+            page = inbox_page(self.teacher, cursor, size=size)
+            pages.append(page['doubts'])
+            cursor = page['next_cursor']
+            if cursor is None:
+                return pages
+
+    def test_pages_follow_the_inbox_order_without_gaps_or_repeats(self):
+        expected = list(Doubt.objects.filter(subject__teacher=self.teacher).order_by(*INBOX_ORDER))
+        pages = self.walk(size=4)
+        self.assertEqual(len(pages), 7)
+        self.assertEqual([doubt for page in pages for doubt in page], expected)
+        self.assertFalse(any(doubt.is_resolved for doubt in pages[0]))
+
+    def test_a_full_last_page_has_no_next_cursor(self):
+        pages = self.walk(size=5)
+        self.assertEqual([len(page) for page in pages], [5] * 5)
+
+    def test_page_queries_do_not_grow_with_depth(self):
+        ordered = list(Doubt.objects.filter(subject__teacher=self.teacher).order_by(*INBOX_ORDER))
+        # bulk_create leaves the doubt unresolved, so the order stays put
+        DoubtReply.objects.bulk_create([DoubtReply(doubt=ordered[10], teacher=self.teacher, reply='See chapter 2')])
+        cursor = encode_cursor(ordered[7])
+        with self.assertNumQueries(2):
+            page = inbox_page(self.teacher, cursor, size=4)
+            replies = [reply.reply for doubt in page['doubts'] for reply in doubt.replies.all()]
+        self.assertEqual(replies, ['See chapter 2'])
+
+    def test_cursor_round_trip_and_malformed_cursors(self):
+        doubt = Doubt.objects.first()
+        self.assertEqual(decode_cursor(encode_cursor(doubt)), (doubt.is_resolved, doubt.asked_at, doubt.id))
+        for cursor in ('', 'junk', '1.2', '1.x.3', '1.99999999999999999999.3'):
+            with self.subTest(cursor=cursor):
+                self.assertIsNone(decode_cursor(cursor))
+        self.assertTrue(inbox_page(self.teacher, 'junk')['is_first_page'])
+
+    def test_replying_resolves_and_updates_the_counter(self):
+        self.assertEqual(unresolved_count(self.teacher), 18)
+        doubt = Doubt.objects.filter(subject__teacher=self.teacher, is_resolved=False).first()
+        DoubtReply.objects.create(doubt=doubt, teacher=self.teacher, reply='Answered')
+        doubt.refresh_from_db()
+        self.assertTrue(doubt.is_resolved)
+        self.assertEqual(unresolved_count(self.teacher), 17)
+
+    def test_admin_recount_repairs_drifted_counters(self):
+        DoubtCounter.objects.filter(teacher=self.teacher).update(unresolved=0)
+        User.objects.create_superuser('admin', password=PASSWORD)
+        self.client.login(username='admin', password=PASSWORD)
+        counter = DoubtCounter.objects.get(teacher=self.teacher)
+        response = self.client.post(reverse('admin:portal_doubtcounter_changelist'), {
+            'action': 'recount', ACTION_CHECKBOX_NAME: [counter.pk],
+        }, follow=True)
+        self.assertContains(response, '1 counters recounted.')
+        self.assertEqual(unresolved_count(self.teacher), 18)
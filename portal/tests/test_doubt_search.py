@@ -0,0 +1,85 @@
+from django.core.cache import cache
+from django.urls import reverse
+from portal import doubt_search
+from portal.cache_versions import version_key
+from portal.doubt_search import search_doubts, similar_doubts, tokenize
+from portal.models import Doubt, DoubtReply
+from .fixtures import PASSWORD, PortalTestCase, make_students, make_subjects, make_teacher
+
+
+class DoubtSearchTests(PortalTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        student = cls.students[0]
+        cls.recursion = Doubt.objects.create(student=student, subject=cls.subject, title='Recursion depth',
+                                             question='Why does my recursive function overflow the stack?')
+        cls.pointers = Doubt.objects.create(student=student, subject=cls.subject, title='Pointers',
+                                            question='How do pointers to pointers work?')
+        cls.answered = Doubt.objects.create(student=student, subject=cls.subjects[1], title='Lab 3',
+                                            question='The program crashes on large inputs.')
+        DoubtReply.objects.create(doubt=cls.answered, teacher=cls.teacher,
+                                  reply='Your recursion has no base case, so the stack overflows.')
+        other_subject = make_subjects(make_teacher('other', 'T-2'), count=1, semester=6, prefix='OTHER')[0]
+        senior = make_students(count=1, semester=6, prefix='senior')[0]
+        cls.senior_doubt = Doubt.objects.create(student=senior, subject=other_subject, title='Recursion again',
+                                                question='Tail recursion and the stack')
+
+    def test_tokenize_drops_stopwords(self):
+        self.assertEqual(tokenize('Why does the STACK overflow, a lot?'), ['stack', 'overflow', 'lot'])
+
+    def test_ranking_uses_titles_questions_and_replies(self):
+        scope = Doubt.objects.filter(subject__teacher=self.teacher)
+        results = search_doubts('recursion stack', scope)
+        # The title match outranks the reply match; the other teacher's doubt is out of scope
+        self.assertEqual(list(results.object_list), [self.recursion, self.answered])
+        self.assertEqual(list(search_doubts('', scope).object_list), [])
+        self.assertEqual(list(search_doubts('the and', scope).object_list), [])
+
+    def test_pages_load_in_a_fixed_number_of_queries(self):
+        scope = Doubt.objects.filter(subject__teacher=self.teacher)
+        search_doubts('recursion', scope)
+        # The id scope, then the page's doubts and their replies
+        with self.assertNumQueries(3):
+            results = search_doubts('recursion stack pointers', scope, per_page=2)
+            self.assertEqual(results.paginator.count, 3)
+            self.assertEqual(len(results.object_list), 2)
+            for doubt in results.object_list:
+                self.assertLessEqual(len(doubt.replies.all()), 1)
+                self.assertTrue(doubt.subject.name)
+
+    def test_index_follows_changes(self):
+        scope = Doubt.objects.all()
+        self.assertEqual(similar_doubts('linked lists', scope), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            doubt = Doubt.objects.create(student=self.students[1], subject=self.subject, title='Linked lists',
+                                         question='Reversing a list')
+        self.assertEqual(similar_doubts('linked lists', scope), [doubt])
+        with self.captureOnCommitCallbacks(execute=True):
+            doubt.delete()
+        self.assertEqual(similar_doubts('linked lists', scope), [])
+
+    def test_evicted_version_rebuilds_the_index(self):
+        scope = Doubt.objects.all()
+        similar_doubts('pointers', scope)
+        # A change committed while the version key was evicted must still show
+        Doubt.objects.filter(pk=self.pointers.pk).update(title='References')
+        cache.delete(version_key('doubt_search', 'index'))
+        self.assertEqual(similar_doubts('references', scope), [self.pointers])
+        self.assertIs(doubt_search.inverted_index(), doubt_search.inverted_index())
+
+    def test_views(self):
+        self.client.login(username=self.teacher.user.username, password=PASSWORD)
+        response = self.client.get(reverse('doubt_clearance'), {'query': 'pointers'})
+        self.assertEqual(list(response.context['doubts']), [self.pointers])
+
+        self.client.login(username=self.students[1].user.username, password=PASSWORD)
+        data = self.client.get(reverse('similar_doubts_api'), {'q': 'stack overflow recursion'}).json()
+        self.assertEqual([s['id'] for s in data['suggestions']], [self.recursion.id, self.answered.id])
+        self.assertEqual(data['suggestions'][1]['reply'][:14], 'Your recursion')
+        data = self.client.get(reverse('similar_doubts_api'),
+                               {'q': 'recursion', 'subject': self.subjects[1].id}).json()
+        self.assertEqual([s['id'] for s in data['suggestions']], [self.answered.id])
+
+        self.client.login(username=self.teacher.user.username, password=PASSWORD)
+        self.assertEqual(self.client.get(reverse('similar_doubts_api'), {'q': 'x'}).status_code, 403)
@@ -0,0 +1,90 @@
+import io
+from datetime import date
+from django.core.exceptions import ValidationError
+from django.core.management import CommandError, call_command
+from portal.exam_scheduler import (
+    allocate_rooms, color_papers, conflict_graph, exam_slots, paper_groups, save_exam_schedule,
+    schedule_exams, student_exam_schedule
+)
+from portal.models import ExamSchedule, Subject
+from .fixtures import PortalTestCase, make_students, make_subjects
+
+# A Saturday, so the second exam day is the Monday after
+START = date(2024, 3, 9)
+ROOMS = [('A', 6), ('B', 6)]
+
+
+class ExamSchedulerTests(PortalTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        make_students(count=3, batch='Batch 2', prefix='second')
+        cls.seniors = make_subjects(cls.teacher, count=2, semester=6, prefix='SENIOR')
+        make_students(count=4, semester=6, prefix='senior')
+
+    def test_conflict_graph_counts_groups_not_students(self):
+        groups = paper_groups(Subject.objects.all())
+        self.assertEqual({group: size for group, (size, _) in groups.items()},
+                         {(5, 'Batch 1'): 5, (5, 'Batch 2'): 3, (6, 'Batch 1'): 4})
+        adjacency, candidates = conflict_graph(groups)
+        self.assertEqual(adjacency[self.subject.id], {self.subjects[1].id})
+        self.assertEqual(candidates[self.subject.id], 8)
+        self.assertEqual(candidates[self.seniors[0].id], 4)
+
+    def test_colouring_respects_conflicts_and_capacity(self):
+        adjacency = {1: {2}, 2: {1}, 3: set()}
+        candidates = {1: 5, 2: 5, 3: 5}
+        colors = color_papers(adjacency, candidates, capacity=10)
+        self.assertNotEqual(colors[1], colors[2])
+        self.assertEqual(len(set(colors.values())), 2)
+        # Too small to put any two papers together
+        self.assertEqual(len(set(color_papers(adjacency, candidates, capacity=5).values())), 3)
+
+    def test_slots_skip_sundays(self):
+        self.assertEqual(exam_slots(START, 3), [(START, 'FN'), (START, 'AN'), (date(2024, 3, 11), 'FN')])
+        self.assertEqual(exam_slots(START, 2, sessions_per_day=1), [(START, 'FN'), (date(2024, 3, 11), 'FN')])
+
+    def test_rooms_fill_in_order_and_spill_over(self):
+        self.assertEqual(allocate_rooms([1, 2], {1: 8, 2: 4}, ROOMS), {1: ['A', 'B'], 2: ['B']})
+
+    def test_schedule(self):
+        rows = schedule_exams('semester', START, ROOMS)
+        self.assertEqual(len(rows), 4)
+        slots = {row.subject_id: (row.date, row.session) for row in rows}
+        # Papers of one semester never share a slot; one of each fits the 12 seats
+        self.assertNotEqual(slots[self.subjects[0].id], slots[self.subjects[1].id])
+        self.assertNotEqual(slots[self.seniors[0].id], slots[self.seniors[1].id])
+        self.assertEqual(set(slots.values()), {(START, 'FN'), (START, 'AN')})
+        rooms = {row.subject_id: row.rooms for row in rows}
+        self.assertEqual((rooms[self.subject.id], rooms[self.seniors[0].id]), ('A, B', 'B'))
+
+        rows = schedule_exams('semester', START, ROOMS, semesters=[6], sessions_per_day=1)
+        self.assertEqual([(row.date, row.candidates) for row in rows], [(START, 4), (date(2024, 3, 11), 4)])
+
+    def test_a_paper_larger_than_the_rooms_is_rejected(self):
+        with self.assertRaisesMessage(ValidationError, 'The rooms seat 6 candidates'):
+            schedule_exams('semester', START, [('A', 6)], semesters=[5])
+
+    def test_saving_replaces_the_planned_subjects(self):
+        save_exam_schedule('semester', schedule_exams('semester', START, ROOMS))
+        save_exam_schedule('semester', schedule_exams('semester', START, ROOMS, semesters=[5], sessions_per_day=1))
+        self.assertEqual(ExamSchedule.objects.count(), 4)
+        papers = list(student_exam_schedule(self.students[0], 'semester'))
+        self.assertEqual(sorted(paper.subject.code for paper in papers), ['SUB-0', 'SUB-1'])
+        # The second plan gave semester 5 one paper a day
+        self.assertEqual([paper.date for paper in papers], [START, date(2024, 3, 11)])
+        self.assertFalse(student_exam_schedule(self.students[0], 'internal_1').exists())
+
+    def test_command(self):
+        out = io.StringIO()
+        args = ['--exam-type=semester', '--start=2024-03-09']
+        call_command('schedule_exams', *args, '--room=A:6', '--room=B:6', '--dry-run', stdout=out)
+        self.assertIn('Planned 4 papers into 2 slots', out.getvalue())
+        self.assertFalse(ExamSchedule.objects.exists())
+        call_command('schedule_exams', *args, '--room=A:6', '--room=B:6', stdout=out)
+        self.assertEqual(ExamSchedule.objects.count(), 4)
+
+        with self.assertRaisesMessage(CommandError, 'NAME:SEATS'):
+            call_command('schedule_exams', *args, '--room=A', stdout=out)
+        with self.assertRaisesMessage(CommandError, 'fewer than sit'):
+            call_command('schedule_exams', *args, '--room=A:2', stdout=out)
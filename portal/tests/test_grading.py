@@ -0,0 +1,77 @@
+import io
+from datetime import timedelta
+from django.core.files.base import ContentFile
+from django.utils import timezone
+from portal.grading import grade_submissions, import_grades_csv
+from portal.models import Assignment, AssignmentSubmission
+from .fixtures import PortalTestCase
+
+
+class GradeImportTests(PortalTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.assignment = Assignment.objects.create(
+            title='Essay', description='-', subject=cls.subject, teacher=cls.teacher,
+            due_date=timezone.now() + timedelta(days=7), max_marks=20,
+        )
+        for student in cls.students[:3]:
+            AssignmentSubmission.objects.create(
+                assignment=cls.assignment, student=student, marks=5, feedback='Seen',
+                answer_file=ContentFile(student.registration_number.encode(), name='answer.pdf'),
+            )
+
+    def grades(self):
+        return list(
+            AssignmentSubmission.objects.filter(assignment=self.assignment)
+            .order_by('student__registration_number').values_list('marks', 'feedback')
+        )
+
+    def import_csv(self, text):
+        return import_grades_csv(self.assignment, io.BytesIO(text.encode('utf-8')))
+
+    def test_blank_marks_leave_grades_unchanged(self):
+        # The Download All manifest, with one row filled in and one cleared
+        updated, errors = self.import_csv(
+            'registration_number,campus_id,name,submitted_at,is_late,marks,file\n'
+            'STUDENTREG000,STUDENT0,Test 0,2024-03-01,False,,a.pdf\n'
+            'STUDENTREG001,STUDENT1,Test 1,2024-03-01,False,18,b.pdf\n'
+            'STUDENTREG002,STUDENT2,Test 2,2024-03-01,True,-,c.pdf\n'
+        )
+        self.assertEqual((updated, errors), (2, []))
+        self.assertEqual(self.grades(), [(5, 'Seen'), (18, 'Seen'), (None, 'Seen')])
+
+    def test_feedback_column(self):
+        updated, errors = self.import_csv(
+            'registration_number,marks,feedback\n'
+            'STUDENTREG000,,Good work\n'
+            'STUDENTREG001,12,-\n'
+            'STUDENTREG002,,\n'
+        )
+        self.assertEqual((updated, errors), (2, []))
+        self.assertEqual(self.grades(), [(5, 'Good work'), (12, ''), (5, 'Seen')])
+
+    def test_any_bad_row_saves_nothing(self):
+        updated, errors = self.import_csv(
+            'registration_number,marks\n'
+            'STUDENTREG000,10\n'
+            'STUDENTREG001,25\n'
+            'STUDENTREG004,10\n'
+        )
+        self.assertEqual(updated, 0)
+        self.assertEqual(errors, [{'label': 'line 4', 'error': 'no submission from STUDENTREG004'}])
+
+        updated, errors = self.import_csv('registration_number,marks\nSTUDENTREG001,25\n')
+        self.assertEqual(errors, [{'label': 'line 2', 'error': 'marks must be between 0 and 20'}])
+        self.assertEqual(self.grades(), [(5, 'Seen')] * 3)
+
+    def test_missing_columns_and_bad_encoding(self):
+        self.assertEqual(self.import_csv('registration,marks\n')[1][0]['error'], 'Missing column(s): registration_number')
+        updated, errors = import_grades_csv(self.assignment, io.BytesIO(b'\xff\xfe\x00r'))
+        self.assertEqual((updated, errors[0]['error']), (0, 'The file is not UTF-8 text'))
+
+    def test_api_grades_still_clear_on_blank_marks(self):
+        submission = AssignmentSubmission.objects.filter(assignment=self.assignment).first()
+        self.assertEqual(grade_submissions(self.assignment, [{'submission': submission.id, 'marks': ''}]), (1, []))
+        submission.refresh_from_db()
+        self.assertIsNone(submission.marks)
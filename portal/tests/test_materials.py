@@ -0,0 +1,77 @@
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.urls import reverse
+from portal.cache_versions import version_key
+from portal.models import Material
+from .fixtures import PASSWORD, PortalTestCase, make_students
+
+
+class MaterialsCatalogueTests(PortalTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.material = Material.objects.create(
+            subject=cls.subject, teacher=cls.teacher, title='Week 1 notes', description='-',
+            file=SimpleUploadedFile('week1.pdf', b'week one'),
+        )
+
+    def setUp(self):
+        super().setUp()
+        self.client.login(username=self.students[0].user.username, password=PASSWORD)
+
+    def get(self, etag=None):
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        return self.client.get(reverse('materials'), **headers)
+
+    def add_material(self, title):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Material.objects.create(
+                subject=self.subject, teacher=self.teacher, title=title, description='-',
+                file=SimpleUploadedFile(f'{title}.pdf', title.encode()),
+            )
+
+    def test_unchanged_catalogue_answers_304(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Week 1 notes')
+        self.assertIn('no-cache', response['Cache-Control'])
+        self.assertIn('private', response['Cache-Control'])
+
+        revalidated = self.get(response['ETag'])
+        self.assertEqual(revalidated.status_code, 304)
+        self.assertEqual(revalidated['ETag'], response['ETag'])
+
+    def test_new_material_changes_the_etag(self):
+        etag = self.get()['ETag']
+        self.add_material('Week 2 notes')
+        response = self.get(etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Week 2 notes')
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_hidden_material_changes_the_etag(self):
+        etag = self.get()['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.material.is_active = False
+            self.material.save()
+        response = self.get(etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, 'Week 1 notes')
+
+    def test_evicted_version_does_not_bring_back_a_stale_etag(self):
+        etag = self.get()['ETag']
+        self.add_material('Week 2 notes')
+        # A cache that lost its version keys must not serve the old catalogue
+        cache.delete_many([version_key('materials', 'all'),
+                           version_key('materials', f'semester:{self.subject.semester}')])
+        response = self.get(etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Week 2 notes')
+
+    def test_etag_differs_between_students(self):
+        etag = self.get()['ETag']
+        other = make_students(count=1, prefix='other')[0]
+        self.client.login(username=other.user.username, password=PASSWORD)
+        response = self.get(etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
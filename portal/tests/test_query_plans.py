@@ -0,0 +1,22 @@
+from django.db import connection
+from django.test import TestCase
+from portal.query_plans import full_scans, hot_queries, seed_attendance
+
+
+class HotQueryPlanTests(TestCase):
+    """A small run of check_query_plans; the command itself seeds a far larger dataset"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.student, cls.subject = seed_attendance(students=200, subjects=3, days=10)
+
+    def test_hot_queries_use_indexes(self):
+        for name, queryset in hot_queries(self.student, self.subject).items():
+            with self.subTest(name):
+                self.assertEqual(full_scans(queryset.explain()), set())
+
+    def test_full_scan_patterns(self):
+        self.assertEqual(full_scans('SCAN portal_attendance', 'sqlite'), {'portal_attendance'})
+        self.assertEqual(full_scans('SCAN portal_attendance USING INDEX x', 'sqlite'), set())
+        self.assertEqual(full_scans('-> Table scan on portal_attendancesummary', 'mysql'), {'portal_attendancesummary'})
+        self.assertEqual(full_scans('SCAN portal_subject', connection.vendor), set())
@@ -0,0 +1,125 @@
+import io
+from datetime import date, timedelta
+from django.urls import reverse
+from django.utils import timezone
+from openpyxl import load_workbook
+from portal.attendance_engine import bulk_mark_attendance
+from portal.models import AcademicTerm, ArchivedAttendance
+from portal.reports import SHORTFALL_COLUMNS, attendance_calendar, attendance_shortfall
+from .fixtures import PASSWORD, PortalTestCase, make_students
+
+START = date(2024, 3, 4)
+
+
+class ShortfallReportTests(PortalTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.senior = make_students(count=1, semester=6, prefix='senior')[0]
+        cls.other_batch = make_students(count=1, batch='Batch 2', prefix='batch2')[0]
+        students = [*cls.students, cls.senior, cls.other_batch]
+        for day in range(4):
+            # Student 0, the senior and the other batch attend half the classes, the rest all of them
+            bulk_mark_attendance(cls.subject, START + timedelta(days=day), 'Period 1', {
+                student.id: student not in (cls.students[0], cls.senior, cls.other_batch) or day % 2 == 0
+                for student in students
+            }, cls.teacher)
+        # Student 1 missed four classes last term, now in the archive
+        term = AcademicTerm.objects.create(name='Autumn', start_date=date(2023, 9, 1), end_date=date(2023, 12, 1),
+                                           is_closed=True)
+        ArchivedAttendance.objects.bulk_create([
+            ArchivedAttendance(term=term, student=cls.students[1], subject=cls.subject, date=date(2023, 10, day),
+                               period='Period 1', is_present=False, marked_at=timezone.now())
+            for day in range(1, 5)
+        ])
+
+    def test_students_below_the_threshold(self):
+        report = attendance_shortfall(5)
+        self.assertEqual(list(report.columns), SHORTFALL_COLUMNS)
+        self.assertEqual(
+            report[['registration_number', 'present', 'total', 'percentage', 'classes_needed']].values.tolist(),
+            [
+                ['BATCH2REG000', 2, 4, 50.0, 4],
+                ['STUDENTREG000', 2, 4, 50.0, 4],
+                ['STUDENTREG001', 4, 8, 50.0, 8],
+            ],
+        )
+
+    def test_batch_filter_and_other_cohorts(self):
+        report = attendance_shortfall(5, batch='Batch 1')
+        self.assertEqual(report['registration_number'].tolist(), ['STUDENTREG000', 'STUDENTREG001'])
+        # The semester 6 student's rows in this subject belong to another cohort
+        self.assertNotIn('SENIORREG000', attendance_shortfall(5)['registration_number'].tolist())
+        self.assertTrue(attendance_shortfall(6).empty)
+
+    def test_threshold(self):
+        self.assertTrue(attendance_shortfall(5, threshold=50).empty)
+        self.assertEqual(len(attendance_shortfall(5, threshold=90)), 3)
+
+    def test_exports(self):
+        self.client.login(username=self.teacher.user.username, password=PASSWORD)
+        url = reverse('attendance_shortfall_report')
+
+        page = self.client.get(url, {'semester': 5})
+        self.assertContains(page, 'STUDENTREG001')
+
+        response = self.client.get(url, {'semester': 5, 'batch': 'Batch 1', 'export': 'csv'})
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], ','.join(SHORTFALL_COLUMNS))
+        self.assertEqual(len(lines), 3)
+
+        response = self.client.get(url, {'semester': 5, 'export': 'xlsx'})
+        sheet = load_workbook(io.BytesIO(response.content))['Shortfall']
+        self.assertEqual(sheet.max_row, 4)
+
+    def test_semesters_the_teacher_does_not_teach_are_refused(self):
+        self.client.login(username=self.teacher.user.username, password=PASSWORD)
+        response = self.client.get(reverse('attendance_shortfall_report'), {'semester': 6})
+        self.assertRedirects(response, reverse('attendance'), fetch_redirect_response=False)
+
+
+class AttendanceCalendarTests(PortalTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        marks = {student.id: index % 2 == 0 for index, student in enumerate(cls.students)}
+        bulk_mark_attendance(cls.subject, START, 'Period 1', marks, cls.teacher)
+        bulk_mark_attendance(cls.subject, START, 'Period 2', marks, cls.teacher)
+        bulk_mark_attendance(cls.subjects[1], START + timedelta(days=2), 'Period 1', marks, cls.teacher)
+        term = AcademicTerm.objects.create(name='Autumn', start_date=date(2023, 9, 1), end_date=date(2023, 12, 1),
+                                           is_closed=True)
+        ArchivedAttendance.objects.create(term=term, student=cls.students[0], subject=cls.subject,
+                                          date=date(2023, 11, 30), period='Period 1', is_present=True,
+                                          marked_at=timezone.now())
+
+    def test_days_are_aggregated_in_one_query(self):
+        with self.assertNumQueries(1):
+            data = attendance_calendar(date(2023, 11, 1), START + timedelta(days=7), student=self.students[0])
+        self.assertEqual(data, {
+            'dates': ['2023-11-30', '2024-03-04', '2024-03-06'],
+            'present': [1, 2, 1],
+            'total': [1, 2, 1],
+        })
+        data = attendance_calendar(START, START, subject=self.subject)
+        self.assertEqual((data['present'], data['total']), ([6], [10]))
+
+    def test_student_and_teacher_views(self):
+        url = reverse('api_attendance_calendar')
+        params = {'start_date': '2024-03-01', 'end_date': '2024-03-31'}
+
+        self.client.login(username=self.students[1].user.username, password=PASSWORD)
+        data = self.client.get(url, params).json()
+        self.assertEqual((data['dates'], data['present'], data['absent']),
+                         (['2024-03-04', '2024-03-06'], [0, 0], [2, 1]))
+
+        self.client.login(username=self.teacher.user.username, password=PASSWORD)
+        data = self.client.get(url, {**params, 'subject': self.subject.id}).json()
+        self.assertEqual(data['average'], [60.0])
+        self.assertEqual(self.client.get(url, {**params, 'subject': 0}).status_code, 404)
+
+    def test_bad_ranges(self):
+        self.client.login(username=self.students[0].user.username, password=PASSWORD)
+        url = reverse('api_attendance_calendar')
+        self.assertEqual(self.client.get(url, {'start_date': 'soon'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'start_date': '2024-03-05', 'end_date': '2024-03-01'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'start_date': '2022-01-01', 'end_date': '2024-03-01'}).status_code, 400)
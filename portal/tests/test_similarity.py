@@ -0,0 +1,105 @@
+import io
+import logging
+import random
+import zipfile
+from datetime import timedelta
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.urls import reverse
+from django.utils import timezone
+from portal.models import Assignment, AssignmentSubmission, DocumentSignature
+from portal.similarity import (
+    UnreadableDocument, estimated_similarity, extract_text, minhash, shingle_hashes, similarity_report
+)
+from .fixtures import PASSWORD, PortalTestCase, make_students
+
+_words = random.Random(7)
+VOCABULARY = [f'word{i}' for i in range(400)]
+ESSAY = ' '.join(_words.choice(VOCABULARY) for _ in range(300))
+OTHER_ESSAY = ' '.join(_words.choice(VOCABULARY) for _ in range(300))
+
+
+def docx(text):
+    data = io.BytesIO()
+    with zipfile.ZipFile(data, 'w') as archive:
+        archive.writestr('word/document.xml', (
+            '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"><w:body>'
+            f'<w:p><w:r><w:t>{text}</w:t></w:r></w:p></w:body></w:document>'
+        ))
+    return data.getvalue()
+
+
+class SimilarityTests(PortalTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.assignment = Assignment.objects.create(title='Essay', description='-', subject=cls.subject,
+                                                   teacher=cls.teacher, due_date=timezone.now() + timedelta(days=1))
+        edited = ESSAY.split()
+        edited[100:103] = ['changed', 'a', 'phrase']
+        students = cls.students + make_students(count=2, prefix='extra')
+        files = [
+            ('essay.txt', ESSAY.encode()),
+            ('copied.docx', docx(' '.join(edited))),
+            ('own.txt', OTHER_ESSAY.encode()),
+            ('broken.pdf', b'%PDF-1.4 not really'),
+            ('notes.odt', b'odt'),
+            ('copy.txt', ESSAY.encode()),
+            ('blank.txt', b'   '),
+        ]
+        cls.submissions = [
+            AssignmentSubmission.objects.create(assignment=cls.assignment, student=student,
+                                                answer_file=SimpleUploadedFile(name, content))
+            for student, (name, content) in zip(students, files)
+        ]
+
+    def setUp(self):
+        super().setUp()
+        # pypdf warns about the broken PDFs fed to it on purpose
+        logger = logging.getLogger('pypdf')
+        self.addCleanup(logger.setLevel, logger.level)
+        logger.setLevel(logging.CRITICAL)
+
+    def test_extraction(self):
+        self.assertEqual(extract_text(io.BytesIO(docx('hello there')), '.docx'), 'hello there')
+        self.assertEqual(extract_text(io.BytesIO('héllo'.encode()), '.txt'), 'héllo')
+        for content, extension in ((b'nope', '.docx'), (b'nope', '.pdf'), (b'x', '.odt')):
+            with self.subTest(extension=extension), self.assertRaises(UnreadableDocument):
+                extract_text(io.BytesIO(content), extension)
+
+    def test_minhash_estimates_jaccard(self):
+        signature = minhash(shingle_hashes(ESSAY))
+        self.assertEqual(estimated_similarity(signature, minhash(shingle_hashes(ESSAY.upper()))), 1.0)
+        self.assertLess(estimated_similarity(signature, minhash(shingle_hashes(OTHER_ESSAY))), 0.2)
+        self.assertEqual(len(shingle_hashes('two words')), 1)
+        self.assertEqual(len(shingle_hashes('')), 0)
+
+    def test_report(self):
+        report = similarity_report(self.submissions)
+        self.assertEqual((report['pending'], report['analysed'], report['pairs']), (7, 0, []))
+
+        report = similarity_report(self.submissions, compute=True)
+        # Identical files share one signature
+        self.assertEqual(report['built'], 6)
+        self.assertEqual(report['analysed'], 4)
+        essay, copied, _, broken, odt, copy, blank = self.submissions
+        self.assertEqual([(a, b) for a, b, _ in report['pairs']], [(essay, copy), (essay, copied), (copied, copy)])
+        self.assertEqual(report['pairs'][0][2], 1.0)
+        self.assertGreater(report['pairs'][1][2], 0.8)
+        self.assertEqual({submission for submission, _ in report['failed']}, {broken, odt, blank})
+        self.assertIn('No text found', dict(report['failed'])[blank])
+
+        # Re-runs only read the cache
+        with self.assertNumQueries(1):
+            self.assertEqual(similarity_report(self.submissions, compute=True)['built'], 0)
+        self.assertEqual(DocumentSignature.objects.count(), 6)
+
+    def test_check_similarity_view(self):
+        self.client.login(username=self.teacher.user.username, password=PASSWORD)
+        url = reverse('check_similarity', args=[self.assignment.id])
+        response = self.client.post(url, follow=True)
+        self.assertContains(response, 'Analysed 6 new files; 3 similar pairs found.')
+        self.assertEqual(len(response.context['similarity']['pairs']), 3)
+
+        self.client.login(username=self.students[0].user.username, password=PASSWORD)
+        self.client.post(url)
+        self.assertEqual(DocumentSignature.objects.count(), 6)
@@ -0,0 +1,73 @@
+import hashlib
+import os
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import IntegrityError
+from portal.models import Material, MediaBlob
+from portal.storage import blob_name, content_storage
+from .fixtures import PortalTestCase
+
+
+class ContentAddressedStorageTests(PortalTestCase):
+    def material(self, content, name='notes.pdf', **fields):
+        material = Material(subject=self.subject, teacher=self.teacher, title='Notes', description='-', **fields)
+        material.file = SimpleUploadedFile(name, content)
+        with self.captureOnCommitCallbacks(execute=True):
+            material.save()
+        return material
+
+    def refs(self):
+        return dict(MediaBlob.objects.values_list('name', 'refs'))
+
+    def test_identical_files_share_one_blob(self):
+        first = self.material(b'same bytes')
+        second = self.material(b'same bytes', name='copy.pdf')
+        self.assertEqual(first.file.name, second.file.name)
+        self.assertEqual(self.refs(), {first.file.name: 2})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertEqual(self.refs(), {second.file.name: 1})
+        self.assertTrue(content_storage.exists(second.file.name))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertEqual(self.refs(), {})
+        self.assertFalse(content_storage.exists(second.file.name))
+
+    def test_replacing_a_file_releases_the_old_blob(self):
+        material = self.material(b'first version')
+        old_name = material.file.name
+        material.file = SimpleUploadedFile('notes.pdf', b'second version')
+        with self.captureOnCommitCallbacks(execute=True):
+            material.save()
+        self.assertEqual(self.refs(), {material.file.name: 1})
+        self.assertFalse(os.path.exists(content_storage.path(old_name)))
+
+    def test_reuploading_identical_content_keeps_one_reference(self):
+        material = self.material(b'unchanged')
+        for upload in (
+            lambda: material.file.save('again.pdf', ContentFile(b'unchanged'), save=False),
+            lambda: setattr(material, 'file', SimpleUploadedFile('again.pdf', b'unchanged')),
+        ):
+            upload()
+            with self.captureOnCommitCallbacks(execute=True):
+                material.save()
+            self.assertEqual(self.refs(), {material.file.name: 1})
+
+        # Saving without touching the file changes nothing
+        material.refresh_from_db()
+        material.title = 'Renamed'
+        material.save()
+        self.assertEqual(self.refs(), {material.file.name: 1})
+
+    def test_failed_save_takes_no_reference(self):
+        material = Material(subject=self.subject, teacher=self.teacher, title=None, description='-')
+        material.file = SimpleUploadedFile('notes.pdf', b'never saved')
+        with self.assertRaises(IntegrityError):
+            material.save()
+        self.assertEqual(self.refs(), {})
+
+    def test_blob_names_come_from_the_content(self):
+        material = self.material(b'named by content', name='Lecture 1.PDF')
+        self.assertEqual(material.file.name, blob_name(hashlib.sha256(b'named by content').hexdigest(), '.pdf'))
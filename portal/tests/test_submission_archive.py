@@ -0,0 +1,63 @@
+import csv
+import io
+import zipfile
+from datetime import timedelta
+from django.urls import reverse
+from django.utils import timezone
+from portal.models import Assignment, AssignmentSubmission
+from portal.submission_archive import MANIFEST_HEADER, archive_filename, stream_submissions_zip
+from .fixtures import PASSWORD, PortalTestCase, make_teacher
+from .test_assignments import submit
+
+
+class SubmissionArchiveTests(PortalTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.assignment = Assignment.objects.create(title='Lab Report 1', description='-', subject=cls.subject,
+                                                   teacher=cls.teacher, due_date=timezone.now() + timedelta(days=1))
+        for student in reversed(cls.students[:3]):
+            submit(cls.assignment, student, marks=8 if student is cls.students[0] else None)
+
+    def read_archive(self, pieces):
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(pieces)))
+        self.assertIsNone(archive.testzip())
+        manifest = list(csv.reader(io.StringIO(archive.read('manifest.csv').decode())))
+        return archive, manifest
+
+    def test_archive_holds_every_answer_and_a_manifest(self):
+        archive, manifest = self.read_archive(stream_submissions_zip(self.assignment))
+        self.assertEqual(archive.namelist(), [
+            'manifest.csv', 'STUDENTREG000.txt', 'STUDENTREG001.txt', 'STUDENTREG002.txt',
+        ])
+        self.assertEqual(archive.read('STUDENTREG001.txt'), b'answer by STUDENT1')
+        self.assertEqual(manifest[0], MANIFEST_HEADER)
+        self.assertEqual(manifest[1][:3] + manifest[1][4:], ['STUDENTREG000', 'STUDENT0', 'Test 0', 'no', '8',
+                                                             'STUDENTREG000.txt'])
+        self.assertEqual(manifest[2][5], '')
+
+    def test_missing_files_are_listed_and_skipped(self):
+        AssignmentSubmission.objects.filter(student=self.students[1]).update(answer_file='assignments/gone.txt')
+        archive, manifest = self.read_archive(stream_submissions_zip(self.assignment))
+        self.assertNotIn('STUDENTREG001.txt', archive.namelist())
+        self.assertEqual(manifest[2][6], 'missing')
+
+    def test_data_is_sent_as_it_is_built(self):
+        pieces = stream_submissions_zip(self.assignment)
+        # The manifest goes out before any answer file is opened
+        self.assertTrue(next(pieces).startswith(b'PK'))
+        self.assertGreater(len([piece for piece in pieces if piece]), 3)
+
+    def test_download_view(self):
+        self.client.login(username=self.teacher.user.username, password=PASSWORD)
+        response = self.client.get(reverse('download_submissions_zip', args=[self.assignment.id]))
+        self.assertTrue(response.streaming)
+        self.assertEqual(archive_filename(self.assignment), 'sub-0_lab-report-1_submissions.zip')
+        self.assertIn(archive_filename(self.assignment), response['Content-Disposition'])
+        archive, _ = self.read_archive(response.streaming_content)
+        self.assertEqual(len(archive.namelist()), 4)
+
+        other = make_teacher('other', 'T-2')
+        self.client.login(username=other.user.username, password=PASSWORD)
+        self.assertEqual(self.client.get(reverse('download_submissions_zip', args=[self.assignment.id])).status_code,
+                         404)
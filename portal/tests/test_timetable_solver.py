@@ -0,0 +1,96 @@
+import io
+from collections import Counter
+from django.core.management import CommandError, call_command
+from portal.models import Subject, TimeTable
+from portal.timetable_solver import (
+    SLOT_COUNT, TEACHING_PERIODS, apply_timetable, day_period, generate_timetable, slot_of,
+    timetable_batches, timetable_clashes
+)
+from .fixtures import PortalTestCase, make_students, make_subjects, make_teacher
+
+
+class TimetableSolverTests(PortalTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        # Batch 2 shares the semester-5 subjects, and so the teacher, with Batch 1
+        make_students(count=2, batch='Batch 2', prefix='second')
+        other = make_teacher('other', 'T-2')
+        make_subjects(other, count=3, semester=6, prefix='SENIOR')
+        make_students(count=2, semester=6, batch='Batch 3', prefix='senior')
+
+    def assert_clash_free(self, rows):
+        for key in (lambda row: (row.batch, row.day, row.period),
+                    lambda row: (row.room, row.day, row.period),
+                    lambda row: (Subject.objects.get(pk=row.subject_id).teacher_id, row.day, row.period)):
+            self.assertEqual(max(Counter(map(key, rows)).values()), 1)
+
+    def test_slots(self):
+        self.assertEqual(SLOT_COUNT, 6 * len(TEACHING_PERIODS))
+        self.assertEqual(day_period(slot_of('Friday', 'Period 4')), ('Friday', 'Period 4'))
+
+    def test_every_credit_is_placed_without_clashes(self):
+        rows, unplaced = generate_timetable(['LH 1', 'LH 2'])
+        self.assertEqual(unplaced, [])
+        # Two batches of two 4-credit subjects, and one of three
+        self.assertEqual(len(rows), 2 * 2 * 4 + 3 * 4)
+        self.assert_clash_free(rows)
+        self.assertFalse({row.period for row in rows} & {'Break', 'Lunch Break'})
+        # A subject's sessions are spread over different days first
+        days = Counter((row.batch, row.subject_id, row.day) for row in rows)
+        self.assertEqual(max(days.values()), 1)
+
+    def test_rows_outside_the_scope_count_as_busy(self):
+        TimeTable.objects.create(batch='Batch 3', day='Monday', period='Period 1', subject=self.subject, room='LH 1')
+        rows, unplaced = generate_timetable(['LH 1'], batches=['Batch 1'])
+        self.assertEqual(unplaced, [])
+        self.assertEqual({row.batch for row in rows}, {'Batch 1'})
+        self.assertNotIn(('Monday', 'Period 1'), {(row.day, row.period) for row in rows})
+
+    def test_unplaceable_sessions_are_reported(self):
+        Subject.objects.filter(semester=5).update(credits=20)
+        rows, unplaced = generate_timetable(['LH 1'], batches=['Batch 1'])
+        # One teacher and one room: every slot is used and the rest is reported
+        self.assertEqual(len(rows), SLOT_COUNT)
+        self.assertEqual(sum(missing for _, _, missing in unplaced), 40 - SLOT_COUNT)
+        self.assert_clash_free(rows)
+
+    def test_apply_replaces_teaching_rows_and_keeps_breaks(self):
+        TimeTable.objects.create(batch='Batch 4', day='Monday', period='Period 1', subject=self.subject)
+        TimeTable.objects.create(batch='Batch 4', day='Monday', period='Break')
+        TimeTable.objects.create(batch='Batch 1', day='Monday', period='Period 1', subject=self.subject)
+        # Batch 4 has no students, but a run asked for it clears its old rows
+        batches = timetable_batches(['Batch 1', 'Batch 4'])
+        rows, _ = generate_timetable(['LH 1'], batches=batches)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(apply_timetable(rows, batches), 8)
+        self.assertEqual(list(TimeTable.objects.filter(batch='Batch 4').values_list('period', flat=True)), ['Break'])
+        self.assertEqual(TimeTable.objects.filter(batch='Batch 1').count(), 8)
+        self.assertEqual(timetable_batches(), ['Batch 1', 'Batch 2', 'Batch 3'])
+
+    def test_clashes(self):
+        TimeTable.objects.create(batch='Batch 1', day='Monday', period='Period 1', subject=self.subject, room='LH 1')
+        TimeTable.objects.create(batch='Batch 2', day='Monday', period='Period 1', subject=self.subjects[1],
+                                 room='LH 1')
+        self.assertEqual(sorted(clash[0] for clash in timetable_clashes()), ['room', 'teacher'])
+
+        out = io.StringIO()
+        with self.assertRaisesMessage(CommandError, '2 clashes'):
+            call_command('generate_timetable', check=True, stdout=out)
+        self.assertIn('teacher Test Teacher double-booked on Monday Period 1', out.getvalue())
+
+    def test_command(self):
+        out = io.StringIO()
+        call_command('generate_timetable', room=['LH 1', 'LH 2'], dry_run=True, stdout=out)
+        self.assertIn('Planned 28 sessions for 3 batches', out.getvalue())
+        self.assertFalse(TimeTable.objects.exists())
+
+        call_command('generate_timetable', room=['LH 1', 'LH 2'], stdout=out)
+        self.assertEqual(TimeTable.objects.count(), 28)
+        self.assertEqual(timetable_clashes(), [])
+        call_command('generate_timetable', check=True, stdout=out)
+
+        Subject.objects.update(credits=40)
+        with self.assertRaisesMessage(CommandError, 'Nothing was saved'):
+            call_command('generate_timetable', batch=['Batch 1'], stdout=out, stderr=io.StringIO())
+        self.assertEqual(TimeTable.objects.count(), 28)
@@ -0,0 +1,135 @@
+from django.core.cache import cache
+from django.db.models.signals import post_save
+from django.urls import reverse
+from portal.cache_versions import version_key
+from portal.models import TimeTable
+from portal.timetables import batch_grid, build_schedule_index, schedule_index, timetable_batches, week_grid
+from .fixtures import PASSWORD, PortalTestCase, make_subjects, make_teacher
+
+
+class TimetableCacheTests(PortalTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.entry = TimeTable.objects.create(batch='Batch 1', day='Monday', period='Period 1', subject=cls.subject)
+        TimeTable.objects.create(batch='Batch 2', day='Tuesday', period='Period 2', subject=cls.subjects[1])
+
+    def test_grid_is_built_in_one_query_then_cached(self):
+        with self.assertNumQueries(1):
+            grid = batch_grid('Batch 1')
+        self.assertEqual(grid['Monday']['Period 1'].subject.teacher.user.username, 'teacher')
+        self.assertIsNone(grid['Monday']['Period 2'])
+        with self.assertNumQueries(0):
+            batch_grid('Batch 1')
+
+    def test_editing_an_entry_retires_only_its_batches(self):
+        batch_grid('Batch 1')
+        batch_grid('Batch 2')
+        self.assertEqual(timetable_batches(), ['Batch 1', 'Batch 2'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.entry.batch = 'Batch 3'
+            self.entry.save()
+        with self.assertNumQueries(0):
+            batch_grid('Batch 2')
+        with self.assertNumQueries(1):
+            self.assertIsNone(batch_grid('Batch 1')['Monday']['Period 1'])
+        self.assertIsNotNone(batch_grid('Batch 3')['Monday']['Period 1'])
+        self.assertEqual(timetable_batches(), ['Batch 2', 'Batch 3'])
+
+    def test_subject_edits_retire_every_batch(self):
+        batch_grid('Batch 1')
+        batch_grid('Batch 2')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.subject.name = 'Renamed'
+            self.subject.save()
+        self.assertEqual(batch_grid('Batch 1')['Monday']['Period 1'].subject.name, 'Renamed')
+        with self.assertNumQueries(1):
+            batch_grid('Batch 2')
+
+    def test_evicted_version_rebuilds_the_grid(self):
+        batch_grid('Batch 1')
+        TimeTable.objects.filter(pk=self.entry.pk).update(period='Period 2')
+        cache.delete(version_key('timetable', 'batch:Batch 1'))
+        grid = batch_grid('Batch 1')
+        self.assertIsNone(grid['Monday']['Period 1'])
+        self.assertIsNotNone(grid['Monday']['Period 2'])
+
+    def test_fixture_loads_do_not_touch_the_cache(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            post_save.send(TimeTable, instance=self.entry, created=False, raw=True)
+        self.assertEqual(callbacks, [])
+
+    def test_timetable_page(self):
+        self.client.login(username=self.students[0].user.username, password=PASSWORD)
+        response = self.client.get(reverse('timetable'))
+        self.assertEqual(response.context['current_batch'], 'Batch 1')
+        self.assertContains(response, 'SUB-0')
+
+
+class ScheduleIndexTests(PortalTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.other = make_teacher('other', 'T-2')
+        other_subject = make_subjects(cls.other, count=1, prefix='OTHER')[0]
+        TimeTable.objects.create(batch='Batch 2', day='Tuesday', period='Period 2', subject=cls.subject, room='LH 1')
+        TimeTable.objects.create(batch='Batch 1', day='Monday', period='Period 3', subject=cls.subject, room='LH 1')
+        TimeTable.objects.create(batch='Batch 1', day='Monday', period='Period 1', subject=other_subject, room='LH 2')
+        # Breaks have no subject and stay out of the index
+        TimeTable.objects.create(batch='Batch 1', day='Monday', period='Break', room='LH 2')
+
+    def test_index_groups_every_row_from_one_query(self):
+        with self.assertNumQueries(1):
+            index = schedule_index()
+        entries = index['teacher'][self.teacher.id]
+        self.assertEqual([(entry['day'], entry['period']) for entry in entries],
+                         [('Monday', 'Period 3'), ('Tuesday', 'Period 2')])
+        self.assertEqual(entries[0]['teacher_name'], 'Test Teacher')
+        self.assertEqual(sorted(index['room']), ['LH 1', 'LH 2'])
+        self.assertEqual(len(index['room']['LH 2']), 1)
+        self.assertEqual(len(index['batch']['Batch 1']), 2)
+        with self.assertNumQueries(0):
+            schedule_index()
+
+    def test_week_grid_keeps_clashes(self):
+        TimeTable.objects.create(batch='Batch 3', day='Tuesday', period='Period 2', subject=self.subject)
+        grid = week_grid(build_schedule_index()['teacher'][self.teacher.id])
+        self.assertEqual(len(grid['Tuesday']['Period 2']), 2)
+        self.assertEqual(grid['Friday']['Period 1'], [])
+
+    def test_index_follows_timetable_and_teacher_edits(self):
+        schedule_index()
+        with self.captureOnCommitCallbacks(execute=True):
+            TimeTable.objects.create(batch='Batch 4', day='Friday', period='Period 4', subject=self.subject)
+        self.assertEqual(len(schedule_index()['teacher'][self.teacher.id]), 3)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.teacher.user.first_name = 'Renamed'
+            self.teacher.user.save()
+            self.teacher.save()
+        self.assertEqual(schedule_index()['teacher'][self.teacher.id][0]['teacher_name'], 'Renamed Teacher')
+
+    def test_my_week_and_room_pages(self):
+        self.client.login(username=self.teacher.user.username, password=PASSWORD)
+        response = self.client.get(reverse('my_week'))
+        self.assertEqual(response.context['subtitle'], '2 classes across all batches')
+        response = self.client.get(reverse('room_occupancy'), {'room': 'LH 2'})
+        self.assertEqual(response.context['current_room'], 'LH 2')
+        self.assertContains(response, 'OTHER-0')
+
+        self.client.login(username=self.students[0].user.username, password=PASSWORD)
+        self.assertRedirects(self.client.get(reverse('my_week')), reverse('dashboard'), fetch_redirect_response=False)
+
+    def test_schedule_api(self):
+        self.client.login(username=self.teacher.user.username, password=PASSWORD)
+        data = self.client.get(reverse('api_schedule')).json()
+        self.assertEqual(data['teacher'], self.teacher.id)
+        self.assertEqual(len(data['entries']), 2)
+        data = self.client.get(reverse('api_schedule'), {'room': 'LH 1'}).json()
+        self.assertEqual({entry['batch'] for entry in data['entries']}, {'Batch 1', 'Batch 2'})
+        self.assertEqual(self.client.get(reverse('api_schedule'), {'teacher': 'x'}).status_code, 400)
+
+        self.client.login(username=self.students[0].user.username, password=PASSWORD)
+        data = self.client.get(reverse('api_schedule')).json()
+        self.assertEqual((data['batch'], len(data['entries'])), ('Batch 1', 2))
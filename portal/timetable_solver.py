@@ -0,0 +1,295 @@
+import random
+from collections import defaultdict
+from django.db import transaction
+from .models import Student, Subject, TimeTable
+from .timetables import TIMETABLE_DAYS, invalidate_timetables
+
+BREAK_PERIODS = ('Break', 'Lunch Break')
+TEACHING_PERIODS = [period for period, _ in TimeTable.PERIOD_CHOICES if period not in BREAK_PERIODS]
+
+# Slot ``day * len(TEACHING_PERIODS) + period`` is bit ``slot`` in every mask
+SLOT_COUNT = len(TIMETABLE_DAYS) * len(TEACHING_PERIODS)
+ALL_SLOTS = (1 << SLOT_COUNT) - 1
+DAY_MASKS = [
+    ((1 << len(TEACHING_PERIODS)) - 1) << (day * len(TEACHING_PERIODS))
+    for day in range(len(TIMETABLE_DAYS))
+]
+
+# Search effort before giving up on a run, and how many reshuffled runs to try
+MAX_BACKTRACKS = 2000
+MAX_RESTARTS = 20
+
+
+def slot_of(day, period):
+    return TIMETABLE_DAYS.index(day) * len(TEACHING_PERIODS) + TEACHING_PERIODS.index(period)
+
+
+def day_period(slot):
+    return TIMETABLE_DAYS[slot // len(TEACHING_PERIODS)], TEACHING_PERIODS[slot % len(TEACHING_PERIODS)]
+
+
+def _bits(mask):
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+# Problem
+
+class Unit:
+    """``sessions`` weekly classes of one subject for one batch"""
+
+    def __init__(self, batch, subject_id, teacher_id, sessions):
+        self.batch = batch
+        self.subject_id = subject_id
+        self.teacher_id = teacher_id
+        self.sessions = sessions
+        self.placed = []  # (slot, room)
+
+
+def batch_subjects(batches=None):
+    """{batch: [Subject]} from the semesters of the students in each batch"""
+    pairs = Student.objects.values_list('batch', 'semester').distinct()
+    if batches:
+        pairs = pairs.filter(batch__in=batches)
+    semesters_by_batch = defaultdict(set)
+    for batch, semester in pairs:
+        semesters_by_batch[batch].add(semester)
+
+    subjects_by_semester = defaultdict(list)
+    for subject in Subject.objects.filter(semester__in={s for ss in semesters_by_batch.values() for s in ss}):
+        subjects_by_semester[subject.semester].append(subject)
+
+    return {
+        batch: [subject for semester in sorted(semesters) for subject in subjects_by_semester[semester]]
+        for batch, semesters in sorted(semesters_by_batch.items())
+    }
+
+
+# Solver
+
+class TimetableSolver:
+    """Place every unit's sessions into free (slot, room) pairs.
+
+    Teacher, batch and room occupancy are bitmasks over the week's teaching
+    slots, so a unit's domain is one AND-NOT expression. Each step places
+    the unit with the fewest free slots left (MRV), preferring days the unit
+    does not meet yet, and forward-checks that every unit sharing the
+    teacher or batch still has enough room; dead ends backtrack. Runs that
+    exhaust MAX_BACKTRACKS restart with a reshuffled tie order.
+
+    ``fixed_teacher`` / ``fixed_room`` hold slots already taken by rows
+    outside the batches being generated.
+    """
+
+    def __init__(self, units, rooms, fixed_teacher=None, fixed_room=None, seed=0):
+        self.units = units
+        self.rooms = list(rooms)
+        self.fixed_teacher = fixed_teacher or {}
+        self.fixed_room = fixed_room or {}
+        self.random = random.Random(seed)
+        self.backtracks = 0
+
+    def solve(self):
+        for _ in range(MAX_RESTARTS):
+            self.reset()
+            self.backtracks = 0
+            if self.search():
+                return True
+            self.random.shuffle(self.units)
+        # Keep the best effort: greedily place what still fits
+        self.reset()
+        self.greedy()
+        return False
+
+    def reset(self):
+        self.teacher_busy = defaultdict(int, self.fixed_teacher)
+        self.room_busy = {room: self.fixed_room.get(room, 0) for room in self.rooms}
+        self.batch_busy = defaultdict(int)
+        self.rooms_full = 0
+        for slot in range(SLOT_COUNT):
+            if all(busy >> slot & 1 for busy in self.room_busy.values()):
+                self.rooms_full |= 1 << slot
+        for unit in self.units:
+            unit.placed = []
+
+    def domain(self, unit):
+        busy = self.batch_busy[unit.batch] | self.rooms_full
+        if unit.teacher_id:
+            busy |= self.teacher_busy[unit.teacher_id]
+        return ALL_SLOTS & ~busy
+
+    def place(self, unit, slot):
+        bit = 1 << slot
+        preferred = unit.placed[0][1] if unit.placed else None
+        room = preferred if preferred in self.room_busy and not self.room_busy[preferred] & bit else next(
+            room for room in self.rooms if not self.room_busy[room] & bit
+        )
+        self.room_busy[room] |= bit
+        if all(busy & bit for busy in self.room_busy.values()):
+            self.rooms_full |= bit
+        self.batch_busy[unit.batch] |= bit
+        if unit.teacher_id:
+            self.teacher_busy[unit.teacher_id] |= bit
+        unit.placed.append((slot, room))
+
+    def unplace(self, unit):
+        slot, room = unit.placed.pop()
+        bit = 1 << slot
+        self.room_busy[room] &= ~bit
+        self.rooms_full &= ~bit
+        self.batch_busy[unit.batch] &= ~bit
+        if unit.teacher_id:
+            self.teacher_busy[unit.teacher_id] &= ~bit
+
+    def ordered_slots(self, unit, domain):
+        met_days = 0
+        for slot, _ in unit.placed:
+            met_days |= DAY_MASKS[slot // len(TEACHING_PERIODS)]
+        fresh = domain & ~met_days
+        return list(_bits(fresh)) + list(_bits(domain & met_days))
+
+    def pending(self):
+        return [unit for unit in self.units if len(unit.placed) < unit.sessions]
+
+    def consistent(self, unit):
+        # Forward check the units that share this unit's teacher or batch
+        for other in self.pending():
+            if other.batch == unit.batch or (unit.teacher_id and other.teacher_id == unit.teacher_id):
+                if bin(self.domain(other)).count('1') < other.sessions - len(other.placed):
+                    return False
+        return True
+
+    def search(self):
+        """Depth-first search with an explicit stack, as a week can hold over a thousand sessions"""
+        stack = []
+        while True:
+            pending = self.pending()
+            if not pending:
+                return True
+            unit = min(pending, key=lambda u: bin(self.domain(u)).count('1') - (u.sessions - len(u.placed)))
+            stack.append((unit, iter(self.ordered_slots(unit, self.domain(unit)))))
+
+            # Advance the top frame to its next consistent slot, popping exhausted frames
+            while True:
+                unit, candidates = stack[-1]
+                for slot in candidates:
+                    self.place(unit, slot)
+                    if self.consistent(unit):
+                        break
+                    self.unplace(unit)
+                else:
+                    stack.pop()
+                    if not stack:
+                        return False
+                    self.unplace(stack[-1][0])
+                    self.backtracks += 1
+                    if self.backtracks > MAX_BACKTRACKS:
+                        return False
+                    continue
+                break
+
+    def greedy(self):
+        for unit in sorted(self.units, key=lambda u: bin(self.domain(u)).count('1')):
+            while len(unit.placed) < unit.sessions:
+                slots = self.ordered_slots(unit, self.domain(unit))
+                if not slots:
+                    break
+                self.place(unit, slots[0])
+
+
+# Entry points
+
+def timetable_batches(batches=None):
+    """The batches a run replaces: ``batches`` as given, or every batch with students.
+
+    A batch in scope is replaced even when it yields no rows, so one left
+    without students or subjects loses its old timetable.
+    """
+    if batches:
+        return sorted(set(batches))
+    return sorted(batch_subjects())
+
+
+def generate_timetable(rooms, batches=None, seed=0):
+    """Plan a clash-free week for ``batches`` (default: every batch with students).
+
+    Rows of batches outside timetable_batches(batches) stay as they are and
+    count as busy teacher and room slots. Returns (rows, unplaced): rows are
+    unsaved TimeTable objects; unplaced lists (batch, subject, missing
+    sessions) when no complete timetable was found.
+    """
+    subjects_by_batch = batch_subjects(batches)
+    units = [
+        Unit(batch, subject.id, subject.teacher_id, subject.credits)
+        for batch, subjects in subjects_by_batch.items()
+        for subject in subjects
+        if subject.credits > 0
+    ]
+
+    fixed_teacher = defaultdict(int)
+    fixed_room = defaultdict(int)
+    others = TimeTable.objects.exclude(batch__in=timetable_batches(batches)).filter(
+        subject__isnull=False, period__in=TEACHING_PERIODS
+    ).values_list('day', 'period', 'subject__teacher_id', 'room')
+    for day, period, teacher_id, room in others:
+        bit = 1 << slot_of(day, period)
+        if teacher_id:
+            fixed_teacher[teacher_id] |= bit
+        fixed_room[room] |= bit
+
+    solver = TimetableSolver(units, rooms, fixed_teacher, fixed_room, seed=seed)
+    solver.solve()
+
+    subjects = {subject.id: subject for subjects in subjects_by_batch.values() for subject in subjects}
+    rows = []
+    unplaced = []
+    for unit in solver.units:
+        for slot, room in unit.placed:
+            day, period = day_period(slot)
+            rows.append(TimeTable(batch=unit.batch, day=day, period=period, subject_id=unit.subject_id, room=room))
+        if len(unit.placed) < unit.sessions:
+            unplaced.append((unit.batch, subjects[unit.subject_id], unit.sessions - len(unit.placed)))
+    return rows, unplaced
+
+
+def apply_timetable(rows, batches):
+    """Replace the teaching-period rows of ``batches`` with ``rows``; break rows are kept.
+
+    ``batches`` is the scope the run was asked for (see timetable_batches),
+    not the batches found in ``rows``.
+    """
+    with transaction.atomic():
+        TimeTable.objects.filter(batch__in=batches, period__in=TEACHING_PERIODS).delete()
+        # bulk_create skips the per-row signals; the new grids are retired here
+        TimeTable.objects.bulk_create(rows, batch_size=500)
+        invalidate_timetables(*[f'batch:{batch}' for batch in batches], 'batches')
+    return len(rows)
+
+
+def timetable_clashes(queryset=None):
+    """Teachers and rooms booked more than once in the same day and period.
+
+    One pass over the rows; returns a list of (kind, who, day, period, rows).
+    """
+    if queryset is None:
+        queryset = TimeTable.objects.all()
+    bookings = defaultdict(list)
+    for row in queryset.filter(subject__isnull=False).select_related('subject__teacher__user'):
+        if row.subject.teacher_id:
+            bookings[('teacher', row.subject.teacher, row.day, row.period)].append(row)
+        if row.room:
+            bookings[('room', row.room, row.day, row.period)].append(row)
+    return [
+        (kind, who, day, period, rows)
+        for (kind, who, day, period), rows in bookings.items()
+        if len(rows) > 1
+    ]
+
+
+def describe_clash(kind, who, day, period, rows):
+    if kind == 'teacher':
+        who = who.user.get_full_name() or who.employee_number
+    batches = ', '.join(f'{row.batch} ({row.subject.code})' for row in rows)
+    return f'{kind} {who} double-booked on {day} {period}: {batches}'
@@ -0,0 +1,112 @@
+from urllib.parse import quote
+from django.core.cache import cache
+from .cache_versions import bump, versions
+from .models import TimeTable
+
+TIMETABLE_DAYS = [day for day, _ in TimeTable.DAYS_CHOICES]
+TIMETABLE_PERIODS = [period for period, _ in TimeTable.PERIOD_CHOICES]
+
+# Grids only change when an admin edits the timetable, so they are kept until
+# a version bump retires them rather than on a short timeout
+TIMETABLE_CACHE_TIMEOUT = 24 * 60 * 60
+
+# Version scopes: one per batch for TimeTable rows, 'batches' for the batch
+# list and 'all' for Subject/Teacher edits, which can show up in any batch
+
+
+def timetable_cache_key(name, scopes):
+    """Cache key for ``name`` that changes whenever any of ``scopes`` is invalidated"""
+    return f'timetable:{name}:{versions("timetable", scopes)}'
+
+
+def invalidate_timetables(*scopes):
+    """Retire cached grids for the given scopes once the current transaction commits"""
+    bump('timetable', *[scope for scope in scopes if scope])
+
+
+def build_batch_grid(batch):
+    """{day: {period: TimeTable or None}} for ``batch``, from a single query"""
+    grid = {day: dict.fromkeys(TIMETABLE_PERIODS) for day in TIMETABLE_DAYS}
+    entries = TimeTable.objects.filter(batch=batch).select_related('subject__teacher__user')
+    for entry in entries:
+        if entry.day in grid:
+            grid[entry.day][entry.period] = entry
+    return grid
+
+
+def batch_grid(batch):
+    key = timetable_cache_key(f'grid:{quote(batch)}', ['all', f'batch:{batch}'])
+    grid = cache.get(key)
+    if grid is None:
+        grid = build_batch_grid(batch)
+        cache.set(key, grid, TIMETABLE_CACHE_TIMEOUT)
+    return grid
+
+
+def timetable_batches():
+    """Batches that have at least one timetable entry"""
+    key = timetable_cache_key('batches', ['batches'])
+    batches = cache.get(key)
+    if batches is None:
+        batches = list(TimeTable.objects.order_by('batch').values_list('batch', flat=True).distinct())
+        cache.set(key, batches, TIMETABLE_CACHE_TIMEOUT)
+    return batches
+
+
+# Schedule index: every TimeTable row, grouped by teacher, room and batch.
+# Entries are plain dicts so the same structure renders in templates and JSON.
+
+DAY_ORDER = {day: index for index, day in enumerate(TIMETABLE_DAYS)}
+PERIOD_ORDER = {period: index for index, period in enumerate(TIMETABLE_PERIODS)}
+
+
+def _schedule_entry(row):
+    subject = row.subject
+    teacher = subject.teacher if subject else None
+    return {
+        'day': row.day,
+        'period': row.period,
+        'batch': row.batch,
+        'room': row.room,
+        'subject_id': subject.id if subject else None,
+        'subject_name': subject.name if subject else '',
+        'subject_code': subject.code if subject else '',
+        'teacher_id': teacher.id if teacher else None,
+        'teacher_name': teacher.user.get_full_name() if teacher else '',
+    }
+
+
+def build_schedule_index():
+    """{'teacher': {id: [...]}, 'room': {name: [...]}, 'batch': {name: [...]}} from one query"""
+    index = {'teacher': {}, 'room': {}, 'batch': {}}
+    rows = TimeTable.objects.filter(subject__isnull=False).select_related('subject__teacher__user')
+    entries = sorted(
+        (_schedule_entry(row) for row in rows),
+        key=lambda entry: (DAY_ORDER.get(entry['day'], 99), PERIOD_ORDER.get(entry['period'], 99)),
+    )
+    for entry in entries:
+        if entry['teacher_id']:
+            index['teacher'].setdefault(entry['teacher_id'], []).append(entry)
+        if entry['room']:
+            index['room'].setdefault(entry['room'], []).append(entry)
+        index['batch'].setdefault(entry['batch'], []).append(entry)
+    return index
+
+
+def schedule_index():
+    # Any TimeTable edit bumps 'batches' and any Subject/Teacher edit bumps 'all'
+    key = timetable_cache_key('index', ['all', 'batches'])
+    index = cache.get(key)
+    if index is None:
+        index = build_schedule_index()
+        cache.set(key, index, TIMETABLE_CACHE_TIMEOUT)
+    return index
+
+
+def week_grid(entries):
+    """{day: {period: [entries]}}; a cell holds a list so clashes stay visible"""
+    grid = {day: {period: [] for period in TIMETABLE_PERIODS} for day in TIMETABLE_DAYS}
+    for entry in entries:
+        if entry['day'] in grid and entry['period'] in grid[entry['day']]:
+            grid[entry['day']][entry['period']].append(entry)
+    return grid
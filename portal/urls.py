@@ -10,12 +10,21 @@ urlpatterns = [
     
     path('assignments/', views.assignments, name='assignments'),
     path('assignments/<int:assignment_id>/submissions/', views.assignment_submissions, name='assignment_submissions'),
+    path('assignments/<int:assignment_id>/submissions/download/', views.download_submissions_zip, name='download_submissions_zip'),
+    path('assignments/<int:assignment_id>/submissions/import-grades/', views.import_grades, name='import_grades'),
+    path('assignments/<int:assignment_id>/submissions/similarity/', views.check_similarity, name='check_similarity'),
     path('dashboard/', views.dashboard, name='dashboard'),
     path('profile/', views.profile, name='profile'),
     path('timetable/', views.timetable, name='timetable'),
+    path('timetable/my-week/', views.my_week, name='my_week'),
+    path('timetable/rooms/', views.room_occupancy, name='room_occupancy'),
+    path('timetable/feed/batch/<str:batch>.ics', views.batch_calendar_feed, name='batch_calendar_feed'),
+    path('timetable/feed/teacher/<int:teacher_id>.ics', views.teacher_calendar_feed, name='teacher_calendar_feed'),
     path('attendance/', views.attendance, name='attendance'),
+    path('attendance/shortfall/', views.attendance_shortfall_report, name='attendance_shortfall_report'),
     path('api/students-by-subject/', views.get_students_by_subject, name='get_students_by_subject'),
     path('doubt_clearance/', views.doubt_clearance, name='doubt_clearance'),
+    path('api/doubts/similar/', views.similar_doubts_api, name='similar_doubts_api'),
     path('materials/', views.materials, name='materials'),
     path('materials/delete/<int:material_id>/', views.delete_material, name='delete_material'),
     path('hall_ticket/', views.hall_ticket, name='hall_ticket'),
@@ -28,4 +37,15 @@ urlpatterns = [
     # AJAX endpoints
     path('api/notifications/', views.get_notifications, name='api_notifications'),
     path('api/students-by-subject/', views.get_students_by_subject, name='api_students_by_subject'),
+    path('api/attendance/sync/', views.attendance_sync, name='api_attendance_sync'),
+    path('api/attendance/calendar/', views.attendance_calendar_api, name='api_attendance_calendar'),
+    path('api/dashboard/cache-stats/', views.dashboard_cache_stats_api, name='api_dashboard_cache_stats'),
+    path('api/schedule/', views.schedule_api, name='api_schedule'),
+    path('api/assignments/stats/', views.assignment_stats_api, name='api_assignment_stats'),
+    path('api/assignments/<int:assignment_id>/grades/', views.grade_submissions_api, name='api_grade_submissions'),
+    path('api/uploads/', views.upload_start, name='api_upload_start'),
+    path('api/uploads/<uuid:upload_id>/', views.upload_detail, name='api_upload_detail'),
+    path('api/uploads/<uuid:upload_id>/chunk/', views.upload_chunk, name='api_upload_chunk'),
+    path('api/uploads/<uuid:upload_id>/finalize/', views.upload_finalize, name='api_upload_finalize'),
+    path('sw.js', views.service_worker, name='service_worker'),
 ]
\ No newline at end of file
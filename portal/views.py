@@ -2,12 +2,16 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import login, authenticate, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse, HttpResponse
-from django.db.models import Q, Avg, Count
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse
+from django.db.models import Q, Avg, Count, Prefetch
 from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import urlencode
 from django.core.paginator import Paginator
 from django.contrib.auth.views import PasswordChangeView
-from django.urls import reverse_lazy
+from django.urls import reverse, reverse_lazy
+from django.contrib.staticfiles import finders
+from django.core.exceptions import ValidationError
 from datetime import datetime, date, timedelta
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.units import inch
@@ -20,6 +24,30 @@ import os
 import json
 from .models import *
 from .forms import *
+from .attendance_engine import MAX_SYNC_SHEETS, bulk_mark_attendance, parse_present, sync_attendance_sheets
+from .archival import recent_attendance_history
+from .bitsets import term_history
+from .assignment_queries import (
+    ASSIGNMENT_STATUSES, pending_students, student_assignments, submission_stats, teacher_assignments_with_stats,
+    with_submission_stats
+)
+from .chunked_uploads import CHUNK_SIZE, append_chunk, cancel_upload, finalize_upload, start_upload
+from .dashboard_cache import dashboard_cache_stats, dashboard_snapshot, reset_dashboard_cache_stats
+from .doubt_inbox import inbox_page, unresolved_count
+from .doubt_search import search_doubts, similar_doubts
+from .exam_scheduler import student_exam_schedule
+from .materials_catalogue import catalogue_etag, semester_catalogue
+from .grading import describe_grade_errors, grade_submissions, import_grades_csv
+from .similarity import similarity_report
+from .submission_archive import archive_filename, stream_submissions_zip
+from .calendar_feeds import calendar_feed, feed_token, user_from_token
+from .timetables import (
+    TIMETABLE_DAYS, TIMETABLE_PERIODS, batch_grid, schedule_index, timetable_batches, week_grid
+)
+from .reports import (
+    ATTENDANCE_THRESHOLD, MAX_CALENDAR_DAYS, attendance_calendar, attendance_shortfall,
+    shortfall_csv_rows, shortfall_xlsx,
+)
 
 def login_view(request):
     if request.method == 'POST':
@@ -66,69 +94,29 @@ def dashboard(request):
         'current_time': timezone.now(),
     }
     
+    snapshot = dashboard_snapshot(request.user)
+    
     if hasattr(request.user, 'student'):
         # Student dashboard
         student = request.user.student
+        # The snapshot may be a few minutes old; drop anything that has since fallen due
+        now = timezone.now()
+        pending_assignments = [a for a in snapshot['pending_assignments'] if a.due_date >= now]
         
-        # Get attendance summary
-        attendance_records = Attendance.objects.filter(student=student)
-        total_classes = attendance_records.count()
-        present_classes = Attendance.objects.filter(student=student, is_present=True).count()
-        attendance_percentage = (present_classes / total_classes * 100) if total_classes > 0 else 0
-        
-        # Get pending assignments
-        pending_assignments = Assignment.objects.filter(
-            subject__semester=student.semester,
-            due_date__gte=timezone.now()
-        ).exclude(submissions__student=student)
-        
-        # Get unresolved doubts
-        unresolved_doubts = Doubt.objects.filter(student=student, is_resolved=False).count()
-        
-        # Get recent materials
-        recent_materials = Material.objects.filter(
-            subject__semester=student.semester,
-            is_active=True
-        ).order_by('-uploaded_at')[:5]
-        
-        # Get recent results
-        recent_results = ExamResult.objects.filter(student=student).order_by('-published_at')[:3]
-        
+        context.update(snapshot)
         context.update({
             'is_student': True,
             'student': student,
-            'attendance_percentage': round(attendance_percentage, 1),
             'pending_assignments': pending_assignments,
-            'pending_assignments_count': pending_assignments.count(),
-            'unresolved_doubts': unresolved_doubts,
-            'recent_materials': recent_materials,
-            'recent_results': recent_results,
+            'pending_assignments_count': len(pending_assignments),
         })
         
     elif hasattr(request.user, 'teacher'):
         # Teacher dashboard
-        teacher = request.user.teacher
-        subjects = Subject.objects.filter(teacher=teacher)
-        
-        # Get pending doubts
-        pending_doubts = Doubt.objects.filter(subject__teacher=teacher, is_resolved=False).count()
-        
-        # Get recent assignments
-        recent_assignments = Assignment.objects.filter(teacher=teacher).order_by('-created_at')[:5]
-        
-        # Get recent submissions
-        recent_submissions = AssignmentSubmission.objects.filter(
-            assignment__teacher=teacher
-        ).order_by('-submitted_at')[:5]
-        
+        context.update(snapshot)
         context.update({
             'is_teacher': True,
-            'teacher': teacher,
-            'subjects': subjects,
-            'subjects_count': subjects.count(),
-            'pending_doubts': pending_doubts,
-            'recent_assignments': recent_assignments,
-            'recent_submissions': recent_submissions,
+            'teacher': request.user.teacher,
         })
     
     return render(request, 'dashboard.html', context)
@@ -178,25 +166,20 @@ def timetable(request):
     else:
         batch = request.GET.get('batch', 'Batch 4')
     
-    # Get timetable data for the specific batch
-    timetable_entries = TimeTable.objects.filter(batch=batch).select_related('subject')
-    
-    # Organize timetable data
-    days = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday']
-    periods = ['Period 1', 'Period 2', 'Break', 'Period 3', 'Period 4', 'Period 5', 'Lunch Break']
-    
-    timetable = {}
-    for day in days:
-        timetable[day] = {}
-        for period in periods:
-            try:
-                entry = timetable_entries.get(day=day, period=period)
-                timetable[day][period] = entry
-            except TimeTable.DoesNotExist:
-                timetable[day][period] = None
+    # The whole week comes from the per-batch cache, rebuilt in one query after an edit
+    timetable = batch_grid(batch)
+    days = TIMETABLE_DAYS
+    periods = TIMETABLE_PERIODS
     
     # Get available batches for filter
-    available_batches = TimeTable.objects.values_list('batch', flat=True).distinct()
+    available_batches = timetable_batches()
+    
+    # Subscribable feed: the student's batch, or the teacher's own week
+    if hasattr(request.user, 'teacher'):
+        feed_path = reverse('teacher_calendar_feed', args=[request.user.teacher.id])
+    else:
+        feed_path = reverse('batch_calendar_feed', args=[batch])
+    feed_url = request.build_absolute_uri(feed_path) + '?' + urlencode({'token': feed_token(request.user)})
     
     context = {
         'timetable': timetable,
@@ -205,37 +188,106 @@ def timetable(request):
         'current_batch': batch,
         'available_batches': available_batches,
         'is_student': hasattr(request.user, 'student'),
+        'feed_url': feed_url,
     }
     
     return render(request, 'timetable.html', context)
 
+@login_required
+def my_week(request):
+    """A teacher's classes across every batch, from the schedule index"""
+    if not hasattr(request.user, 'teacher'):
+        messages.error(request, 'Access denied. Only teachers can access this page.')
+        return redirect('dashboard')
+    
+    teacher = request.user.teacher
+    entries = schedule_index()['teacher'].get(teacher.id, [])
+    
+    context = {
+        'title': 'My Week',
+        'subtitle': f'{len(entries)} classes across all batches',
+        'grid': week_grid(entries),
+        'days': TIMETABLE_DAYS,
+        'periods': TIMETABLE_PERIODS,
+        'show_batch': True,
+    }
+    return render(request, 'schedule.html', context)
+
+@login_required
+def room_occupancy(request):
+    """Which batch and subject holds a room in each period, from the schedule index"""
+    rooms_index = schedule_index()['room']
+    rooms = sorted(rooms_index)
+    room = request.GET.get('room') or (rooms[0] if rooms else '')
+    entries = rooms_index.get(room, [])
+    
+    context = {
+        'title': 'Room Occupancy',
+        'subtitle': f'{room} - {len(entries)} classes per week' if room else 'No rooms scheduled',
+        'grid': week_grid(entries),
+        'days': TIMETABLE_DAYS,
+        'periods': TIMETABLE_PERIODS,
+        'rooms': rooms,
+        'current_room': room,
+        'show_batch': True,
+    }
+    return render(request, 'schedule.html', context)
+
+def _calendar_feed_response(request, kind, key):
+    # Calendar apps have no session, so accept the signed token from the feed URL
+    user = request.user if request.user.is_authenticated else user_from_token(request.GET.get('token', ''))
+    if user is None:
+        return HttpResponse('Invalid or missing feed token', status=403, content_type='text/plain')
+    if hasattr(user, 'student') and (kind != 'batch' or key != user.student.batch):
+        return HttpResponse('Access denied', status=403, content_type='text/plain')
+    
+    body, etag = calendar_feed(kind, key)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(body, content_type='text/calendar; charset=utf-8')
+        response['Content-Disposition'] = 'inline; filename="timetable.ics"'
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, max_age=15 * 60)
+    return response
+
+def batch_calendar_feed(request, batch):
+    """iCalendar feed of a batch timetable"""
+    return _calendar_feed_response(request, 'batch', batch)
+
+def teacher_calendar_feed(request, teacher_id):
+    """iCalendar feed of one teacher's classes across every batch"""
+    return _calendar_feed_response(request, 'teacher', teacher_id)
+
 @login_required
 def attendance(request):
     if hasattr(request.user, 'student'):
         # Student attendance view
         student = request.user.student
         subjects = Subject.objects.filter(semester=student.semester)
+        summaries = {
+            summary.subject_id: summary
+            for summary in AttendanceSummary.objects.filter(student=student)
+        }
         
         attendance_data = []
         for subject in subjects:
-            total = Attendance.objects.filter(student=student, subject=subject).count()
-            present = Attendance.objects.filter(student=student, subject=subject, is_present=True).count()
-            percentage = (present / total * 100) if total > 0 else 0
-            
+            summary = summaries.get(subject.id)
             attendance_data.append({
                 'subject': subject,
-                'total': total,
-                'present': present,
-                'percentage': round(percentage, 1)
+                'total': summary.total if summary else 0,
+                'present': summary.present if summary else 0,
+                'percentage': summary.percentage if summary else 0,
             })
         
-        # Get recent attendance records
-        recent_attendance = Attendance.objects.filter(student=student).order_by('-date', '-period')[:20]
+        # Get recent attendance records, reaching into archived terms if needed
+        recent_attendance = recent_attendance_history(student)
         
         context = {
             'is_student': True,
             'attendance_data': attendance_data,
             'recent_attendance': recent_attendance,
+            # Past terms, from the bitmaps build_attendance_bitmaps keeps
+            'term_history': term_history(student),
         }
         
     else:
@@ -252,27 +304,25 @@ def attendance(request):
                 subject = form.cleaned_data['subject']
                 period = form.cleaned_data['period']
                 
-                # Get all students for the semester - ORDERED BY REGISTRATION NUMBER
-                students = Student.objects.filter(semester=subject.semester).order_by('registration_number')
-                
-                for student in students:
-                    # CHANGED: Use registration_number instead of campus_id
-                    checkbox_name = f"student{student.id}"
-                    is_present = checkbox_name in request.POST
-                    
-                    # Update or create attendance record
-                    Attendance.objects.update_or_create(
-                        student=student,
-                        subject=subject,
-                        date=date,
-                        period=period,
-                        defaults={
-                            'is_present': is_present,
-                            'marked_by': teacher
-                        }
-                    )
-                
-                messages.success(request, f'Attendance marked successfully for {subject.name} on {date}')
+                # Get all students for the semester
+                student_ids = Student.objects.filter(semester=subject.semester).values_list('id', flat=True)
+                marks = {
+                    student_id: f"student{student_id}" in request.POST
+                    for student_id in student_ids
+                }
+
+                # Write the whole sheet in one transaction
+                try:
+                    result = bulk_mark_attendance(subject, date, period, marks, teacher)
+                except ValidationError as e:
+                    messages.error(request, e.messages[0])
+                    return redirect('attendance')
+
+                messages.success(
+                    request,
+                    f'Attendance marked successfully for {subject.name} on {date} '
+                    f'({result["created"]} new, {result["updated"]} updated, {result["unchanged"]} unchanged)'
+                )
                 return redirect('attendance')
         else:
             form = AttendanceForm()
@@ -298,25 +348,66 @@ def attendance(request):
     
     return render(request, 'attendance.html', context)
 
+@login_required
+def attendance_shortfall_report(request):
+    """Teacher report of students below the attendance threshold, with CSV/XLSX export"""
+    if not hasattr(request.user, 'teacher'):
+        messages.error(request, 'Access denied.')
+        return redirect('dashboard')
+    
+    teacher = request.user.teacher
+    semesters = sorted(set(Subject.objects.filter(teacher=teacher).values_list('semester', flat=True)))
+    
+    try:
+        semester = int(request.GET.get('semester') or (semesters[0] if semesters else 0))
+    except ValueError:
+        semester = 0
+    batch = request.GET.get('batch', '')
+    
+    if semester not in semesters:
+        messages.error(request, 'Please choose one of the semesters you teach.')
+        return redirect('attendance')
+    
+    report = attendance_shortfall(semester, batch=batch or None)
+    filename = f"attendance_shortfall_sem{semester}{'_' + batch.replace(' ', '') if batch else ''}"
+    export = request.GET.get('export')
+    
+    if export == 'csv':
+        response = StreamingHttpResponse(shortfall_csv_rows(report), content_type='text/csv')
+        response['Content-Disposition'] = f'attachment; filename="{filename}.csv"'
+        return response
+    
+    if export == 'xlsx':
+        response = HttpResponse(
+            shortfall_xlsx(report),
+            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        )
+        response['Content-Disposition'] = f'attachment; filename="{filename}.xlsx"'
+        return response
+    
+    context = {
+        'is_teacher': True,
+        'rows': report.to_dict('records'),
+        'semesters': semesters,
+        'batches': [choice[0] for choice in Student.BATCH_CHOICES],
+        'current_semester': semester,
+        'current_batch': batch,
+        'threshold': ATTENDANCE_THRESHOLD,
+    }
+    
+    return render(request, 'attendance_report.html', context)
+
 @login_required
 def assignments(request):
     if hasattr(request.user, 'student'):
         # Student assignments view
         student = request.user.student
-        assignments = Assignment.objects.filter(
-            subject__semester=student.semester
-        ).order_by('-due_date')
+        status = request.GET.get('status')
+        if status not in ASSIGNMENT_STATUSES:
+            status = None
         
-        # Check submission status for each assignment
-        for assignment in assignments:
-            try:
-                assignment.submission = AssignmentSubmission.objects.get(
-                    assignment=assignment, student=student
-                )
-                assignment.is_submitted = True
-            except AssignmentSubmission.DoesNotExist:
-                assignment.is_submitted = False
-                assignment.submission = None
+        # One query per page, with the student's own submission joined in
+        assignments, next_cursor = student_assignments(student, status, request.GET.get('after'))
         
         if request.method == 'POST':
             assignment_id = request.POST.get('assignment_id')
@@ -341,6 +432,10 @@ def assignments(request):
         context = {
             'is_student': True,
             'assignments': assignments,
+            'status': status,
+            'statuses': ASSIGNMENT_STATUSES,
+            'next_cursor': next_cursor,
+            'is_first_page': not request.GET.get('after'),
         }
         
     else:
@@ -361,17 +456,8 @@ def assignments(request):
             form = AssignmentForm()
             form.fields['subject'].queryset = Subject.objects.filter(teacher=teacher)
         
-        assignments = Assignment.objects.filter(teacher=teacher).order_by('-created_at')
-        
-        # Get submission statistics
-        for assignment in assignments:
-            total_students = Student.objects.filter(semester=assignment.subject.semester).count()
-            submitted_count = assignment.submissions.count()
-            assignment.submission_stats = {
-                'total': total_students,
-                'submitted': submitted_count,
-                'pending': total_students - submitted_count
-            }
+        # Submission counts come from one grouped query, student totals from the cache
+        assignments = teacher_assignments_with_stats(teacher)
         
         context = {
             'is_teacher': True,
@@ -401,7 +487,9 @@ def doubt_clearance(request):
             form = DoubtForm()
             form.fields['subject'].queryset = Subject.objects.filter(semester=student.semester)
         
-        doubts = Doubt.objects.filter(student=student).order_by('-asked_at')
+        doubts = Doubt.objects.filter(student=student).select_related('subject').prefetch_related(
+            Prefetch('replies', queryset=DoubtReply.objects.select_related('teacher__user').order_by('replied_at'))
+        ).order_by('-asked_at')
         
         context = {
             'is_student': True,
@@ -424,42 +512,75 @@ def doubt_clearance(request):
                 reply.teacher = teacher
                 reply.save()
                 messages.success(request, 'Reply posted successfully!')
-                return redirect('doubt_clearance')
-        
-        doubts = Doubt.objects.filter(subject__teacher=teacher).order_by('is_resolved', '-asked_at')
+                # Back to the same inbox page or search results
+                return redirect(request.get_full_path())
+        
+        teacher_doubts = Doubt.objects.filter(subject__teacher=teacher)
+        search_form = SearchForm(request.GET)
+        query = search_form.cleaned_data['query'].strip() if search_form.is_valid() else ''
+        results = inbox = None
+        if query:
+            results = search_doubts(query, teacher_doubts, request.GET.get('page'))
+            doubts = results.object_list
+        else:
+            inbox = inbox_page(teacher, request.GET.get('after'))
+            doubts = inbox['doubts']
+
+        total = teacher_doubts.count()
+        pending = unresolved_count(teacher)
         
         context = {
             'is_teacher': True,
             'doubts': doubts,
+            'search_form': search_form,
+            'query': query,
+            'results': results,
+            'inbox': inbox,
+            'doubt_stats': {'total': total, 'pending': pending, 'resolved': total - pending},
         }
     
     return render(request, 'doubt_clearance.html', context)
 
+@login_required
+def similar_doubts_api(request):
+    """Earlier doubts from the student's semester that look like the one being typed"""
+    if not hasattr(request.user, 'student'):
+        return JsonResponse({'error': 'Only students can look up similar doubts'}, status=403)
+
+    scope = Doubt.objects.filter(subject__semester=request.user.student.semester)
+    subject_id = request.GET.get('subject')
+    if subject_id and subject_id.isdigit():
+        scope = scope.filter(subject_id=subject_id)
+
+    suggestions = []
+    for doubt in similar_doubts(request.GET.get('q', '')[:500], scope):
+        replies = list(doubt.replies.all())
+        suggestions.append({
+            'id': doubt.id,
+            'title': doubt.title,
+            'question': doubt.question[:200],
+            'subject': doubt.subject.name,
+            'is_resolved': doubt.is_resolved,
+            'reply': replies[-1].reply[:300] if replies else None,
+        })
+    return JsonResponse({'suggestions': suggestions})
+
 @login_required
 def materials(request):
     if hasattr(request.user, 'student'):
         # Student materials view
         student = request.user.student
+        sections, digest = semester_catalogue(student.semester)
+        etag = catalogue_etag(digest, request.user)
 
-        print("""student semester: {student.semester}""")
-        materials = Material.objects.filter(
-            subject__semester=student.semester,
-            is_active=True
-        ).order_by('-uploaded_at')
-        
-        # Group materials by type
-        notes = materials.filter(material_type='notes')
-        question_banks = materials.filter(material_type='question_bank')
-        references = materials.filter(material_type='reference')
-        slides = materials.filter(material_type='slides')
-        
-        context = {
-            'is_student': True,
-            'notes': notes,
-            'question_banks': question_banks,
-            'references': references,
-            'slides': slides,
-        }
+        # A queued flash message still has to be shown, so only answer 304 without one
+        response = None if len(messages.get_messages(request)) else get_conditional_response(request, etag=etag)
+        if response is None:
+            response = render(request, 'materials.html', {'is_student': True, **sections})
+        response['ETag'] = etag
+        # Revalidate on every visit; unchanged catalogues cost a 304
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
         
     else:
         # Teacher materials management
@@ -479,7 +600,7 @@ def materials(request):
             form = MaterialForm()
             form.fields['subject'].queryset = Subject.objects.filter(teacher=teacher)
         
-        materials = Material.objects.filter(teacher=teacher).order_by('-uploaded_at')
+        materials = Material.objects.filter(teacher=teacher).select_related('subject').order_by('-uploaded_at')
         
         context = {
             'is_teacher': True,
@@ -499,10 +620,7 @@ def delete_material(request, material_id):
         material = Material.objects.get(id=material_id, teacher=request.user.teacher)
         material_title = material.title
         
-        # Delete the file from storage if it exists
-        if material.file:
-            material.file.delete(save=False)
-        
+        # Deleting the row releases its file; the blob goes with its last reference
         material.delete()
         
         if request.headers.get('Content-Type') == 'application/json':
@@ -591,6 +709,30 @@ def manage_hall_tickets(request):
     
     return render(request, 'manage_hall_tickets.html', context)
 
+def _hall_ticket_papers(student, exam_type):
+    """Hall ticket table rows: the scheduled papers, or the semester's subjects before scheduling"""
+    schedule = list(student_exam_schedule(student, exam_type))
+    if schedule:
+        table_data = [['Paper Code', 'Subject/Paper Name', 'Date & Session', 'Room', 'Invigilator Sign']]
+        for paper in schedule:
+            table_data.append([
+                paper.subject.code,
+                f"{paper.subject.name} - [Theory]",
+                f"{paper.date.strftime('%d-%m-%Y')} {paper.session}",
+                paper.rooms,
+                '.'
+            ])
+        return table_data, [1*inch, 2.6*inch, 1.3*inch, 1*inch, 1.1*inch]
+    
+    table_data = [['Paper Code', 'Subject/Paper Name', 'Invigilator Sign']]
+    for subject in Subject.objects.filter(semester=student.semester).order_by('code'):
+        table_data.append([
+            subject.code,
+            f"{subject.name} - [Theory]",
+            '.'
+        ])
+    return table_data, [1.5*inch, 4*inch, 1.5*inch]
+
 @login_required
 def download_hall_ticket(request, request_id):
     """Generate and download hall ticket PDF for approved requests"""
@@ -665,23 +807,10 @@ def download_hall_ticket(request, request_id):
     y_position -= 40
     
     # Subjects Table
-    # Get subjects for the student's semester
-    subjects = Subject.objects.filter(semester=student.semester).order_by('code')
-    
-    # Create table data
-    table_data = [
-        ['Paper Code', 'Subject/Paper Name', 'Invigilator Sign']
-    ]
-    
-    for subject in subjects:
-        table_data.append([
-            subject.code,
-            f"{subject.name} - [Theory]",
-            '.'
-        ])
+    table_data, col_widths = _hall_ticket_papers(student, ticket_request.exam_type)
     
     # Create the table
-    table = Table(table_data, colWidths=[1.5*inch, 4*inch, 1.5*inch])
+    table = Table(table_data, colWidths=col_widths)
     table.setStyle(TableStyle([
         # Header styling
         ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
@@ -804,22 +933,10 @@ def generate_hall_ticket_bulk(request, request_id):
     y_position -= 40
     
     # Subjects Table
-    subjects = Subject.objects.filter(semester=student.semester).order_by('code')
-    
-    # Create table data
-    table_data = [
-        ['Paper Code', 'Subject/Paper Name', 'Invigilator Sign']
-    ]
-    
-    for subject in subjects:
-        table_data.append([
-            subject.code,
-            f"{subject.name} - [Theory]",
-            '.'
-        ])
+    table_data, col_widths = _hall_ticket_papers(student, ticket_request.exam_type)
     
     # Create the table
-    table = Table(table_data, colWidths=[1.5*inch, 4*inch, 1.5*inch])
+    table = Table(table_data, colWidths=col_widths)
     table.setStyle(TableStyle([
         ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
         ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
@@ -1047,7 +1164,19 @@ def get_students_by_subject(request):
     try:
         subject = Subject.objects.get(id=subject_id, teacher=request.user.teacher)
         # CHANGED: Order by registration_number instead of campus_id
-        students = Student.objects.filter(semester=subject.semester).order_by('registration_number')
+        students = Student.objects.filter(semester=subject.semester).select_related('user').order_by('registration_number')
+        
+        # Current marks for the sheet, so the client can send only what changed
+        marked = {}
+        date = request.GET.get('date')
+        period = request.GET.get('period')
+        if date and period:
+            try:
+                marked = dict(Attendance.objects.filter(
+                    subject=subject, date=date, period=period
+                ).values_list('student_id', 'is_present'))
+            except ValidationError:
+                marked = {}
         
         students_data = []
         for student in students:
@@ -1056,6 +1185,7 @@ def get_students_by_subject(request):
                 'campus_id': student.campus_id,
                 'registration_number': student.registration_number,
                 'name': student.user.get_full_name(),
+                'is_present': marked.get(student.id),
             })
         
         return JsonResponse({'students': students_data})
@@ -1063,6 +1193,75 @@ def get_students_by_subject(request):
     except Subject.DoesNotExist:
         return JsonResponse({'error': 'Subject not found'}, status=404)
     
+@login_required
+def attendance_calendar_api(request):
+    """Per-day attendance over a date range as columnar JSON, for the heatmap"""
+    form = DateRangeForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({'error': 'Invalid date range'}, status=400)
+    
+    end = form.cleaned_data['end_date'] or timezone.localdate()
+    start = form.cleaned_data['start_date'] or end - timedelta(days=182)
+    if start > end or (end - start).days > MAX_CALENDAR_DAYS:
+        return JsonResponse({'error': f'Date range must be at most {MAX_CALENDAR_DAYS} days'}, status=400)
+    
+    if hasattr(request.user, 'student'):
+        data = attendance_calendar(start, end, student=request.user.student)
+        total = data.pop('total')
+        data['absent'] = [day_total - present for day_total, present in zip(total, data['present'])]
+    
+    elif hasattr(request.user, 'teacher'):
+        try:
+            subject = Subject.objects.get(id=request.GET.get('subject'), teacher=request.user.teacher)
+        except (Subject.DoesNotExist, ValueError):
+            return JsonResponse({'error': 'Subject not found'}, status=404)
+        data = attendance_calendar(start, end, subject=subject)
+        data['average'] = [
+            round(present / day_total * 100, 1) if day_total else 0
+            for present, day_total in zip(data['present'], data['total'])
+        ]
+    
+    else:
+        return JsonResponse({'error': 'Access denied'}, status=403)
+    
+    return JsonResponse({'start': start.isoformat(), 'end': end.isoformat(), **data})
+
+@login_required
+def attendance_sync(request):
+    """Apply a batch of attendance sheets queued offline by the service worker"""
+    if request.method != 'POST':
+        return JsonResponse({'error': 'POST required'}, status=405)
+    
+    if not hasattr(request.user, 'teacher'):
+        return JsonResponse({'error': 'Access denied'}, status=403)
+    
+    try:
+        sheets = json.loads(request.body)['sheets']
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({'error': 'Invalid request'}, status=400)
+    
+    if not isinstance(sheets, list) or not all(isinstance(sheet, dict) for sheet in sheets):
+        return JsonResponse({'error': 'Invalid request'}, status=400)
+    
+    if len(sheets) > MAX_SYNC_SHEETS:
+        return JsonResponse({'error': f'At most {MAX_SYNC_SHEETS} sheets per request'}, status=400)
+    
+    for sheet in sheets:
+        marks = sheet.get('marks')
+        if isinstance(marks, dict) and any(parse_present(value) is None for value in marks.values()):
+            return JsonResponse({'error': 'Marks must be true or false'}, status=400)
+    
+    results = sync_attendance_sheets(request.user.teacher, sheets)
+    return JsonResponse({'results': results})
+
+def service_worker(request):
+    """Serve the service worker from the site root so its scope covers every page"""
+    path = finders.find('js/sw.js')
+    with open(path, 'rb') as f:
+        response = HttpResponse(f.read(), content_type='application/javascript')
+    response['Cache-Control'] = 'no-cache'
+    return response
+
 @login_required
 def assignment_submissions(request, assignment_id):
     """View assignment submissions for teachers"""
@@ -1070,34 +1269,40 @@ def assignment_submissions(request, assignment_id):
         messages.error(request, 'Access denied.')
         return redirect('dashboard')
     
-    assignment = get_object_or_404(Assignment, id=assignment_id, teacher=request.user.teacher)
-    submissions = AssignmentSubmission.objects.filter(assignment=assignment).order_by('-submitted_at')
-    
-    # Get all students for this semester to show who hasn't submitted
-    all_students = Student.objects.filter(semester=assignment.subject.semester)
-    submitted_students = submissions.values_list('student_id', flat=True)
-    pending_students = all_students.exclude(id__in=submitted_students)
+    assignment = get_object_or_404(
+        with_submission_stats(Assignment.objects.filter(teacher=request.user.teacher)), id=assignment_id
+    )
+    stats = submission_stats(assignment)
+    submissions = (
+        AssignmentSubmission.objects.filter(assignment=assignment)
+        .select_related('student__user')
+        .order_by('-submitted_at')
+    )
     
     if request.method == 'POST':
         # Handle grading
-        submission_id = request.POST.get('submission_id')
-        marks = request.POST.get('marks')
-        feedback = request.POST.get('feedback')
-        
-        submission = get_object_or_404(AssignmentSubmission, id=submission_id)
-        submission.marks = marks
-        submission.feedback = feedback
-        submission.save()
-        
-        messages.success(request, 'Submission graded successfully!')
+        _, errors = grade_submissions(assignment, [{
+            'submission': request.POST.get('submission_id'),
+            'marks': request.POST.get('marks'),
+            'feedback': request.POST.get('feedback', ''),
+            'label': None,
+        }])
+        
+        if errors:
+            messages.error(request, f'Could not save the grade: {describe_grade_errors(errors)}')
+        else:
+            messages.success(request, 'Submission graded successfully!')
         return redirect('assignment_submissions', assignment_id=assignment_id)
     
     context = {
         'assignment': assignment,
         'submissions': submissions,
-        'pending_students': pending_students,
-        'total_students': all_students.count(),
-        'submitted_count': submissions.count(),
+        'pending_students': pending_students(assignment),
+        'total_students': stats['total'],
+        'submitted_count': stats['submitted'],
+        'stats': stats,
+        # Cached signatures only; building new ones is check_similarity's job
+        'similarity': similarity_report(submissions),
     }
     
     return render(request, 'assignment_submissions.html', context)
@@ -1116,4 +1321,240 @@ def handler404(request, exception):
     return render(request, '404.html', status=404)
 
 def handler500(request):
-    return render(request, '500.html', status=500)
\ No newline at end of file
+    return render(request, '500.html', status=500)
+
+@login_required
+def dashboard_cache_stats_api(request):
+    """Dashboard snapshot hit/miss counters, for sizing the cache (staff only)"""
+    if not request.user.is_staff:
+        return JsonResponse({'error': 'Access denied'}, status=403)
+    
+    stats = dashboard_cache_stats()
+    if request.method == 'POST' and request.POST.get('reset'):
+        reset_dashboard_cache_stats()
+    return JsonResponse(stats)
+
+@login_required
+def schedule_api(request):
+    """Weekly schedule for ?teacher=<id>, ?room=<name> or ?batch=<name>.
+
+    Defaults to the requesting teacher's own week or the student's batch.
+    """
+    index = schedule_index()
+    if request.GET.get('teacher'):
+        try:
+            kind, key = 'teacher', int(request.GET['teacher'])
+        except ValueError:
+            return JsonResponse({'error': 'Invalid teacher'}, status=400)
+    elif request.GET.get('room'):
+        kind, key = 'room', request.GET['room']
+    elif request.GET.get('batch'):
+        kind, key = 'batch', request.GET['batch']
+    elif hasattr(request.user, 'teacher'):
+        kind, key = 'teacher', request.user.teacher.id
+    elif hasattr(request.user, 'student'):
+        kind, key = 'batch', request.user.student.batch
+    else:
+        return JsonResponse({'error': 'Pass teacher, room or batch'}, status=400)
+    
+    return JsonResponse({
+        kind: key,
+        'days': TIMETABLE_DAYS,
+        'periods': TIMETABLE_PERIODS,
+        'entries': index[kind].get(key, []),
+    })
+
+@login_required
+def download_submissions_zip(request, assignment_id):
+    """Stream every answer file of an assignment as one ZIP, with a CSV manifest"""
+    if not hasattr(request.user, 'teacher'):
+        messages.error(request, 'Access denied.')
+        return redirect('dashboard')
+    
+    assignment = get_object_or_404(
+        Assignment.objects.select_related('subject'), id=assignment_id, teacher=request.user.teacher
+    )
+    response = StreamingHttpResponse(stream_submissions_zip(assignment), content_type='application/zip')
+    response['Content-Disposition'] = f'attachment; filename="{archive_filename(assignment)}"'
+    return response
+
+@login_required
+def check_similarity(request, assignment_id):
+    """Build the missing similarity signatures of an assignment's submissions"""
+    if not hasattr(request.user, 'teacher'):
+        messages.error(request, 'Access denied.')
+        return redirect('dashboard')
+    
+    assignment = get_object_or_404(Assignment, id=assignment_id, teacher=request.user.teacher)
+    if request.method == 'POST':
+        submissions = AssignmentSubmission.objects.filter(assignment=assignment).select_related('student__user')
+        report = similarity_report(submissions, compute=True)
+        messages.success(
+            request,
+            f"Analysed {report['built']} new files; {len(report['pairs'])} similar pairs found."
+        )
+    return redirect(reverse('assignment_submissions', args=[assignment_id]) + '#similarity')
+
+@login_required
+def grade_submissions_api(request, assignment_id):
+    """Save many grades at once: JSON {grades: [{submission, marks, feedback?}]}.
+
+    Nothing is saved unless every grade is valid.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'POST required'}, status=405)
+    
+    if not hasattr(request.user, 'teacher'):
+        return JsonResponse({'error': 'Access denied'}, status=403)
+    
+    assignment = Assignment.objects.filter(id=assignment_id, teacher=request.user.teacher).first()
+    if assignment is None:
+        return JsonResponse({'error': 'Assignment not found'}, status=404)
+    
+    try:
+        grades = json.loads(request.body)['grades']
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({'error': 'Invalid request'}, status=400)
+    
+    if not isinstance(grades, list) or not all(isinstance(grade, dict) for grade in grades):
+        return JsonResponse({'error': 'Invalid request'}, status=400)
+    
+    updated, errors = grade_submissions(assignment, grades)
+    if errors:
+        return JsonResponse({'error': 'No grades were saved', 'errors': errors}, status=400)
+    return JsonResponse({'updated': updated})
+
+@login_required
+def import_grades(request, assignment_id):
+    """Grade an assignment from an uploaded CSV (registration_number, marks, feedback)"""
+    if not hasattr(request.user, 'teacher'):
+        messages.error(request, 'Access denied.')
+        return redirect('dashboard')
+    
+    assignment = get_object_or_404(Assignment, id=assignment_id, teacher=request.user.teacher)
+    if request.method == 'POST':
+        uploaded = request.FILES.get('grades_csv')
+        if uploaded is None:
+            messages.error(request, 'Choose a CSV file to import.')
+        else:
+            updated, errors = import_grades_csv(assignment, uploaded)
+            if errors:
+                messages.error(request, f'No grades were imported. {describe_grade_errors(errors)}')
+            else:
+                messages.success(request, f'Imported {updated} grades.')
+    return redirect('assignment_submissions', assignment_id=assignment_id)
+
+@login_required
+def assignment_stats_api(request):
+    """Submission counts for the teacher's assignments, or one with ?assignment=<id>"""
+    if not hasattr(request.user, 'teacher'):
+        return JsonResponse({'error': 'Access denied'}, status=403)
+    
+    assignments = teacher_assignments_with_stats(request.user.teacher)
+    if request.GET.get('assignment'):
+        assignments = [a for a in assignments if str(a.id) == request.GET['assignment']]
+        if not assignments:
+            return JsonResponse({'error': 'Assignment not found'}, status=404)
+    
+    return JsonResponse({
+        'assignments': [
+            {
+                'id': assignment.id,
+                'title': assignment.title,
+                'subject': assignment.subject.code,
+                'due_date': assignment.due_date.isoformat(),
+                **assignment.submission_stats,
+            }
+            for assignment in assignments
+        ]
+    })
+
+def _upload_state(session):
+    return {
+        'upload_id': str(session.upload_id),
+        'filename': session.filename,
+        'size': session.size,
+        'received': session.received,
+        'chunk_size': CHUNK_SIZE,
+    }
+
+@login_required
+def upload_start(request):
+    """Open a chunked upload: JSON {target, filename, size, sha256?}"""
+    if request.method != 'POST':
+        return JsonResponse({'error': 'POST required'}, status=405)
+    
+    try:
+        data = json.loads(request.body)
+        session = start_upload(
+            request.user, data.get('target'), data.get('filename'), data.get('size'), data.get('sha256', '')
+        )
+    except (ValueError, AttributeError):
+        return JsonResponse({'error': 'Invalid request'}, status=400)
+    except ValidationError as e:
+        return JsonResponse({'error': ' '.join(e.messages)}, status=400)
+    
+    return JsonResponse(_upload_state(session), status=201)
+
+@login_required
+def upload_detail(request, upload_id):
+    """GET how much of an upload has arrived, to resume it; DELETE to cancel it"""
+    if request.method == 'DELETE':
+        try:
+            cancel_upload(request.user, upload_id)
+        except UploadSession.DoesNotExist:
+            return JsonResponse({'error': 'Upload not found'}, status=404)
+        return JsonResponse({'cancelled': True})
+    
+    session = UploadSession.objects.filter(upload_id=upload_id, user=request.user).first()
+    if session is None:
+        return JsonResponse({'error': 'Upload not found'}, status=404)
+    return JsonResponse(_upload_state(session))
+
+@login_required
+def upload_chunk(request, upload_id):
+    """Append the raw request body at the Upload-Offset header"""
+    if request.method != 'POST':
+        return JsonResponse({'error': 'POST required'}, status=405)
+    
+    try:
+        offset = int(request.headers.get('Upload-Offset', ''))
+    except ValueError:
+        return JsonResponse({'error': 'Upload-Offset header required'}, status=400)
+    
+    try:
+        # Read from the request stream, never request.body, so the chunk is not buffered
+        session = append_chunk(request.user, upload_id, offset, request)
+    except UploadSession.DoesNotExist:
+        return JsonResponse({'error': 'Upload not found'}, status=404)
+    except ValidationError as e:
+        if e.code == 'offset':
+            # The client resumes from what actually arrived
+            return JsonResponse({'error': ' '.join(e.messages), 'received': e.params['received']}, status=409)
+        return JsonResponse({'error': ' '.join(e.messages)}, status=400)
+    
+    return JsonResponse(_upload_state(session))
+
+@login_required
+def upload_finalize(request, upload_id):
+    """Bind a complete upload to its submission or material; JSON body holds the form fields"""
+    if request.method != 'POST':
+        return JsonResponse({'error': 'POST required'}, status=405)
+    
+    try:
+        data = json.loads(request.body or '{}')
+        if not isinstance(data, dict):
+            raise ValueError
+        bound = finalize_upload(request.user, upload_id, data)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid request'}, status=400)
+    except UploadSession.DoesNotExist:
+        return JsonResponse({'error': 'Upload not found'}, status=404)
+    except ValidationError as e:
+        return JsonResponse({'error': ' '.join(e.messages)}, status=400)
+    
+    if isinstance(bound, AssignmentSubmission):
+        messages.success(request, 'Assignment submitted successfully!')
+        return JsonResponse({'submission': bound.id, 'url': bound.answer_file.url, 'redirect': reverse('assignments')})
+    messages.success(request, 'Material uploaded successfully!')
+    return JsonResponse({'material': bound.id, 'url': bound.file.url, 'redirect': reverse('materials')})
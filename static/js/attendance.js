@@ -5,8 +5,12 @@ document.addEventListener('DOMContentLoaded', function() {
     const submitSection = document.getElementById('submitSection');
     const attendanceForm = document.getElementById('attendanceForm');
     
+    // Marks already saved for the loaded sheet: student id -> true/false/null
+    let savedMarks = {};
+    
     // Initialize circle progress for student view
     initCircleProgress();
+    initHeatmap();
     
     if (loadStudentsBtn) {
         loadStudentsBtn.addEventListener('click', loadStudents);
@@ -24,7 +28,8 @@ document.addEventListener('DOMContentLoaded', function() {
         
         showLoadingOverlay();
         
-        fetch(`/api/students-by-subject/?subject_id=${subjectId}`)
+        const params = new URLSearchParams({ subject_id: subjectId, date: date, period: period });
+        fetch(`/api/students-by-subject/?${params}`)
             .then(response => response.json())
             .then(data => {
                 displayStudents(data.students);
@@ -59,11 +64,14 @@ document.addEventListener('DOMContentLoaded', function() {
             return regA.localeCompare(regB);
         });
         
+        savedMarks = {};
         let html = '<div class="students-grid">';
         
         students.forEach(student => {
+            savedMarks[student.id] = student.is_present;
+            const stateClass = student.is_present === null ? '' : (student.is_present ? 'present' : 'absent');
             html += `
-                <div class="student-item" data-student-id="${student.id}">
+                <div class="student-item ${stateClass}" data-student-id="${student.id}">
                     <div class="student-info">
                         <div class="student-details">
                             <h6>${student.name}</h6>
@@ -79,6 +87,7 @@ document.addEventListener('DOMContentLoaded', function() {
                                    name="student${student.id}" 
                                    id="student${student.id}"
                                    value="on"
+                                   ${student.is_present ? 'checked' : ''}
                                    onchange="updateStudentItemStyle(this)">
                             <label class="form-check-label" for="student${student.id}">
                                 Present
@@ -157,6 +166,43 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     }
     
+    // Six-month heatmap from one columnar calendar response
+    function initHeatmap() {
+        const grid = document.getElementById('attendanceHeatmap');
+        if (!grid) return;
+        
+        fetch(grid.dataset.url)
+            .then(response => response.json())
+            .then(data => {
+                const byDate = {};
+                data.dates.forEach((day, i) => {
+                    byDate[day] = { present: data.present[i], absent: data.absent[i] };
+                });
+                
+                const start = new Date(data.start + 'T00:00:00');
+                const end = new Date(data.end + 'T00:00:00');
+                // Pad the first column so rows line up with weekdays
+                for (let i = 0; i < start.getDay(); i++) {
+                    grid.appendChild(document.createElement('div'));
+                }
+                for (let day = new Date(start); day <= end; day.setDate(day.getDate() + 1)) {
+                    const iso = `${day.getFullYear()}-${String(day.getMonth() + 1).padStart(2, '0')}-${String(day.getDate()).padStart(2, '0')}`;
+                    const cell = document.createElement('div');
+                    cell.className = 'heatmap-cell';
+                    const counts = byDate[iso];
+                    if (counts) {
+                        const ratio = counts.present / (counts.present + counts.absent);
+                        cell.classList.add(`level-${Math.min(4, 1 + Math.floor(ratio * 4))}`);
+                        cell.title = `${iso}: ${counts.present} present, ${counts.absent} absent`;
+                    } else {
+                        cell.title = iso;
+                    }
+                    grid.appendChild(cell);
+                }
+            })
+            .catch(error => console.error('Error loading attendance calendar:', error));
+    }
+    
     // Cancel button functionality
     const cancelBtn = document.getElementById('cancelBtn');
     if (cancelBtn) {
@@ -166,29 +212,116 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     }
     
-    // Form submission with debugging
+    // Form submission goes through the sync endpoint so the service worker
+    // can queue the sheet when the classroom connection drops
     if (attendanceForm) {
         attendanceForm.addEventListener('submit', function(e) {
-            const formData = new FormData(attendanceForm);
-            
-            // Debug: Log form data
-            console.log('Form submission data:');
-            for (let [key, value] of formData.entries()) {
-                console.log(`${key}: ${value}`);
+            if (!window.fetch || !window.crypto || !crypto.randomUUID) {
+                showLoadingOverlay();
+                return; // Plain form POST
             }
+            e.preventDefault();
             
-            // Count selected students
-            const checkedBoxes = document.querySelectorAll('.attendance-checkbox:checked');
-            console.log(`Submitting attendance for ${checkedBoxes.length} present students`);
-            
-            // Verify checkbox names - now using registration numbers
-            checkedBoxes.forEach(cb => {
-                console.log(`Checkbox name: ${cb.name}, value: ${cb.value}, checked: ${cb.checked}`);
-            });
+            const sheet = buildSheet();
+            if (Object.keys(sheet.marks).length === 0) {
+                window.YenepoyaPortal.showAlert('No changes to save.', 'info');
+                return;
+            }
             
             showLoadingOverlay();
+            fetch('/api/attendance/sync/', {
+                method: 'POST',
+                credentials: 'same-origin',
+                headers: {
+                    'Content-Type': 'application/json',
+                    'X-CSRFToken': attendanceForm.querySelector('[name="csrfmiddlewaretoken"]').value
+                },
+                body: JSON.stringify({ sheets: [sheet] })
+            })
+                .then(response => response.json())
+                .then(data => {
+                    hideLoadingOverlay();
+                    const result = (data.results || [])[0] || {};
+                    if (data.queued) {
+                        window.YenepoyaPortal.showAlert('You are offline. Attendance saved on this device and will sync automatically.', 'warning');
+                    } else if (result.status === 'applied' || result.status === 'duplicate') {
+                        forgetSheetKey(sheet);
+                        Object.assign(savedMarks, sheet.marks);
+                        window.YenepoyaPortal.showAlert(
+                            `Attendance saved (${result.created} new, ${result.updated} updated).`, 'success'
+                        );
+                    } else {
+                        // Rejected, not lost: a corrected resubmit is a new sheet
+                        forgetSheetKey(sheet);
+                        window.YenepoyaPortal.showAlert(result.error || data.error || 'Could not save attendance.', 'danger');
+                    }
+                })
+                .catch(error => {
+                    console.error('Error:', error);
+                    hideLoadingOverlay();
+                    window.YenepoyaPortal.showAlert('Could not save attendance. Please try again.', 'danger');
+                });
         });
     }
+    
+    // Only students whose mark differs from what is already saved
+    function buildSheet() {
+        const marks = {};
+        document.querySelectorAll('.attendance-checkbox').forEach(cb => {
+            const studentId = cb.closest('.student-item').getAttribute('data-student-id');
+            if (savedMarks[studentId] !== cb.checked) {
+                marks[studentId] = cb.checked;
+            }
+        });
+        const sheet = {
+            subject: parseInt(subjectSelect.value, 10),
+            date: document.querySelector('input[name="date"]').value,
+            period: document.querySelector('select[name="period"]').value,
+            marks: marks
+        };
+        sheet.key = sheetKey(sheet);
+        return sheet;
+    }
+    
+    // One idempotency key per sheet (subject, date, period), reused by every
+    // retry until the server accepts or rejects it, so a resubmit after a
+    // timeout is recognised as the same sheet. Changed marks get a new key.
+    function sheetStorageKey(sheet) {
+        return `attendance-sheet-key:${sheet.subject}:${sheet.date}:${sheet.period}`;
+    }
+    
+    const sheetKeys = {}; // Fallback when sessionStorage is unavailable
+    
+    function sheetKey(sheet) {
+        const storageKey = sheetStorageKey(sheet);
+        const marks = JSON.stringify(sheet.marks);
+        let stored = sheetKeys[storageKey];
+        try {
+            stored = JSON.parse(sessionStorage.getItem(storageKey) || 'null') || stored;
+        } catch (error) {
+            // Storage unavailable or entry unreadable; use this page's copy
+        }
+        if (stored && stored.marks === marks) {
+            return stored.key;
+        }
+        stored = { key: crypto.randomUUID(), marks: marks };
+        sheetKeys[storageKey] = stored;
+        try {
+            sessionStorage.setItem(storageKey, JSON.stringify(stored));
+        } catch (error) {
+            // Kept in sheetKeys for this page only
+        }
+        return stored.key;
+    }
+    
+    function forgetSheetKey(sheet) {
+        delete sheetKeys[sheetStorageKey(sheet)];
+        try {
+            sessionStorage.removeItem(sheetStorageKey(sheet));
+        } catch (error) {
+            // Nothing stored
+        }
+    }
 });
 
 // Helper functions
@@ -535,10 +535,10 @@ document.addEventListener('visibilitychange', function() {
     }
 });
 
-// Service Worker registration (for future PWA features)
+// Service Worker registration, served from the site root so it controls every page
 if ('serviceWorker' in navigator) {
     window.addEventListener('load', function() {
-        navigator.serviceWorker.register('/static/js/sw.js')
+        navigator.serviceWorker.register('/sw.js')
             .then(function(registration) {
                 console.log('ServiceWorker registration successful');
             })
@@ -548,3 +548,9 @@ if ('serviceWorker' in navigator) {
     });
 }
 
+// Replay attendance sheets queued while offline as soon as the connection returns
+window.addEventListener('online', function() {
+    if (navigator.serviceWorker && navigator.serviceWorker.controller) {
+        navigator.serviceWorker.controller.postMessage('replay-attendance');
+    }
+});
@@ -1,4 +1,4 @@
-const CACHE_NAME = 'yenepoya-portal-v1';
+const CACHE_NAME = 'yenepoya-portal-v2';
 const urlsToCache = [
   '/',
   '/static/css/style.css',
@@ -9,14 +9,37 @@ const urlsToCache = [
   'https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0/css/all.min.css'
 ];
 
+// Offline attendance queue
+const SYNC_URL = '/api/attendance/sync/';
+const SYNC_TAG = 'attendance-sync';
+const QUEUE_DB = 'attendance-sync';
+const QUEUE_STORE = 'sheets';
+const MAX_SHEETS_PER_REQUEST = 50;
+
 self.addEventListener('install', event => {
   event.waitUntil(
     caches.open(CACHE_NAME)
-      .then(cache => cache.addAll(urlsToCache))
+      // One missing asset should not stop the worker from installing
+      .then(cache => Promise.all(urlsToCache.map(url => cache.add(url).catch(() => null))))
   );
 });
 
+self.addEventListener('activate', event => {
+  event.waitUntil(replayQueue());
+});
+
 self.addEventListener('fetch', event => {
+  const url = new URL(event.request.url);
+
+  if (event.request.method === 'POST' && url.pathname === SYNC_URL) {
+    event.respondWith(sendOrQueue(event.request));
+    return;
+  }
+
+  if (event.request.method !== 'GET') {
+    return;
+  }
+
   event.respondWith(
     caches.match(event.request)
       .then(response => {
@@ -26,4 +49,112 @@ self.addEventListener('fetch', event => {
         return fetch(event.request);
       })
   );
-});
\ No newline at end of file
+});
+
+self.addEventListener('sync', event => {
+  if (event.tag === SYNC_TAG) {
+    event.waitUntil(replayQueue());
+  }
+});
+
+self.addEventListener('message', event => {
+  if (event.data === 'replay-attendance') {
+    event.waitUntil(replayQueue());
+  }
+});
+
+// Send a sync request, or park its sheets in IndexedDB if the network is down
+async function sendOrQueue(request) {
+  const payload = await request.clone().json();
+  const csrfToken = request.headers.get('X-CSRFToken');
+
+  try {
+    const response = await fetch(request);
+    if (response.status >= 500) {
+      throw new Error(`Server error ${response.status}`);
+    }
+    replayQueue();
+    return response;
+  } catch (error) {
+    await queueSheets(payload.sheets || [], csrfToken);
+    if (self.registration.sync) {
+      self.registration.sync.register(SYNC_TAG).catch(() => null);
+    }
+    const results = (payload.sheets || []).map(sheet => ({ key: sheet.key, status: 'queued' }));
+    return new Response(JSON.stringify({ queued: true, results }), {
+      status: 202,
+      headers: { 'Content-Type': 'application/json' }
+    });
+  }
+}
+
+// Replay every queued sheet, a batch at a time; the server drops sheets it has already applied
+async function replayQueue() {
+  const items = await readQueue();
+
+  for (let start = 0; start < items.length; start += MAX_SHEETS_PER_REQUEST) {
+    const batch = items.slice(start, start + MAX_SHEETS_PER_REQUEST);
+    let response;
+    try {
+      response = await fetch(SYNC_URL, {
+        method: 'POST',
+        credentials: 'same-origin',
+        headers: {
+          'Content-Type': 'application/json',
+          'X-CSRFToken': batch[batch.length - 1].csrfToken
+        },
+        body: JSON.stringify({ sheets: batch.map(item => item.sheet) })
+      });
+    } catch (error) {
+      return; // Still offline; try again on the next sync event
+    }
+    if (!response.ok) {
+      return;
+    }
+
+    const data = await response.json();
+    // applied, duplicate and error are all final answers for a sheet
+    await removeFromQueue(data.results.map(result => result.key));
+  }
+}
+
+function openQueue() {
+  return new Promise((resolve, reject) => {
+    const request = indexedDB.open(QUEUE_DB, 1);
+    request.onupgradeneeded = () => {
+      request.result.createObjectStore(QUEUE_STORE, { keyPath: 'key' });
+    };
+    request.onsuccess = () => resolve(request.result);
+    request.onerror = () => reject(request.error);
+  });
+}
+
+async function queueSheets(sheets, csrfToken) {
+  const db = await openQueue();
+  return new Promise((resolve, reject) => {
+    const tx = db.transaction(QUEUE_STORE, 'readwrite');
+    // Keyed by idempotency key, so queueing the same sheet twice keeps one copy
+    sheets.forEach(sheet => tx.objectStore(QUEUE_STORE).put({ key: sheet.key, sheet, csrfToken }));
+    tx.oncomplete = () => resolve();
+    tx.onerror = () => reject(tx.error);
+  });
+}
+
+async function readQueue() {
+  const db = await openQueue();
+  return new Promise((resolve, reject) => {
+    const request = db.transaction(QUEUE_STORE).objectStore(QUEUE_STORE).getAll();
+    request.onsuccess = () => resolve(request.result);
+    request.onerror = () => reject(request.error);
+  });
+}
+
+async function removeFromQueue(keys) {
+  const db = await openQueue();
+  return new Promise((resolve, reject) => {
+    const tx = db.transaction(QUEUE_STORE, 'readwrite');
+    keys.forEach(key => tx.objectStore(QUEUE_STORE).delete(key));
+    tx.oncomplete = () => resolve();
+    tx.onerror = () => reject(tx.error);
+  });
+}
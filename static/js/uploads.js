@@ -0,0 +1,146 @@
+// Chunked, resumable uploads for forms marked data-chunked-upload="submission|material".
+// Files above CHUNKED_THRESHOLD go through /api/uploads/ in chunks; smaller ones keep the plain POST.
+(function() {
+    const CHUNKED_THRESHOLD = 5 * 1024 * 1024;
+    const MAX_ATTEMPTS = 5;
+    const API_ROOT = '/api/uploads/';
+
+    document.addEventListener('DOMContentLoaded', function() {
+        document.querySelectorAll('form[data-chunked-upload]').forEach(function(form) {
+            form.addEventListener('submit', function(event) {
+                const input = form.querySelector('input[type="file"]');
+                const file = input && input.files[0];
+                if (!file || file.size <= CHUNKED_THRESHOLD || !window.fetch) {
+                    return;
+                }
+                event.preventDefault();
+                uploadForm(form, file);
+            });
+        });
+    });
+
+    function csrfToken(form) {
+        return form.querySelector('[name="csrfmiddlewaretoken"]').value;
+    }
+
+    function storageKey(target, file) {
+        return ['upload', target, file.name, file.size, file.lastModified].join(':');
+    }
+
+    async function request(form, url, options) {
+        options.headers = Object.assign({ 'X-CSRFToken': csrfToken(form) }, options.headers || {});
+        options.credentials = 'same-origin';
+        const response = await fetch(url, options);
+        const data = await response.json().catch(() => ({}));
+        return { status: response.status, data };
+    }
+
+    // Resume the upload of this exact file if the server still has it, otherwise open a new one
+    async function openSession(form, target, file) {
+        const key = storageKey(target, file);
+        const known = localStorage.getItem(key);
+        if (known) {
+            const existing = await request(form, API_ROOT + known + '/', { method: 'GET' });
+            if (existing.status === 200) {
+                return existing.data;
+            }
+            localStorage.removeItem(key);
+        }
+        const created = await request(form, API_ROOT, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ target, filename: file.name, size: file.size })
+        });
+        if (created.status !== 201) {
+            throw new Error(created.data.error || 'Could not start the upload.');
+        }
+        localStorage.setItem(key, created.data.upload_id);
+        return created.data;
+    }
+
+    async function sendChunks(form, file, session, onProgress) {
+        let received = session.received;
+        let attempts = 0;
+        while (received < file.size) {
+            const chunk = file.slice(received, received + session.chunk_size);
+            let result;
+            try {
+                result = await request(form, API_ROOT + session.upload_id + '/chunk/', {
+                    method: 'POST',
+                    headers: { 'Content-Type': 'application/octet-stream', 'Upload-Offset': String(received) },
+                    body: chunk
+                });
+            } catch (error) {
+                result = { status: 0, data: {} };
+            }
+
+            if (result.status === 200 || result.status === 409) {
+                // On 409 the server says where to carry on from
+                received = result.data.received;
+                attempts = 0;
+                onProgress(received / file.size);
+                continue;
+            }
+            if ((result.status >= 400 && result.status < 500) || ++attempts >= MAX_ATTEMPTS) {
+                throw new Error(result.data.error || 'The upload was interrupted. Submit again to resume.');
+            }
+            await new Promise(resolve => setTimeout(resolve, 1000 * 2 ** attempts));
+        }
+    }
+
+    function formFields(form) {
+        const fields = {};
+        new FormData(form).forEach(function(value, name) {
+            if (!(value instanceof File) && name !== 'csrfmiddlewaretoken') {
+                fields[name] = value;
+            }
+        });
+        return fields;
+    }
+
+    function progressBar(form) {
+        let wrapper = form.querySelector('.chunked-upload-progress');
+        if (!wrapper) {
+            wrapper = document.createElement('div');
+            wrapper.className = 'chunked-upload-progress progress mt-3';
+            wrapper.innerHTML = '<div class="progress-bar progress-bar-striped progress-bar-animated" role="progressbar" style="width: 0%">0%</div>';
+            form.querySelector('.modal-body').appendChild(wrapper);
+        }
+        return wrapper.querySelector('.progress-bar');
+    }
+
+    async function uploadForm(form, file) {
+        const target = form.dataset.chunkedUpload;
+        const submit = form.querySelector('[type="submit"]');
+        const bar = progressBar(form);
+        const setProgress = function(fraction) {
+            const percent = Math.floor(fraction * 100) + '%';
+            bar.style.width = percent;
+            bar.textContent = percent;
+        };
+
+        submit.disabled = true;
+        bar.classList.remove('bg-danger');
+        try {
+            const session = await openSession(form, target, file);
+            setProgress(session.received / file.size);
+            await sendChunks(form, file, session, setProgress);
+
+            const finished = await request(form, API_ROOT + session.upload_id + '/finalize/', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify(formFields(form))
+            });
+            if (finished.status !== 200) {
+                throw new Error(finished.data.error || 'Could not save the upload.');
+            }
+            localStorage.removeItem(storageKey(target, file));
+            window.location.href = finished.data.redirect;
+        } catch (error) {
+            bar.classList.add('bg-danger');
+            bar.textContent = error.message;
+            bar.style.width = '100%';
+            submit.disabled = false;
+        }
+    }
+})();
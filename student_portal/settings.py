@@ -160,4 +160,8 @@ FILE_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10 MB
 DATA_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10 MB
 DATA_UPLOAD_MAX_NUMBER_FIELDS = None
 
+# Partial files of chunked uploads (portal.chunked_uploads); keep on the same
+# filesystem as MEDIA_ROOT so finished files are moved rather than copied
+CHUNKED_UPLOAD_DIR = os.path.join(BASE_DIR, 'upload_chunks')
+
 